@@ -1,16 +1,23 @@
 """
 Flask application factory
 """
-from flask import Flask
-from flask_cors import CORS
 from app.config.settings import Config
-from app.utils.logger import setup_logger
 import os
+import time
+
+# Flask is imported inside the factory so that importing the package (e.g.
+# app.main for the FastAPI server) doesn't pull it in
 
 def create_app(config_class=Config):
     """Create and configure Flask application"""
+    from flask import Flask
+    from flask_cors import CORS
+    from app.services.rag_engine import RAGEngine
+    from app.utils.logger import setup_logger
+    
     app = Flask(__name__)
     app.config.from_object(config_class)
+    app.extensions['rag_engine'] = RAGEngine(app.config)
     
     # Enable CORS
     CORS(app)
@@ -22,23 +29,53 @@ def create_app(config_class=Config):
     from app.api.health_routes import health_bp
     from app.api.pdf_routes import pdf_bp
     from app.api.query_routes import query_bp
+    from app.api.metrics_routes import metrics_bp
+    from app.api.admin_routes import admin_bp
     
     app.register_blueprint(health_bp, url_prefix='/api/health')
     app.register_blueprint(pdf_bp, url_prefix='/api/pdf')
     app.register_blueprint(query_bp, url_prefix='/api/query')
+    app.register_blueprint(metrics_bp)
+    app.register_blueprint(admin_bp, url_prefix='/api/admin')
+    
+    # Request latency and status metrics
+    _register_request_metrics(app)
     
     # Create necessary directories
     _create_directories(app)
     
+    # Load the vector store and clients before taking traffic
+    if app.config['WARMUP_ON_STARTUP']:
+        from app.services.warmup import start_warmup
+        start_warmup(app)
+    
     return app
 
+def _register_request_metrics(app):
+    """Record latency and status code of every request"""
+    from flask import g, request
+    from app.utils.metrics import REQUEST_LATENCY, REQUESTS
+    
+    @app.before_request
+    def _start_timer():
+        g.request_start = time.perf_counter()
+    
+    @app.after_request
+    def _record_request(response):
+        start = g.pop('request_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            REQUEST_LATENCY.observe(time.perf_counter() - start, app='flask', route=route)
+            REQUESTS.inc(app='flask', route=route, status=response.status_code)
+        return response
+
 def _create_directories(app):
     """Create required directories if they don't exist"""
     directories = [
         app.config['UPLOAD_FOLDER'],
         app.config['VECTOR_DB_PATH'],
         app.config['METADATA_PATH'],
-        'data/processed',
+        app.config['PROCESSED_FOLDER'],
         'data/temp',
         'logs'
     ]
@@ -0,0 +1,61 @@
+"""
+Admin endpoints for store diagnostics and answer pre-warming
+"""
+import hmac
+from flask import Blueprint, request, jsonify, current_app
+from app.services.diagnostics import diagnostics
+from app.services.prewarm import get_prewarmer
+from app.services.rag_engine import request_engine
+
+admin_bp = Blueprint('admin', __name__)
+
+@admin_bp.before_request
+def check_admin_token():
+    """Require ADMIN_TOKEN when one is configured"""
+    token = current_app.config['ADMIN_TOKEN']
+    if token and not hmac.compare_digest(
+        request.headers.get(current_app.config['ADMIN_TOKEN_HEADER'], ''), token
+    ):
+        return jsonify({'error': 'Admin token required'}), 403
+
+@admin_bp.route('/diagnostics', methods=['GET'])
+@admin_bp.route('/<collection>/diagnostics', methods=['GET'])
+def store_diagnostics(collection=None):
+    """
+    Vector store health: counts, tombstones, sizes, index parameters and
+    compaction time. With verify=1 every row is checked against its metadata
+    and the response is 500 if the store is inconsistent.
+    """
+    try:
+        engine = request_engine(collection)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    verify = request.args.get('verify', '').lower() in ('1', 'true', 'yes')
+    try:
+        report = diagnostics(engine.vector_service(), verify=verify)
+        status = 500 if verify and not report['verify']['ok'] else 200
+        return jsonify({'collection': engine.collection_name, **report}), status
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@admin_bp.route('/prewarm', methods=['GET', 'POST'])
+@admin_bp.route('/<collection>/prewarm', methods=['GET', 'POST'])
+def answer_prewarm(collection=None):
+    """
+    State of the last answer pre-warming pass; POST starts a pass now,
+    even if pre-warming after uploads is disabled.
+    """
+    try:
+        engine = request_engine(collection)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    prewarmer = get_prewarmer(engine)
+    if request.method == 'POST':
+        if not current_app.config['ANSWER_CACHE_ENABLED']:
+            return jsonify({'error': 'The answer cache is disabled'}), 409
+        prewarmer.schedule(delay=0)
+        return jsonify({'collection': engine.collection_name, **prewarmer.status()}), 202
+    return jsonify({'collection': engine.collection_name, **prewarmer.status()}), 200
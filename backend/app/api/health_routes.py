@@ -1,7 +1,9 @@
 """
 Health check endpoints
 """
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, current_app
+from app.services.rag_engine import get_engine
+from app.services.warmup import WARMUP, start_warmup, warm_up
 
 health_bp = Blueprint('health', __name__)
 
@@ -15,14 +17,21 @@ def health_check():
 
 @health_bp.route('/ready', methods=['GET'])
 def readiness_check():
-    """Readiness check for dependencies"""
+    """Readiness check: ready only once warm-up has succeeded"""
     try:
-        # Add checks for Gemini API, vector DB, etc.
-        return jsonify({
-            'status': 'ready',
-            'gemini_api': 'connected',
-            'vector_db': 'initialized'
-        }), 200
+        app = current_app._get_current_object()
+        
+        if WARMUP.status == 'pending' and not app.config['WARMUP_ON_STARTUP']:
+            warm_up(app)
+        elif WARMUP.status == 'failed':
+            # Retry in the background; stay out of rotation meanwhile
+            start_warmup(app)
+        
+        state = WARMUP.to_dict()
+        if WARMUP.ready:
+            # Current store size; cheap because the loaded store is cached
+            return jsonify({**state, **get_engine().vector_service().stats(), 'status': 'ready'}), 200
+        return jsonify({**state, 'status': 'not ready', 'warmup': state['status']}), 503
     except Exception as e:
         return jsonify({
             'status': 'not ready',
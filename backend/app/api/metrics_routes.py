@@ -0,0 +1,12 @@
+"""
+Prometheus metrics endpoint
+"""
+from flask import Blueprint, Response
+from app.utils.metrics import PROMETHEUS_CONTENT_TYPE, render_prometheus
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Expose stage latency histograms and request counters"""
+    return Response(render_prometheus(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -4,16 +4,27 @@ PDF upload and management endpoints
 from flask import Blueprint, request, jsonify, current_app
 from werkzeug.utils import secure_filename
 import os
-from app.services.pdf_service import PDFService
-from app.services.embedding_service import EmbeddingService
-from app.services.vector_service import VectorService
+from app.services.catalog import catalog_etag, catalog_page, parse_catalog_query
+from app.services.collections import list_collections
+from app.services.prewarm import schedule_prewarm
+from app.services.rag_engine import request_engine
 from app.utils.validators import allowed_file
+from app.utils.admission import admitted
+from app.utils.profiler import profiled
 
 pdf_bp = Blueprint('pdf', __name__)
 
 @pdf_bp.route('/upload', methods=['POST'])
-def upload_pdf():
+@pdf_bp.route('/<collection>/upload', methods=['POST'])
+@admitted('upload')
+@profiled('upload_pdf')
+def upload_pdf(collection=None):
     """Upload and process a PDF file"""
+    try:
+        engine = request_engine(collection)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
     try:
         # Check if file is present
         if 'file' not in request.files:
@@ -27,29 +38,21 @@ def upload_pdf():
         if not allowed_file(file.filename, current_app.config['ALLOWED_EXTENSIONS']):
             return jsonify({'error': 'Only PDF files are allowed'}), 400
         
-        # Save file
+        # Save file (in the collection's own upload folder)
         filename = secure_filename(file.filename)
-        filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
+        upload_folder = engine.config['UPLOAD_FOLDER']
+        os.makedirs(upload_folder, exist_ok=True)
+        filepath = os.path.join(upload_folder, filename)
         file.save(filepath)
         
-        # Process PDF
-        pdf_service = PDFService()
-        text_data = pdf_service.extract_text(filepath)
-        chunks = pdf_service.chunk_text(text_data)
-        
-        # Generate embeddings
-        embedding_service = EmbeddingService()
-        embeddings = embedding_service.generate_embeddings(chunks)
-        
-        # Store in vector database
-        vector_service = VectorService()
-        doc_id = vector_service.add_document(filename, chunks, embeddings)
+        # Extract, chunk, embed and store
+        result = engine.ingest_pdf(filepath, filename)
+        schedule_prewarm(engine)
         
         return jsonify({
             'message': 'PDF processed successfully',
-            'document_id': doc_id,
-            'filename': filename,
-            'chunks_count': len(chunks)
+            'collection': engine.collection_name,
+            **result
         }), 201
         
     except Exception as e:
@@ -57,31 +60,75 @@ def upload_pdf():
         return jsonify({'error': f'Failed to process PDF: {str(e)}'}), 500
 
 @pdf_bp.route('/list', methods=['GET'])
-def list_pdfs():
-    """List all uploaded PDF documents"""
+@pdf_bp.route('/<collection>/list', methods=['GET'])
+def list_pdfs(collection=None):
+    """
+    List uploaded PDF documents a page at a time (sort=uploaded|name,
+    order=desc|asc, prefix, limit, cursor). Unchanged catalogs get 304.
+    """
     try:
-        vector_service = VectorService()
-        documents = vector_service.list_documents()
+        engine = request_engine(collection)
+        query = parse_catalog_query(
+            request.args,
+            current_app.config['CATALOG_PAGE_SIZE'],
+            current_app.config['CATALOG_MAX_PAGE_SIZE']
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        vector_service = engine.vector_service()
+        version = vector_service.version()
+        etag = catalog_etag(version)
         
-        return jsonify({
-            'documents': documents,
-            'count': len(documents)
-        }), 200
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+        else:
+            page = catalog_page(vector_service.catalogs(), **query)
+            response = jsonify({
+                'collection': engine.collection_name,
+                'documents': page['documents'],
+                'count': len(page['documents']),
+                'total': page['total'],
+                'next_cursor': page['next_cursor']
+            })
+        
+        response.set_etag(etag)
+        response.headers['X-Store-Generation'] = version
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @pdf_bp.route('/delete/<doc_id>', methods=['DELETE'])
-def delete_pdf(doc_id):
+@pdf_bp.route('/<collection>/delete/<doc_id>', methods=['DELETE'])
+def delete_pdf(doc_id, collection=None):
     """Delete a PDF document from the system"""
     try:
-        vector_service = VectorService()
+        engine = request_engine(collection)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        vector_service = engine.vector_service()
         success = vector_service.delete_document(doc_id)
         
         if success:
+            schedule_prewarm(engine)
             return jsonify({'message': 'Document deleted successfully'}), 200
         else:
             return jsonify({'error': 'Document not found'}), 404
             
     except Exception as e:
         return jsonify({'error': str(e)}), 500
+
+
+@pdf_bp.route('/collections', methods=['GET'])
+def list_pdf_collections():
+    """List the collections that have documents"""
+    collections = list_collections(current_app.config)
+    return jsonify({
+        'collections': collections,
+        'count': len(collections)
+    }), 200
@@ -1,14 +1,20 @@
 """
 Query/chat endpoints for RAG
 """
-from flask import Blueprint, request, jsonify, current_app
-from app.services.retrieval_service import RetrievalService
-from app.services.generation_service import GenerationService
+import json
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from app.services.rag_engine import ModelUnavailableError, request_engine
+from app.services.search_filters import parse_filters
+from app.utils.admission import admitted
+from app.utils.profiler import profiled
 
 query_bp = Blueprint('query', __name__)
 
 @query_bp.route('/ask', methods=['POST'])
-def ask_question():
+@query_bp.route('/<collection>/ask', methods=['POST'])
+@admitted('query')
+@profiled('ask_question')
+def ask_question(collection=None):
     """Process a user query and return an answer"""
     try:
         data = request.get_json()
@@ -19,36 +25,61 @@ def ask_question():
         user_query = data['query']
         top_k = data.get('top_k', current_app.config['TOP_K_CHUNKS'])
         
-        # Retrieve relevant chunks
-        retrieval_service = RetrievalService()
-        relevant_chunks = retrieval_service.retrieve(user_query, top_k=top_k)
+        try:
+            engine = request_engine(collection or data.get('collection'))
+            filters = parse_filters(data.get('filters'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        if not relevant_chunks:
-            return jsonify({
-                'answer': 'I couldn\'t find relevant information in the uploaded documents. Please upload study materials first.',
-                'sources': []
-            }), 200
+        return jsonify(engine.answer(user_query, top_k=top_k, filters=filters)), 200
         
-        # Generate answer
-        generation_service = GenerationService()
-        answer = generation_service.generate_answer(user_query, relevant_chunks)
-        
-        # Prepare response with sources
-        sources = [
-            {
-                'text': chunk['text'][:200] + '...',
-                'document': chunk.get('document', 'Unknown'),
-                'score': float(chunk.get('score', 0))
-            }
-            for chunk in relevant_chunks
-        ]
-        
-        return jsonify({
-            'answer': answer,
-            'sources': sources,
-            'chunks_used': len(relevant_chunks)
-        }), 200
+    except ModelUnavailableError as e:
+        current_app.logger.warning(f"Model API unavailable: {str(e)}")
+        response = jsonify({'error': 'The model API is temporarily unavailable, please retry shortly'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(current_app.config['ADMISSION_RETRY_AFTER'])
+        return response
         
     except Exception as e:
         current_app.logger.error(f"Error processing query: {str(e)}")
         return jsonify({'error': f'Failed to process query: {str(e)}'}), 500
+
+
+@query_bp.route('/batch', methods=['POST'])
+@query_bp.route('/<collection>/batch', methods=['POST'])
+@admitted('query')
+def ask_batch(collection=None):
+    """
+    Answer a list of questions, streaming one JSON line per question
+    (application/x-ndjson) as each answer is ready
+    """
+    data = request.get_json()
+    
+    if not data or 'questions' not in data:
+        return jsonify({'error': 'questions is required'}), 400
+    
+    questions = data['questions']
+    max_questions = current_app.config['BATCH_MAX_QUESTIONS']
+    if not isinstance(questions, list) or not questions or \
+            not all(isinstance(question, str) and question.strip() for question in questions):
+        return jsonify({'error': 'questions must be a non-empty list of strings'}), 400
+    if len(questions) > max_questions:
+        return jsonify({'error': f'At most {max_questions} questions per batch'}), 400
+    
+    top_k = data.get('top_k', current_app.config['TOP_K_CHUNKS'])
+    
+    try:
+        engine = request_engine(collection or data.get('collection'))
+        filters = parse_filters(data.get('filters'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    def lines():
+        try:
+            for item in engine.answer_batch(questions, top_k=top_k, filters=filters):
+                yield json.dumps(item) + "\n"
+        except Exception as e:
+            current_app.logger.error(f"Error processing batch: {str(e)}")
+            yield json.dumps({'error': f'Failed to process batch: {str(e)}'}) + "\n"
+    
+    return Response(stream_with_context(lines()), mimetype='application/x-ndjson')
@@ -17,23 +17,165 @@ class Config:
     EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'gemini-embedding-001')
     GENERATION_MODEL = os.getenv('GENERATION_MODEL', 'gemini-2.0-flash-exp')
     EMBEDDING_DIMENSION = int(os.getenv('EMBEDDING_DIMENSION', 768))
+    EMBEDDING_BATCH_DELAY = float(os.getenv('EMBEDDING_BATCH_DELAY', 0.5))
+    
+    # Alternative API endpoint, e.g. the local stand-in from fake_gemini_server.py
+    GEMINI_BASE_URL = os.getenv('GEMINI_BASE_URL')
+    
+    # Model providers ('gemini' or 'local')
+    EMBEDDING_PROVIDER = os.getenv('EMBEDDING_PROVIDER', 'gemini')
+    GENERATION_PROVIDER = os.getenv('GENERATION_PROVIDER', 'gemini')
+    EXTRACTIVE_MAX_SENTENCES = int(os.getenv('EXTRACTIVE_MAX_SENTENCES', 4))
+    
+    # Store served by the FastAPI app: 'engine' (the Flask app's vector store
+    # and pipeline) or 'langchain' (./vector_db, written by
+    # rebuild_vectorstore.py --langchain); both use the configured providers
+    FASTAPI_STORE = os.getenv('FASTAPI_STORE', 'engine')
+    
+    # Upstream resilience: pooled clients, retries, hedging and circuit breaking
+    GEMINI_TIMEOUT = float(os.getenv('GEMINI_TIMEOUT', 30))
+    GEMINI_MAX_CONNECTIONS = int(os.getenv('GEMINI_MAX_CONNECTIONS', 20))
+    GEMINI_MAX_RETRIES = int(os.getenv('GEMINI_MAX_RETRIES', 2))
+    GEMINI_RETRY_BASE_DELAY = float(os.getenv('GEMINI_RETRY_BASE_DELAY', 0.5))
+    GEMINI_RETRY_MAX_DELAY = float(os.getenv('GEMINI_RETRY_MAX_DELAY', 8))
+    HEDGE_QUERY_EMBEDDING = os.getenv('HEDGE_QUERY_EMBEDDING', 'True').lower() == 'true'
+    HEDGE_MIN_DELAY = float(os.getenv('HEDGE_MIN_DELAY', 0.05))
+    HEDGE_DEFAULT_DELAY = float(os.getenv('HEDGE_DEFAULT_DELAY', 1.0))
+    BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', 5))
+    BREAKER_RECOVERY_TIMEOUT = float(os.getenv('BREAKER_RECOVERY_TIMEOUT', 30))
+    
+    # Answers kept for repeat questions and as a fallback while upstream is down
+    ANSWER_CACHE_ENABLED = os.getenv('ANSWER_CACHE_ENABLED', 'True').lower() == 'true'
+    ANSWER_CACHE_PATH = os.getenv('ANSWER_CACHE_PATH', 'data/cache/answers.sqlite3')
+    ANSWER_CACHE_TTL = int(os.getenv('ANSWER_CACHE_TTL', 3600))
+    # Answers older than this are purged, ending their use as a stale fallback
+    ANSWER_CACHE_MAX_AGE = int(os.getenv('ANSWER_CACHE_MAX_AGE', 7 * 24 * 3600))
     
     # File upload settings
     UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'data/uploads')
     MAX_CONTENT_LENGTH = int(os.getenv('MAX_CONTENT_LENGTH', 16777216))
     ALLOWED_EXTENSIONS = {'pdf'}
     
+    # Extracted page texts by PDF content hash, so re-chunking skips extraction
+    PROCESSED_FOLDER = os.getenv('PROCESSED_FOLDER', 'data/processed')
+    EXTRACTED_TEXT_CACHE_ENABLED = os.getenv('EXTRACTED_TEXT_CACHE_ENABLED', 'True').lower() == 'true'
+    
+    # Chunk embeddings by text, so unchanged chunks are never embedded twice;
+    # off unless enabled (the evaluation harness enables it), oldest evicted past the cap
+    EMBEDDING_CACHE_ENABLED = os.getenv('EMBEDDING_CACHE_ENABLED', 'False').lower() == 'true'
+    EMBEDDING_CACHE_PATH = os.getenv('EMBEDDING_CACHE_PATH', 'data/cache/embeddings.sqlite3')
+    EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv('EMBEDDING_CACHE_MAX_ENTRIES', 100000))
+    
     # Vector database
     VECTOR_DB_PATH = os.getenv('VECTOR_DB_PATH', 'vector_db/indexes')
     METADATA_PATH = os.getenv('METADATA_PATH', 'vector_db/metadata')
     
+    # Named collections (one store each) and the memory their loaded stores
+    # may use in one process before the least recently used are evicted
+    COLLECTIONS_PATH = os.getenv('COLLECTIONS_PATH', 'vector_db/collections')
+    COLLECTION_MEMORY_BUDGET_MB = int(os.getenv('COLLECTION_MEMORY_BUDGET_MB', 2048))
+    
+    # Sharded search: URLs of the shard servers (shard_server.py), one per
+    # shard in order; empty searches the store in-process. Shards that
+    # haven't answered after SHARD_TIMEOUT seconds are left out of the results.
+    SHARD_URLS = os.getenv('SHARD_URLS', '')
+    SHARD_TIMEOUT = float(os.getenv('SHARD_TIMEOUT', 0.5))
+    SHARD_MAX_CONNECTIONS = int(os.getenv('SHARD_MAX_CONNECTIONS', 64))
+    
+    # Vector store writes: changes committed together, and the tombstoned
+    # share of rows that triggers a compaction
+    VECTOR_WRITE_BATCH_MAX = int(os.getenv('VECTOR_WRITE_BATCH_MAX', 64))
+    COMPACT_TOMBSTONE_RATIO = float(os.getenv('COMPACT_TOMBSTONE_RATIO', 0.25))
+    
     # Chunking
     CHUNK_SIZE = int(os.getenv('CHUNK_SIZE', 1000))
     CHUNK_OVERLAP = int(os.getenv('CHUNK_OVERLAP', 200))
     
+    # Document catalog pages (/api/pdf/list)
+    CATALOG_PAGE_SIZE = int(os.getenv('CATALOG_PAGE_SIZE', 50))
+    CATALOG_MAX_PAGE_SIZE = int(os.getenv('CATALOG_MAX_PAGE_SIZE', 500))
+    
     # Retrieval
     TOP_K_CHUNKS = int(os.getenv('TOP_K_CHUNKS', 5))
     
+    # /api/query/batch: questions per request and answers generated at once
+    BATCH_MAX_QUESTIONS = int(os.getenv('BATCH_MAX_QUESTIONS', 50))
+    BATCH_GENERATION_CONCURRENCY = int(os.getenv('BATCH_GENERATION_CONCURRENCY', 4))
+    
+    # Two-stage search: scan renormalised prefixes of this many dimensions
+    # (0 disables), then re-rank this many candidates on the full vectors.
+    # benchmarks/two_stage_report.py measures the recall/latency trade-off.
+    COARSE_SEARCH_DIMENSION = int(os.getenv('COARSE_SEARCH_DIMENSION', 0))
+    RERANK_CANDIDATES = int(os.getenv('RERANK_CANDIDATES', 100))
+    
     # Generation
     TEMPERATURE = float(os.getenv('TEMPERATURE', 0.1))
     MAX_OUTPUT_TOKENS = int(os.getenv('MAX_OUTPUT_TOKENS', 500))
+    
+    # Logging (queued, written by a background listener)
+    LOG_FILE = os.getenv('LOG_FILE', 'logs/rag_bot.log')
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json')
+    LOG_TO_CONSOLE = os.getenv('LOG_TO_CONSOLE', 'True').lower() == 'true'
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))
+    LOG_DEBUG_SAMPLE_RATE = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', 0.01))
+    
+    # Query log for replaying real traffic (one rotating file per process)
+    QUERY_LOG_ENABLED = os.getenv('QUERY_LOG_ENABLED', 'True').lower() == 'true'
+    QUERY_LOG_DIR = os.getenv('QUERY_LOG_DIR', 'logs/queries')
+    QUERY_LOG_MAX_MB = float(os.getenv('QUERY_LOG_MAX_MB', 50))
+    QUERY_LOG_BACKUPS = int(os.getenv('QUERY_LOG_BACKUPS', 20))
+    QUERY_LOG_SAMPLE_RATE = float(os.getenv('QUERY_LOG_SAMPLE_RATE', 1.0))
+    
+    # Startup warm-up (readiness is reported only after it succeeds)
+    WARMUP_ON_STARTUP = os.getenv('WARMUP_ON_STARTUP', 'True').lower() == 'true'
+    WARMUP_QUERY = os.getenv('WARMUP_QUERY', 'What topics are asked in the technical interview?')
+    
+    # Re-answer the most popular questions from the query log after uploads
+    # and deletes, so they are cached for the new store version
+    PREWARM_ENABLED = os.getenv('PREWARM_ENABLED', 'True').lower() == 'true'
+    PREWARM_TOP_N = int(os.getenv('PREWARM_TOP_N', 50))
+    PREWARM_STRATEGY = os.getenv('PREWARM_STRATEGY', 'frequent')
+    PREWARM_LOG_ENTRIES = int(os.getenv('PREWARM_LOG_ENTRIES', 20000))
+    PREWARM_DELAY = float(os.getenv('PREWARM_DELAY', 5))
+    PREWARM_CONCURRENCY = int(os.getenv('PREWARM_CONCURRENCY', 2))
+    PREWARM_RATE = float(os.getenv('PREWARM_RATE', 2))
+    
+    # Admission control (separate pools so uploads can't starve queries)
+    QUERY_MAX_CONCURRENCY = int(os.getenv('QUERY_MAX_CONCURRENCY', 8))
+    QUERY_MAX_QUEUE = int(os.getenv('QUERY_MAX_QUEUE', 32))
+    QUERY_QUEUE_TIMEOUT = float(os.getenv('QUERY_QUEUE_TIMEOUT', 10))
+    UPLOAD_MAX_CONCURRENCY = int(os.getenv('UPLOAD_MAX_CONCURRENCY', 2))
+    UPLOAD_MAX_QUEUE = int(os.getenv('UPLOAD_MAX_QUEUE', 8))
+    UPLOAD_QUEUE_TIMEOUT = float(os.getenv('UPLOAD_QUEUE_TIMEOUT', 30))
+    ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', 2))
+    ADMISSION_PRIORITY_HEADER = os.getenv('ADMISSION_PRIORITY_HEADER', 'X-Priority')
+    ADMISSION_PRIORITIES = os.getenv('ADMISSION_PRIORITIES', 'high=10,normal=0,low=-10')
+    
+    # Request profiling (sampled, or by header when PROFILE_TOKEN is set)
+    PROFILE_HEADER = os.getenv('PROFILE_HEADER', 'X-Profile')
+    PROFILE_TOKEN = os.getenv('PROFILE_TOKEN')
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', 0.0))
+    PROFILE_INTERVAL = float(os.getenv('PROFILE_INTERVAL', 0.005))
+    PROFILES_DIR = os.getenv('PROFILES_DIR', 'profiles')
+    
+    # Admin endpoints (/api/admin) require this token in ADMIN_TOKEN_HEADER when set
+    ADMIN_TOKEN = os.getenv('ADMIN_TOKEN')
+    ADMIN_TOKEN_HEADER = os.getenv('ADMIN_TOKEN_HEADER', 'X-Admin-Token')
+
+
+def config_dict(config_class=Config):
+    """Uppercase settings of a config class as a plain dict (like Flask's from_object)"""
+    return {
+        key: getattr(config_class, key)
+        for key in dir(config_class)
+        if key.isupper()
+    }
+
+
+def resolve_config(config=None):
+    """The given settings mapping, or the current Flask app's config"""
+    if config is not None:
+        return config
+    from flask import current_app
+    return current_app.config
@@ -1,20 +1,59 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi import Response as HTTPResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 from typing import List
+import logging
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Updated LangChain imports
-from langchain_community.vectorstores import FAISS
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
+# LangChain, faiss and google-genai are imported inside the startup handler
+# so the process can bind its port and answer health checks immediately
+from app.config.settings import Config, config_dict
+from app.services.rag_engine import ModelUnavailableError, RAGEngine
+from app.services.store_migration import check_langchain_pair
+from app.services.providers import get_embedding_provider, get_generation_provider
+from app.utils.metrics import (
+    PROMETHEUS_CONTENT_TYPE,
+    REQUEST_LATENCY,
+    REQUESTS,
+    render_prometheus,
+    timed,
+)
+from app.utils.logger import configure_logging, log_request
+from app.utils.request_context import (
+    current_stage_timings,
+    new_request_id,
+    reset_request_id,
+    set_request_id,
+    start_stage_recording,
+    stop_stage_recording,
+)
+from app.utils.admission import AdmissionRejected, get_pool, resolve_priority
+from app.utils.profiler import TRACE_HEADER, profile_request, should_profile
+from app.utils.query_log import QueryLog, logged_query
 
 
 # Initialize FastAPI app
 app = FastAPI(title="Placement Prep Bot API")
+settings = config_dict(Config)
+logger = logging.getLogger(__name__)
+configure_logging(
+    logging.getLogger("app"),
+    log_file=Config.LOG_FILE,
+    level=Config.LOG_LEVEL,
+    log_format=Config.LOG_FORMAT,
+    console=Config.LOG_TO_CONSOLE,
+    queue_size=Config.LOG_QUEUE_SIZE,
+    debug_sample_rate=Config.LOG_DEBUG_SAMPLE_RATE
+)
 
 
 # Enable CORS for React frontend
@@ -27,6 +66,32 @@ app.add_middleware(
 )
 
 
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Bind a request id, record metrics and log one summary line per request"""
+    request_id = new_request_id(request.headers.get("X-Request-Id"))
+    id_token = set_request_id(request_id)
+    stage_token = start_stage_recording()
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+        
+        duration = time.perf_counter() - start
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        REQUEST_LATENCY.observe(duration, app="fastapi", route=route)
+        REQUESTS.inc(app="fastapi", route=route, status=response.status_code)
+        log_request(
+            logger, request.method, request.url.path, response.status_code,
+            duration, current_stage_timings()
+        )
+        
+        response.headers["X-Request-Id"] = request_id
+        return response
+    finally:
+        stop_stage_recording(stage_token)
+        reset_request_id(id_token)
+
+
 # Pydantic models for request/response
 class Query(BaseModel):
     question: str
@@ -42,30 +107,52 @@ retriever = None
 llm = None
 embeddings = None
 vectorstore = None
+engine = None
+startup_timings_ms = {}
+warmed_up = False
 
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize RAG components on startup"""
-    global retriever, llm, embeddings, vectorstore
+    """Start loading RAG components in the background; /api/ready reports when done"""
+    threading.Thread(target=initialize_rag, name="rag-warmup", daemon=True).start()
+
+
+def initialize_rag():
+    """Load the vector store and models, then run a synthetic query"""
+    global retriever, llm, embeddings, vectorstore, engine, warmed_up
+    startup_start = time.perf_counter()
     
     try:
-        print("Loading embeddings model...")
+        if Config.FASTAPI_STORE == 'engine':
+            # Same store and pipeline as the Flask app
+            print("Loading RAG engine...")
+            engine = RAGEngine(settings)
+            vector_service = engine.vector_service()
+            startup_timings_ms["load_vector_store"] = (time.perf_counter() - startup_start) * 1000
+            if Config.WARMUP_QUERY and vector_service.vector_count() > 0:
+                warmup_start = time.perf_counter()
+                engine.retrieve(Config.WARMUP_QUERY, top_k=1)
+                startup_timings_ms["synthetic_query"] = (time.perf_counter() - warmup_start) * 1000
+            startup_timings_ms["total"] = (time.perf_counter() - startup_start) * 1000
+            warmed_up = True
+            print("✓ RAG engine initialized!")
+            return
         
-        # Get API key from environment
-        api_key = os.getenv("GEMINI_API_KEY")
-        if not api_key:
+        if 'gemini' in (Config.EMBEDDING_PROVIDER, Config.GENERATION_PROVIDER) and not Config.GEMINI_API_KEY:
             print("ERROR: GEMINI_API_KEY not found in environment variables!")
             print("Please create a .env file with: GEMINI_API_KEY=your_key_here")
+            print("or set EMBEDDING_PROVIDER=local and GENERATION_PROVIDER=local")
             return
         
-        # Use Google Gemini embeddings (matching your original setup)
-        embeddings = GoogleGenerativeAIEmbeddings(
-            model="models/text-embedding-004",
-            google_api_key=api_key,
-            task_type="retrieval_document"
-        )
-        print("✓ Gemini embeddings model loaded!")
+        # Only the store comes from langchain; embeddings and answers use
+        # the providers and models configured for the engine
+        from langchain_community.vectorstores.faiss import FAISS
+        from app.services.langchain_adapter import ProviderEmbeddings
+        
+        print("Loading embeddings model...")
+        embeddings = ProviderEmbeddings(get_embedding_provider(settings))
+        print(f"✓ '{Config.EMBEDDING_PROVIDER}' embeddings loaded!")
         
         print("Loading vector store...")
         vectorstore_path = "./vector_db"
@@ -75,29 +162,34 @@ async def startup_event():
             
             try:
                 print("Loading FAISS vector store...")
+                check_langchain_pair(vectorstore_path)
                 vectorstore = FAISS.load_local(
                     vectorstore_path, 
                     embeddings,
                     allow_dangerous_deserialization=True
                 )
                 retriever = vectorstore.as_retriever(search_kwargs={"k": 3})
+                startup_timings_ms["load_vector_store"] = (time.perf_counter() - startup_start) * 1000
                 print("✓ Vector store loaded successfully!")
                 
             except Exception as ve:
                 print(f"Error loading vector store: {ve}")
                 print("\nPlease rebuild the vector store by running:")
-                print("  python rebuild_vectorstore.py")
+                print("  python rebuild_vectorstore.py --langchain ./vector_db")
                 import traceback
                 traceback.print_exc()
                 return
             
-            print("Loading Gemini language model...")
-            llm = ChatGoogleGenerativeAI(
-                model="gemini-2.5-flash",
-                google_api_key=api_key,
-                temperature=0.7
-            )
-            print("✓ Gemini language model loaded!")
+            llm = get_generation_provider(settings)
+            print(f"✓ '{Config.GENERATION_PROVIDER}' answer generator loaded!")
+            
+            # Synthetic query so the first real request doesn't pay for it
+            if Config.WARMUP_QUERY:
+                warmup_start = time.perf_counter()
+                retriever.invoke(Config.WARMUP_QUERY)
+                startup_timings_ms["synthetic_query"] = (time.perf_counter() - warmup_start) * 1000
+            startup_timings_ms["total"] = (time.perf_counter() - startup_start) * 1000
+            warmed_up = True
             
             print("="*50)
             print("✓ RAG SYSTEM INITIALIZED SUCCESSFULLY!")
@@ -105,7 +197,7 @@ async def startup_event():
         else:
             print(f"ERROR: Vector store directory not found at {vectorstore_path}")
             print("\nPlease rebuild the vector store by running:")
-            print("  python rebuild_vectorstore.py")
+            print("  python rebuild_vectorstore.py --langchain ./vector_db")
             
     except Exception as e:
         print(f"ERROR initializing RAG system: {e}")
@@ -119,7 +211,7 @@ async def root():
     return {
         "message": "Placement Prep Bot API",
         "status": "running",
-        "rag_initialized": retriever is not None and llm is not None
+        "rag_initialized": engine is not None or (retriever is not None and llm is not None)
     }
 
 
@@ -128,8 +220,9 @@ async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
-        "rag_system": "initialized" if retriever is not None else "not initialized",
+        "rag_system": "initialized" if retriever is not None or engine is not None else "not initialized",
         "components": {
+            "engine": engine is not None,
             "embeddings": embeddings is not None,
             "vectorstore": vectorstore is not None,
             "retriever": retriever is not None,
@@ -138,88 +231,161 @@ async def health_check():
     }
 
 
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness: only ready once startup warm-up has completed"""
+    if engine is not None:
+        stats = engine.vector_service().stats()
+        store = {"vector_count": stats["vector_count"], "dimension": stats["dimension"]}
+    else:
+        store = {
+            "vector_count": vectorstore.index.ntotal if vectorstore is not None else 0,
+            "dimension": vectorstore.index.d if vectorstore is not None else None,
+        }
+    body = {
+        "status": "ready" if warmed_up else "not ready",
+        **store,
+        "warmup_timings_ms": startup_timings_ms,
+    }
+    return JSONResponse(status_code=200 if warmed_up else 503, content=body)
+
+
 @app.post("/api/query", response_model=Response)
-async def query_rag(query: Query):
+async def query_rag(query: Query, request: Request, http_response: HTTPResponse):
     """Query the RAG system"""
+    pool = get_pool("query", settings)
+    priority = resolve_priority(request.headers.get(Config.ADMISSION_PRIORITY_HEADER), settings)
+    
+    try:
+        await run_in_threadpool(pool.acquire, priority)
+    except AdmissionRejected as e:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Server is busy, please retry shortly"},
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    
+    try:
+        return await profiled_answer(query, request, http_response)
+    finally:
+        pool.release()
+
+
+async def profiled_answer(query: Query, request: Request, http_response: HTTPResponse):
+    """
+    Answer a query in the thread pool, profiling it when requested or
+    sampled. Answering is blocking, so running it on the event loop would
+    serialise requests and stall health checks.
+    """
+    if not should_profile(
+        request.headers.get(Config.PROFILE_HEADER),
+        Config.PROFILE_SAMPLE_RATE,
+        Config.PROFILE_TOKEN
+    ):
+        return await run_in_threadpool(answer_query, query)
+    
+    metadata = {"method": request.method, "path": request.url.path}
+    
+    def profiled():
+        # The profiler samples the thread it is started on, so it runs in the worker too
+        with profile_request("query_rag", Config.PROFILES_DIR, Config.PROFILE_INTERVAL, metadata) as trace_id:
+            return answer_query(query), trace_id
+    
+    result, trace_id = await run_in_threadpool(profiled)
+    http_response.headers[TRACE_HEADER] = trace_id
+    return result
+
+
+def answer_query(query: Query):
+    """Retrieve context and generate the answer for a query (blocking)"""
+    if engine is not None:
+        return answer_with_engine(query)
+    
     if retriever is None or llm is None:
         raise HTTPException(
             status_code=503,
-            detail="RAG system not initialized. Please rebuild vector store using rebuild_vectorstore.py"
+            detail="RAG system not initialized. Please rebuild vector store using rebuild_vectorstore.py --langchain ./vector_db"
         )
     
     try:
-        print(f"\n{'='*50}")
-        print(f"Received query: {query.question}")
-        print(f"{'='*50}")
-        
-        # Retrieve relevant documents with error handling
-        print("Retrieving relevant documents...")
-        try:
-            docs = retriever.invoke(query.question)
-        except (IndexError, KeyError) as e:
-            print(f"Vector store index error: {e}")
-            return Response(
-                answer="The vector store has an error. Please ask an administrator to rebuild it using: python rebuild_vectorstore.py",
-                sources=[]
-            )
-        
-        print(f"Found {len(docs)} relevant documents")
-        
-        if not docs:
+        with logged_query(QueryLog.from_config(settings), query.question, 3) as entry:
+            logger.debug("Received query", extra={"question": query.question})
+            
+            # Retrieve relevant documents with error handling
+            try:
+                with timed("query_embed"):
+                    query_vector = embeddings.embed_query(query.question)
+                with timed("search"):
+                    scored = vectorstore.similarity_search_with_score_by_vector(query_vector, k=3)
+                docs = [doc for doc, _ in scored]
+                entry["ids"] = [str(doc.id) for doc in docs]
+                entry["s"] = [round(float(score), 4) for _, score in scored]
+            except (IndexError, KeyError) as e:
+                logger.error(f"Vector store index error: {e}")
+                return Response(
+                    answer="The vector store has an error. Please ask an administrator to rebuild it using: python rebuild_vectorstore.py --langchain ./vector_db",
+                    sources=[]
+                )
+            
+            logger.debug(f"Found {len(docs)} relevant documents")
+            
+            if not docs:
+                return Response(
+                    answer="I couldn't find relevant information to answer your question in the placement feedback documents.",
+                    sources=[]
+                )
+            
+            with timed("generate"):
+                answer_text = llm.generate_answer(query.question, [
+                    {
+                        'text': doc.page_content,
+                        'document': os.path.basename(str(doc.metadata.get('source', 'Unknown'))),
+                        'page': doc.metadata.get('page', 'N/A')
+                    }
+                    for doc in docs[:3]
+                ])
+            
             return Response(
-                answer="I couldn't find relevant information to answer your question in the placement feedback documents.",
-                sources=[]
+                answer=answer_text,
+                sources=[doc.page_content[:200] + "..." for doc in docs[:2]]
             )
-        
-        # Prepare context from documents
-        context = "\n\n".join([doc.page_content for doc in docs[:3]])
-        print(f"Context length: {len(context)} characters")
-        
-        # Create prompt
-        prompt = f"""You are a helpful placement preparation assistant. Use the following context to answer the question. If you cannot answer based on the context, say so.
-
-Context:
-{context}
+            
+    except Exception as e:
+        logger.exception(f"Error processing query: {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing your question: {str(e)}"
+        )
 
-Question: {query.question}
 
-Answer:"""
-        
-        # Generate answer with Gemini
-        print("Generating answer with Gemini LLM...")
-        response = llm.invoke(prompt)
-        
-        # Extract text from Gemini response
-        if hasattr(response, 'content'):
-            answer_text = response.content
-        elif isinstance(response, str):
-            answer_text = response
-        else:
-            answer_text = str(response)
-        
-        # Clean up the answer
-        if "Answer:" in answer_text:
-            answer_text = answer_text.split("Answer:")[-1].strip()
-        
-        # Get source snippets
-        sources = [doc.page_content[:200] + "..." for doc in docs[:2]]
-        
-        print(f"Answer generated: {answer_text[:100]}...")
-        print(f"{'='*50}\n")
-        
-        return Response(
-            answer=answer_text,
-            sources=sources
+def answer_with_engine(query: Query):
+    """Answer a query through the shared RAG engine"""
+    try:
+        result = engine.answer(query.question)
+    except ModelUnavailableError as e:
+        logger.warning(f"Model API unavailable: {e}")
+        raise HTTPException(
+            status_code=503,
+            detail="The model API is temporarily unavailable, please retry shortly",
+            headers={"Retry-After": str(Config.ADMISSION_RETRY_AFTER)}
         )
-        
     except Exception as e:
-        print(f"ERROR processing query: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception(f"Error processing query: {e}")
         raise HTTPException(
             status_code=500,
             detail=f"Error processing your question: {str(e)}"
         )
+    
+    return Response(
+        answer=result["answer"],
+        sources=[source["text"] for source in result["sources"][:2]]
+    )
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus metrics for stage latencies and requests"""
+    return PlainTextResponse(render_prometheus(), media_type=PROMETHEUS_CONTENT_TYPE)
 
 
 @app.get("/api/test")
@@ -231,7 +397,9 @@ async def test_endpoint():
         "endpoints": [
             "/",
             "/api/health",
+            "/api/ready",
             "/api/query (POST)",
+            "/metrics",
             "/api/test"
         ]
     }
@@ -0,0 +1,123 @@
+"""
+Answer cache backed by SQLite
+
+Answers are keyed by the collection, the normalised question, top_k, any
+search filters and the vector store version they were generated from, so
+uploads and deletes invalidate them naturally. Entries older than the
+TTL are not served as fresh answers but remain available as a stale
+fallback while the model API is unavailable.
+
+Only the newest answer to a question is ever served once its store version
+is superseded, so writes purge older answers to the same questions, and
+anything older than ANSWER_CACHE_MAX_AGE, at most once per TTL.
+"""
+import hashlib
+import json
+import threading
+import time
+from app.services.collections import DEFAULT_COLLECTION
+from app.services.sqlite_cache import cache_connection
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS answers ("
+    "query_hash TEXT NOT NULL, store_version TEXT NOT NULL, "
+    "created_at REAL NOT NULL, payload TEXT NOT NULL, "
+    "PRIMARY KEY (query_hash, store_version))",
+    "CREATE INDEX IF NOT EXISTS answers_recent ON answers (query_hash, created_at)",
+)
+
+# When each cache file was last purged by this process
+_purged_at = {}
+_purged_lock = threading.Lock()
+
+
+def normalize_query(query):
+    """Case- and whitespace-insensitive form of a question"""
+    return " ".join(query.lower().split())
+
+
+def _query_hash(query, top_k, filters=None, namespace=''):
+    key = f"{top_k}:{normalize_query(query)}"
+    if namespace:
+        key = f"{namespace}/{key}"
+    if filters:
+        key += ":" + json.dumps(filters, sort_keys=True)
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+class AnswerCache:
+    """Persistent cache of generated answers"""
+
+    def __init__(self, path, ttl=3600, namespace='', max_age=None):
+        self.path = path
+        self.ttl = ttl
+        self.namespace = namespace
+        self.max_age = max_age
+
+    @classmethod
+    def from_config(cls, config):
+        # The default collection keeps the un-namespaced keys
+        collection = config.get('COLLECTION', DEFAULT_COLLECTION)
+        return cls(
+            config['ANSWER_CACHE_PATH'],
+            config['ANSWER_CACHE_TTL'],
+            namespace='' if collection == DEFAULT_COLLECTION else collection,
+            max_age=config['ANSWER_CACHE_MAX_AGE']
+        )
+
+    def _connection(self):
+        return cache_connection(self.path, _SCHEMA)
+
+    def get(self, query, top_k, store_version, filters=None):
+        """Fresh answer for this question and store version, or None"""
+        row = self._connection().execute(
+            "SELECT created_at, payload FROM answers WHERE query_hash = ? AND store_version = ?",
+            (_query_hash(query, top_k, filters, self.namespace), store_version)
+        ).fetchone()
+        if row is None or time.time() - row[0] > self.ttl:
+            return None
+        return json.loads(row[1])
+
+    def get_stale(self, query, top_k, filters=None):
+        """Most recent answer for this question regardless of age or store version"""
+        row = self._connection().execute(
+            "SELECT payload FROM answers WHERE query_hash = ? ORDER BY created_at DESC LIMIT 1",
+            (_query_hash(query, top_k, filters, self.namespace),)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, query, top_k, store_version, payload, filters=None):
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO answers (query_hash, store_version, created_at, payload) "
+                "VALUES (?, ?, ?, ?)",
+                (_query_hash(query, top_k, filters, self.namespace), store_version, time.time(), json.dumps(payload))
+            )
+        if self.max_age is not None:
+            self._purge_periodically()
+
+    def _purge_periodically(self):
+        now = time.time()
+        with _purged_lock:
+            if now - _purged_at.get(self.path, 0) < self.ttl:
+                return
+            _purged_at[self.path] = now
+        self.purge(self.max_age)
+
+    def purge(self, max_age):
+        """
+        Delete entries older than max_age seconds, and every answer to a
+        question but the newest; returns the number deleted
+        """
+        conn = self._connection()
+        with conn:
+            expired = conn.execute(
+                "DELETE FROM answers WHERE created_at < ?", (time.time() - max_age,)
+            ).rowcount
+            superseded = conn.execute(
+                "DELETE FROM answers WHERE created_at < ("
+                "SELECT MAX(newer.created_at) FROM answers AS newer "
+                "WHERE newer.query_hash = answers.query_hash)"
+            ).rowcount
+        return expired + superseded
@@ -0,0 +1,159 @@
+"""
+Paginated document catalog
+
+Each generation's documents.json is turned once into the catalog sorted
+by upload date and by name, kept for as long as the generation is mapped,
+so a page is a binary search and a slice instead of a pass over every
+document. Pages are addressed by an opaque cursor holding the sort key of
+the last document returned, so paging stays consistent while documents
+are added or deleted, and the store generation serves as the ETag.
+"""
+import base64
+import hashlib
+import heapq
+import json
+import threading
+import weakref
+from bisect import bisect_left, bisect_right
+
+SORTS = ('uploaded', 'name')
+ORDERS = ('desc', 'asc')
+
+_catalogs = weakref.WeakKeyDictionary()
+_catalogs_lock = threading.Lock()
+
+
+def sort_key(sort, document):
+    if sort == 'name':
+        return (document.get('filename', '').lower(), document['doc_id'])
+    return (document.get('uploaded_at') or '', document['doc_id'])
+
+
+class Catalog:
+    """Documents of one generation, pre-sorted for every sort order"""
+
+    def __init__(self, documents):
+        entries = [
+            {'doc_id': doc_id, **{key: value for key, value in info.items() if key != 'rows'}}
+            for doc_id, info in documents.items()
+        ]
+        self._sorted = {}
+        for sort in SORTS:
+            ordered = sorted(entries, key=lambda document: sort_key(sort, document))
+            self._sorted[sort] = (ordered, [sort_key(sort, document) for document in ordered])
+
+    def __len__(self):
+        return len(self._sorted['name'][0])
+
+    def page(self, sort, order, limit, after=None, prefix=None):
+        """
+        Up to `limit` documents following the sort key `after`, and the
+        number of documents matching the filename prefix.
+        """
+        ordered, keys = self._sorted[sort]
+        lo, hi = 0, len(ordered)
+        matches = None
+        if prefix and sort == 'name':
+            # Names sharing the prefix are contiguous in name order
+            lo = bisect_left(keys, (prefix,))
+            hi = bisect_left(keys, (prefix + '\U0010ffff',))
+        elif prefix:
+            matches = [
+                i for i, document in enumerate(ordered)
+                if document.get('filename', '').lower().startswith(prefix)
+            ]
+        total = hi - lo if matches is None else len(matches)
+
+        if after is not None:
+            if order == 'asc':
+                lo = max(lo, bisect_right(keys, after))
+            else:
+                hi = min(hi, bisect_left(keys, after))
+
+        if matches is None:
+            rows = range(lo, hi) if order == 'asc' else range(hi - 1, lo - 1, -1)
+        else:
+            rows = [i for i in matches if lo <= i < hi]
+            rows = rows if order == 'asc' else rows[::-1]
+        return [ordered[i] for i in rows[:limit]], total
+
+
+def catalog_for(generation):
+    """The catalog of a mapped generation, built on first use"""
+    with _catalogs_lock:
+        catalog = _catalogs.get(generation)
+        if catalog is None:
+            catalog = _catalogs[generation] = Catalog(generation.documents)
+        return catalog
+
+
+def encode_cursor(sort, order, key):
+    raw = json.dumps([sort, order, list(key)], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort, order):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        cursor_sort, cursor_order, key = json.loads(raw)
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    if (cursor_sort, cursor_order) != (sort, order):
+        raise ValueError("Cursor belongs to a different sort order")
+    # Both sort keys are (str, doc_id); anything else can't be compared with them
+    if not isinstance(key, list) or len(key) != 2 or not all(isinstance(part, str) for part in key):
+        raise ValueError("Invalid cursor")
+    return tuple(key)
+
+
+def parse_catalog_query(args, default_limit, max_limit):
+    """Validated paging arguments from request query parameters; raises ValueError"""
+    sort = args.get('sort', 'uploaded')
+    if sort not in SORTS:
+        raise ValueError(f"sort must be one of {', '.join(SORTS)}")
+    order = args.get('order', 'desc')
+    if order not in ORDERS:
+        raise ValueError(f"order must be one of {', '.join(ORDERS)}")
+    try:
+        limit = int(args.get('limit', default_limit))
+    except ValueError as e:
+        raise ValueError("limit must be an integer") from e
+    if not 1 <= limit <= max_limit:
+        raise ValueError(f"limit must be between 1 and {max_limit}")
+    cursor = args.get('cursor')
+    return {
+        'sort': sort,
+        'order': order,
+        'limit': limit,
+        'after': decode_cursor(cursor, sort, order) if cursor else None,
+        'prefix': args.get('prefix', '').strip().lower() or None,
+    }
+
+
+def catalog_page(catalogs, sort='uploaded', order='desc', limit=50, after=None, prefix=None):
+    """
+    One page merged from several catalogs (one per shard); 'total' counts
+    every document matching the prefix.
+    """
+    documents, total = [], 0
+    for catalog in catalogs:
+        shard_documents, shard_total = catalog.page(sort, order, limit + 1, after, prefix)
+        documents.append(shard_documents)
+        total += shard_total
+
+    merged = heapq.merge(
+        *documents, key=lambda document: sort_key(sort, document), reverse=order == 'desc'
+    )
+    page = [document for _, document in zip(range(limit + 1), merged)]
+    more = len(page) > limit
+    page = page[:limit]
+    return {
+        'documents': page,
+        'total': total,
+        'next_cursor': encode_cursor(sort, order, sort_key(sort, page[-1])) if more else None,
+    }
+
+
+def catalog_etag(version):
+    """Entity tag of a catalog: changes whenever the store is written"""
+    return hashlib.sha1(version.encode('utf-8')).hexdigest()[:20]
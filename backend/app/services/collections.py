@@ -0,0 +1,61 @@
+"""
+Named collections
+
+Each collection (one college, one batch...) has its own vector store
+directory, so its index and metadata are loaded, cached and evicted
+independently. The default collection is the store at VECTOR_DB_PATH;
+every other one lives in COLLECTIONS_PATH/<name>. Uploaded PDFs are kept
+the same way, in UPLOAD_FOLDER or UPLOAD_FOLDER/<name>, so one filename
+in two collections is two files.
+"""
+import os
+import re
+from app.services.vector_store import read_current
+
+DEFAULT_COLLECTION = 'default'
+
+_NAME_RE = re.compile(r"^[a-z0-9][a-z0-9_-]{0,63}$")
+
+
+def validate_collection_name(name):
+    """Return the collection name, or raise ValueError if it isn't a safe directory name"""
+    if not isinstance(name, str) or not _NAME_RE.match(name):
+        raise ValueError(
+            "Collection names are 1-64 lowercase letters, digits, '-' or '_', "
+            "starting with a letter or digit"
+        )
+    return name
+
+
+def collection_path(config, name):
+    if name == DEFAULT_COLLECTION:
+        return config['VECTOR_DB_PATH']
+    return os.path.join(config['COLLECTIONS_PATH'], name)
+
+
+def collection_config(config, name):
+    """Settings for one collection: the base settings pointed at its store"""
+    name = validate_collection_name(name or DEFAULT_COLLECTION)
+    if name == DEFAULT_COLLECTION:
+        return {**config, 'COLLECTION': name}
+    path = collection_path(config, name)
+    return {
+        **config,
+        'COLLECTION': name,
+        'VECTOR_DB_PATH': path,
+        'METADATA_PATH': path,
+        'UPLOAD_FOLDER': os.path.join(config['UPLOAD_FOLDER'], name),
+    }
+
+
+def list_collections(config):
+    """Names of the collections that have a store on disk"""
+    names = [DEFAULT_COLLECTION] if read_current(config['VECTOR_DB_PATH']) else []
+    root = config['COLLECTIONS_PATH']
+    if os.path.isdir(root):
+        names.extend(
+            name for name in sorted(os.listdir(root))
+            if _NAME_RE.match(name) and name != DEFAULT_COLLECTION
+            and read_current(os.path.join(root, name))
+        )
+    return names
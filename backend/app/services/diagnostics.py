@@ -0,0 +1,272 @@
+"""
+Storage health of vector stores: sizes, tombstones, compaction state and
+a consistency check of vectors against chunk metadata
+
+The report only reads manifests, documents.json and file sizes, so it is
+cheap enough to poll. StoreSnapshot opens a store directory read-only,
+so pointing the tools at a legacy store or a backup never converts it.
+
+verify_generation() reads every row once: vector shape and finiteness,
+chunk offsets, each chunk's doc_id against the document owning its row,
+page numbers and derived coarse vectors.
+"""
+import json
+import os
+import time
+from app.services.vector_store import COARSE_BLOCK_ROWS, GENERATION_PREFIX, Generation, read_current
+
+# File of the single-index format used before generations
+LEGACY_INDEX_FILE = 'faiss_index.bin'
+
+# Errors listed per verification; the rest are only counted
+MAX_REPORTED_ERRORS = 20
+
+
+def _directory_bytes(path):
+    return sum(
+        os.path.getsize(os.path.join(dirpath, name))
+        for dirpath, _, names in os.walk(path)
+        for name in names
+    )
+
+
+class StoreSnapshot:
+    """
+    Read-only view of a store with the VectorService attributes the
+    report uses; unlike VectorService it never migrates a legacy store
+    """
+
+    def __init__(self, config, shard_configs=None):
+        self.config = config
+        self.root = config['VECTOR_DB_PATH']
+        name = read_current(self.root)
+        self.generation = Generation(self.root, name) if name and not shard_configs else None
+        self._shards = [StoreSnapshot(shard) for shard in shard_configs] if shard_configs else None
+
+    @classmethod
+    def from_config(cls, config):
+        from app.services.sharding import shard_config, shard_urls
+
+        urls = shard_urls(config)
+        return cls(config, [shard_config(config, index) for index in range(len(urls))] or None)
+
+    @property
+    def dimension(self):
+        if self._shards is not None:
+            return next((shard.dimension for shard in self._shards if shard.generation),
+                        self.config['EMBEDDING_DIMENSION'])
+        return self.generation.dimension if self.generation else self.config['EMBEDDING_DIMENSION']
+
+    def version(self):
+        if self._shards is not None:
+            return '+'.join(shard.version() for shard in self._shards)
+        if self.generation:
+            return self.generation.name
+        return 'legacy' if self.legacy else 'empty'
+
+    @property
+    def legacy(self):
+        """True for a store still in the pre-generation format"""
+        return self.generation is None and os.path.exists(os.path.join(self.root, LEGACY_INDEX_FILE))
+
+
+def _shards_of(service):
+    if isinstance(service, StoreSnapshot):
+        return service._shards
+    return service.shards() if hasattr(service, 'shards') else None
+
+
+def superseded_generations(root, current):
+    """Generations kept on disk besides the live one, awaiting removal"""
+    if not os.path.isdir(root):
+        return {}
+    return {
+        name: _directory_bytes(os.path.join(root, name))
+        for name in sorted(os.listdir(root))
+        if name.startswith(GENERATION_PREFIX) and name != current
+        and os.path.isdir(os.path.join(root, name))
+    }
+
+
+def store_report(service):
+    """Diagnostics of one (unsharded) store"""
+    generation = service.generation
+    config = service.config
+    coarse_dimension = config['COARSE_SEARCH_DIMENSION']
+    report = {
+        'path': service.root,
+        'generation': service.version(),
+        'index_type': 'mmap_flat_l2',
+        'index_params': {
+            'metric': 'l2',
+            'exact': not 0 < coarse_dimension < service.dimension,
+            'coarse_search_dimension': coarse_dimension if 0 < coarse_dimension < service.dimension else None,
+            'rerank_candidates': config['RERANK_CANDIDATES'],
+            'compact_tombstone_ratio': config['COMPACT_TOMBSTONE_RATIO'],
+        },
+        'dimension': service.dimension,
+    }
+    if generation is None:
+        if getattr(service, 'legacy', False):
+            # Reported as found; VectorService converts it when the app opens the store
+            return {**report, 'index_type': 'legacy_faiss', 'legacy': True, 'vector_count': 0,
+                    'metadata_count': 0, 'document_count': 0}
+        return {**report, 'vector_count': 0, 'metadata_count': 0, 'document_count': 0}
+
+    sizes = generation.file_sizes()
+    disk_bytes = _directory_bytes(generation.path)
+    tombstoned = generation.count - generation.live_count
+    superseded = superseded_generations(service.root, generation.name)
+    return {
+        **report,
+        'format': generation.manifest.get('format', 1),
+        'created_at': generation.manifest.get('created_at'),
+        'compacted_at': generation.manifest.get('compacted_at'),
+        'vector_count': generation.count,
+        'metadata_count': len(generation.offsets) - 1,
+        'live_count': generation.live_count,
+        'document_count': len(generation.documents),
+        'tombstoned_rows': tombstoned,
+        'tombstone_ratio': tombstoned / generation.count if generation.count else 0.0,
+        'bytes_per_vector': sizes.get('vectors.npy', 0) / generation.count if generation.count else 0.0,
+        'disk_bytes_per_vector': disk_bytes / generation.count if generation.count else 0.0,
+        'disk_bytes': disk_bytes,
+        'file_bytes': sizes,
+        'mapped_bytes': generation.memory_bytes(),
+        'heap_bytes': sizes.get('documents.json', 0) + (
+            generation.count if generation.live_mask is not None else 0
+        ),
+        'coarse_dimensions': sorted(
+            int(name[len('coarse-'):-len('.npy')])
+            for name in os.listdir(generation.path)
+            if name.startswith('coarse-') and name.endswith('.npy')
+        ),
+        'superseded_generations': len(superseded),
+        'superseded_bytes': sum(superseded.values()),
+    }
+
+
+def verify_generation(generation):
+    """Check every row of a generation in one pass; returns a summary with 'ok' and 'errors'"""
+    import numpy as np
+
+    start = time.perf_counter()
+    errors = []
+    error_count = 0
+
+    def error(message):
+        nonlocal error_count
+        error_count += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append(message)
+
+    count, dimension = generation.count, generation.dimension
+    if generation.vectors.shape != (count, dimension):
+        error(f"vectors.npy has shape {generation.vectors.shape}, manifest says ({count}, {dimension})")
+    if generation.vectors.dtype != np.float32:
+        error(f"vectors.npy has dtype {generation.vectors.dtype}, expected float32")
+
+    # Which document owns each row; -1 marks tombstoned rows
+    doc_ids = list(generation.documents)
+    owner = np.full(count, -1, dtype='int32')
+    for index, doc_id in enumerate(doc_ids):
+        info = generation.documents[doc_id]
+        row_start, row_end = info.get('rows', (0, 0))
+        if not 0 <= row_start <= row_end <= count:
+            error(f"{doc_id}: rows [{row_start}, {row_end}) outside 0..{count}")
+            continue
+        if info.get('chunk_count', row_end - row_start) != row_end - row_start:
+            error(f"{doc_id}: chunk_count {info.get('chunk_count')} but {row_end - row_start} rows")
+        if (owner[row_start:row_end] >= 0).any():
+            error(f"{doc_id}: rows [{row_start}, {row_end}) overlap another document")
+        owner[row_start:row_end] = index
+
+    tombstoned = int(np.count_nonzero(owner < 0))
+    recorded = generation.manifest.get('tombstoned_rows')
+    if recorded is not None and recorded != tombstoned:
+        error(f"manifest records {recorded} tombstoned rows, found {tombstoned}")
+
+    offsets = generation.offsets
+    chunks_size = os.path.getsize(os.path.join(generation.path, 'chunks.jsonl')) if count else 0
+    offsets_ok = len(offsets) == count + 1
+    if not offsets_ok:
+        error(f"chunk_offsets.npy has {len(offsets)} entries, expected {count + 1}")
+    elif count:
+        if offsets[0] != 0 or offsets[-1] != chunks_size:
+            error(f"chunk offsets span {offsets[0]}..{offsets[-1]}, chunks.jsonl has {chunks_size} bytes")
+            offsets_ok = False
+        elif (np.diff(offsets) <= 0).any():
+            error("chunk offsets are not strictly increasing")
+            offsets_ok = False
+
+    pages = generation.pages
+    if len(pages) != count:
+        error(f"pages.npy has {len(pages)} entries, expected {count}")
+
+    if offsets_ok:
+        for row in range(count):
+            try:
+                chunk = json.loads(generation.chunk_bytes(int(offsets[row]), int(offsets[row + 1])))
+            except ValueError:
+                error(f"row {row}: chunk metadata is not valid JSON")
+                continue
+            if owner[row] >= 0 and chunk.get('doc_id') != doc_ids[owner[row]]:
+                error(f"row {row}: chunk belongs to {chunk.get('doc_id')}, row range to {doc_ids[owner[row]]}")
+            if row < len(pages) and pages[row] != chunk.get('page', 0):
+                error(f"row {row}: pages.npy says page {pages[row]}, chunk says {chunk.get('page', 0)}")
+
+    for block_start in range(0, min(count, len(generation.vectors)), COARSE_BLOCK_ROWS):
+        block = np.asarray(generation.vectors[block_start:block_start + COARSE_BLOCK_ROWS])
+        bad = np.flatnonzero(~np.isfinite(block).all(axis=1))
+        for row in bad[:MAX_REPORTED_ERRORS]:
+            error(f"row {block_start + int(row)}: vector has NaN or infinite values")
+
+    for name in os.listdir(generation.path):
+        if name.startswith('coarse-') and name.endswith('.npy'):
+            coarse = np.load(os.path.join(generation.path, name), mmap_mode='r')
+            expected = (count, int(name[len('coarse-'):-len('.npy')]))
+            if coarse.shape != expected:
+                error(f"{name} has shape {coarse.shape}, expected {expected}")
+
+    return {
+        'ok': error_count == 0,
+        'generation': generation.name,
+        'rows_checked': count,
+        'tombstoned_rows': tombstoned,
+        'error_count': error_count,
+        'errors': errors,
+        'seconds': time.perf_counter() - start,
+    }
+
+
+def diagnostics(service, verify=False):
+    """Report for a store (with one entry per shard if sharded), optionally verified"""
+    shards = _shards_of(service)
+    if shards is None:
+        report = store_report(service)
+        if verify:
+            if service.generation:
+                report['verify'] = verify_generation(service.generation)
+            else:
+                report['verify'] = {'ok': True, 'rows_checked': 0, 'error_count': 0, 'errors': []}
+                if report.get('legacy'):
+                    report['verify']['skipped'] = 'legacy stores are verified after conversion'
+        return report
+
+    reports = [diagnostics(shard, verify) for shard in shards]
+    totals = {
+        key: sum(report.get(key, 0) for report in reports)
+        for key in ('vector_count', 'metadata_count', 'live_count', 'document_count',
+                    'tombstoned_rows', 'disk_bytes', 'mapped_bytes', 'superseded_bytes')
+    }
+    result = {
+        'generation': service.version(),
+        'index_type': 'sharded_mmap_flat_l2',
+        'dimension': service.dimension,
+        **totals,
+        'tombstone_ratio': totals['tombstoned_rows'] / totals['vector_count'] if totals['vector_count'] else 0.0,
+        'shards': reports,
+    }
+    if verify:
+        result['verify'] = {'ok': all(report['verify']['ok'] for report in reports)}
+    return result
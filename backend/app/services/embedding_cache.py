@@ -0,0 +1,88 @@
+"""
+Embedding cache backed by SQLite
+
+Vectors are keyed by the sha256 of the embedding provider, model,
+dimension, task type and the exact text, so re-chunking, re-uploads and
+evaluation sweeps only send the model the chunks whose text changed.
+Vectors are stored as float32 bytes, the precision the vector store keeps.
+
+The cache holds at most EMBEDDING_CACHE_MAX_ENTRIES vectors; once full,
+the oldest written are evicted first. It is off by default and enabled
+by the evaluation harness (benchmarks/evaluate_retrieval.py).
+"""
+import hashlib
+from array import array
+from app.services.sqlite_cache import cache_connection
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS embeddings ("
+    "text_hash TEXT PRIMARY KEY, vector BLOB NOT NULL)",
+)
+
+# SQLite's default limit on host parameters per statement is 999
+_LOOKUP_BATCH = 500
+
+
+class EmbeddingCache:
+    """Persistent cache of text embeddings for one provider, model and dimension"""
+
+    def __init__(self, path, provider, model, dimension, max_entries=None):
+        self.path = path
+        self.namespace = f"{provider}/{model}/{dimension}"
+        self.max_entries = max_entries
+
+    @classmethod
+    def from_config(cls, config):
+        """The cache for these settings, or None if disabled"""
+        if not config['EMBEDDING_CACHE_ENABLED']:
+            return None
+        return cls(
+            config['EMBEDDING_CACHE_PATH'],
+            config['EMBEDDING_PROVIDER'],
+            config['EMBEDDING_MODEL'],
+            config['EMBEDDING_DIMENSION'],
+            max_entries=config['EMBEDDING_CACHE_MAX_ENTRIES']
+        )
+
+    def _connection(self):
+        return cache_connection(self.path, _SCHEMA)
+
+    def _key(self, text, task_type):
+        return hashlib.sha256(f"{self.namespace}/{task_type}\n{text}".encode('utf-8')).hexdigest()
+
+    def get_many(self, texts, task_type="RETRIEVAL_DOCUMENT"):
+        """One vector (list of floats) or None per text"""
+        keys = [self._key(text, task_type) for text in texts]
+        found = {}
+        conn = self._connection()
+        for start in range(0, len(keys), _LOOKUP_BATCH):
+            batch = keys[start:start + _LOOKUP_BATCH]
+            rows = conn.execute(
+                f"SELECT text_hash, vector FROM embeddings WHERE text_hash IN ({','.join('?' * len(batch))})",
+                batch
+            ).fetchall()
+            found.update(rows)
+
+        vectors = []
+        for key in keys:
+            blob = found.get(key)
+            vectors.append(array('f', blob).tolist() if blob is not None else None)
+        return vectors
+
+    def put_many(self, texts, vectors, task_type="RETRIEVAL_DOCUMENT"):
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (text_hash, vector) VALUES (?, ?)",
+                [
+                    (self._key(text, task_type), array('f', vector).tobytes())
+                    for text, vector in zip(texts, vectors)
+                ]
+            )
+            if self.max_entries:
+                # INSERT OR REPLACE gives every write the next rowid, so the
+                # newest max_entries rows are the last max_entries rowids
+                conn.execute(
+                    "DELETE FROM embeddings WHERE rowid <= (SELECT MAX(rowid) FROM embeddings) - ?",
+                    (self.max_entries,)
+                )
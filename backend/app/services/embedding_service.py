@@ -1,70 +1,75 @@
 """
-Gemini embedding generation service
+Embedding generation service
 """
-from google import genai
-from google.genai import types
-from flask import current_app
-import time
+import logging
+from app.config.settings import resolve_config
+from app.services.embedding_cache import EmbeddingCache
+from app.services.providers import get_embedding_provider
+from app.utils.metrics import EMBEDDING_CACHE, STAGE_ITEMS, timed
+
+logger = logging.getLogger(__name__)
 
 class EmbeddingService:
-    """Service for generating embeddings using Gemini"""
+    """Service for generating embeddings with the configured provider"""
     
-    def __init__(self):
-        """Initialize Gemini client"""
-        self.client = genai.Client(
-            api_key=current_app.config['GEMINI_API_KEY']
-        )
-        self.model = current_app.config['EMBEDDING_MODEL']
-        self.dimension = current_app.config['EMBEDDING_DIMENSION']
+    def __init__(self, config=None):
+        """Initialize embedding provider"""
+        self.config = resolve_config(config)
+        self.provider = get_embedding_provider(self.config)
+        self.model = self.config['EMBEDDING_MODEL']
+        self.dimension = self.config['EMBEDDING_DIMENSION']
     
     def generate_embeddings(self, chunks, task_type="RETRIEVAL_DOCUMENT"):
-        """Generate embeddings for text chunks"""
+        """Generate embeddings for text chunks, reusing cached vectors of unchanged texts"""
         try:
             texts = [chunk['text'] for chunk in chunks]
+            cache = EmbeddingCache.from_config(self.config)
+            if cache is None:
+                all_embeddings = [None] * len(texts)
+            else:
+                all_embeddings = cache.get_many(texts, task_type)
+            missing = [i for i, embedding in enumerate(all_embeddings) if embedding is None]
+            if cache is not None:
+                EMBEDDING_CACHE.inc(len(texts) - len(missing), result='hit')
+                EMBEDDING_CACHE.inc(len(missing), result='miss')
             
-            # Generate embeddings in batches
-            batch_size = 100
-            all_embeddings = []
-            
-            for i in range(0, len(texts), batch_size):
-                batch_texts = texts[i:i + batch_size]
-                
-                # Updated for text-embedding-004
-                result = self.client.models.embed_content(
-                    model=self.model,
-                    contents=batch_texts,
-                    config=types.EmbedContentConfig(
-                        task_type=task_type,
-                        output_dimensionality=self.dimension
-                    )
-                )
+            if missing:
+                missing_texts = [texts[i] for i in missing]
+                with timed('batch_embed'):
+                    embedded = self.provider.embed_documents(missing_texts, task_type=task_type)
+                for i, embedding in zip(missing, embedded):
+                    all_embeddings[i] = embedding
+                if cache is not None:
+                    cache.put_many(missing_texts, embedded, task_type)
                 
-                batch_embeddings = [e.values for e in result.embeddings]
-                all_embeddings.extend(batch_embeddings)
-                
-                if i + batch_size < len(texts):
-                    time.sleep(0.5)
+                STAGE_ITEMS.inc(len(embedded), stage='batch_embed')
             
-            current_app.logger.info(f"Generated {len(all_embeddings)} embeddings")
+            logger.info(f"Generated {len(missing)} embeddings ({len(texts) - len(missing)} cached)")
             return all_embeddings
             
         except Exception as e:
-            current_app.logger.error(f"Error generating embeddings: {str(e)}")
-            raise Exception(f"Failed to generate embeddings: {str(e)}")
+            logger.error(f"Error generating embeddings: {str(e)}")
+            raise Exception(f"Failed to generate embeddings: {str(e)}") from e
     
     def generate_query_embedding(self, query):
         """Generate embedding for a query"""
         try:
-            result = self.client.models.embed_content(
-                model=self.model,
-                contents=query,
-                config=types.EmbedContentConfig(
-                    task_type="RETRIEVAL_QUERY",
-                    output_dimensionality=self.dimension
-                )
-            )
-            return result.embeddings[0].values
+            with timed('query_embed'):
+                return self.provider.embed_query(query)
+            
+        except Exception as e:
+            logger.error(f"Error generating query embedding: {str(e)}")
+            raise Exception(f"Failed to generate query embedding: {str(e)}") from e
+    
+    def generate_query_embeddings(self, queries):
+        """Generate embeddings for several queries in one request"""
+        try:
+            with timed('query_embed'):
+                embeddings = self.provider.embed_queries(queries)
+            
+            STAGE_ITEMS.inc(len(embeddings), stage='query_embed')
+            return embeddings
             
         except Exception as e:
-            current_app.logger.error(f"Error generating query embedding: {str(e)}")
-            raise Exception(f"Failed to generate query embedding: {str(e)}")
+            logger.error(f"Error generating query embeddings: {str(e)}")
+            raise Exception(f"Failed to generate query embeddings: {str(e)}") from e
@@ -1,47 +1,30 @@
 """
-Text generation service using Gemini
+Answer generation service
 """
-from google import genai
-from google.genai import types
-from flask import current_app
-from app.config.prompts import create_rag_prompt
+import logging
+from app.config.settings import resolve_config
+from app.services.providers import get_generation_provider
+from app.utils.metrics import timed
+
+logger = logging.getLogger(__name__)
 
 class GenerationService:
-    """Service for generating answers using Gemini"""
+    """Service for generating answers with the configured provider"""
     
-    def __init__(self):
-        """Initialize Gemini client"""
-        self.client = genai.Client(
-            api_key=current_app.config['GEMINI_API_KEY']
-        )
-        self.model = current_app.config['GENERATION_MODEL']
+    def __init__(self, config=None):
+        """Initialize generation provider"""
+        self.config = resolve_config(config)
+        self.provider = get_generation_provider(self.config)
+        self.model = self.config['GENERATION_MODEL']
     
     def generate_answer(self, query, relevant_chunks):
         """Generate answer based on retrieved context"""
         try:
-            # Combine chunks into context
-            context = "\n\n".join([
-                f"[From {chunk.get('document', 'Unknown')} - Page {chunk.get('page', 'N/A')}]\n{chunk['text']}"
-                for chunk in relevant_chunks
-            ])
-            
-            # Create prompt
-            prompt = create_rag_prompt(context, query)
-            
-            # Generate response
-            response = self.client.models.generate_content(
-                model=self.model,
-                contents=prompt,
-                config=types.GenerateContentConfig(
-                    temperature=current_app.config['TEMPERATURE'],
-                    max_output_tokens=current_app.config['MAX_OUTPUT_TOKENS']
-                )
-            )
-            
-            answer = response.text
-            current_app.logger.info("Generated answer successfully")
+            with timed('generate'):
+                answer = self.provider.generate_answer(query, relevant_chunks)
+            logger.info("Generated answer successfully")
             return answer
             
         except Exception as e:
-            current_app.logger.error(f"Error generating answer: {str(e)}")
-            raise Exception(f"Answer generation failed: {str(e)}")
+            logger.error(f"Error generating answer: {str(e)}")
+            raise Exception(f"Answer generation failed: {str(e)}") from e
@@ -0,0 +1,17 @@
+"""
+Adapters between the provider interface and LangChain
+"""
+from langchain_core.embeddings import Embeddings
+
+
+class ProviderEmbeddings(Embeddings):
+    """LangChain adapter for an EmbeddingProvider"""
+
+    def __init__(self, provider):
+        self.provider = provider
+
+    def embed_documents(self, texts):
+        return [list(map(float, v)) for v in self.provider.embed_documents(texts)]
+
+    def embed_query(self, text):
+        return list(map(float, self.provider.embed_query(text)))
@@ -1,52 +1,89 @@
 """
 PDF extraction and processing service
 """
-import fitz  # PyMuPDF
-from flask import current_app
+import logging
+import os
+from app.config.settings import resolve_config
+from app.services.text_cache import ExtractedTextCache, content_hash
 from app.utils.text_splitter import chunk_text
+from app.utils.metrics import EXTRACTED_TEXT_CACHE, STAGE_ITEMS, timed
+
+logger = logging.getLogger(__name__)
 
 class PDFService:
     """Service for handling PDF operations"""
     
+    def __init__(self, config=None):
+        self.config = resolve_config(config)
+    
+    def extract(self, pdf_path):
+        """
+        Content hash and {page_number: text} of a PDF, from the extracted
+        text cache when it holds this PDF
+        """
+        digest = content_hash(pdf_path)
+        cache = ExtractedTextCache.from_config(self.config)
+        if cache is not None:
+            pdf_text = cache.get(digest)
+            if pdf_text is not None:
+                EXTRACTED_TEXT_CACHE.inc(result='hit')
+                logger.info(f"Using cached text of {len(pdf_text)} pages")
+                return digest, pdf_text
+            EXTRACTED_TEXT_CACHE.inc(result='miss')
+        
+        pdf_text = self.extract_text(pdf_path)
+        if cache is not None:
+            try:
+                cache.put(digest, pdf_text, os.path.basename(pdf_path))
+            except OSError as e:
+                logger.warning(f"Could not cache extracted text: {str(e)}")
+        return digest, pdf_text
+    
     def extract_text(self, pdf_path):
         """Extract text from PDF file"""
         try:
-            document = fitz.open(pdf_path)
-            pdf_text = {}
+            import fitz  # PyMuPDF
             
-            for page_num in range(document.page_count):
-                page = document.load_page(page_num)
-                text = page.get_text()
+            with timed('extract'):
+                document = fitz.open(pdf_path)
+                pdf_text = {}
                 
-                if text.strip():  # Only add non-empty pages
-                    pdf_text[page_num + 1] = text
-            
-            document.close()
+                for page_num in range(document.page_count):
+                    page = document.load_page(page_num)
+                    text = page.get_text()
+                    
+                    if text.strip():  # Only add non-empty pages
+                        pdf_text[page_num + 1] = text
+                
+                document.close()
             
-            current_app.logger.info(f"Extracted text from {len(pdf_text)} pages")
+            STAGE_ITEMS.inc(len(pdf_text), stage='extract')
+            logger.info(f"Extracted text from {len(pdf_text)} pages")
             return pdf_text
             
         except Exception as e:
-            current_app.logger.error(f"Error extracting PDF text: {str(e)}")
+            logger.error(f"Error extracting PDF text: {str(e)}")
             raise Exception(f"Failed to extract PDF: {str(e)}")
     
     def chunk_text(self, pdf_text):
         """Convert PDF text to chunks"""
         all_chunks = []
         
-        for page_num, text in pdf_text.items():
-            if not text.strip():
-                continue
-            
-            page_chunks = chunk_text(text)
-            
-            # Add metadata to each chunk
-            for chunk in page_chunks:
-                all_chunks.append({
-                    'text': chunk,
-                    'page': page_num,
-                    'length': len(chunk)
-                })
+        with timed('chunk'):
+            for page_num, text in pdf_text.items():
+                if not text.strip():
+                    continue
+                
+                page_chunks = chunk_text(text, self.config)
+                
+                # Add metadata to each chunk
+                for chunk in page_chunks:
+                    all_chunks.append({
+                        'text': chunk,
+                        'page': page_num,
+                        'length': len(chunk)
+                    })
         
-        current_app.logger.info(f"Created {len(all_chunks)} chunks")
+        STAGE_ITEMS.inc(len(all_chunks), stage='chunk')
+        logger.info(f"Created {len(all_chunks)} chunks")
         return all_chunks
@@ -0,0 +1,207 @@
+"""
+Answer pre-warming after content updates
+
+Cached answers are keyed by the store version, so every upload or delete
+leaves the answer cache cold. After a change, the most frequently (or
+most recently) asked questions of the collection are taken from the query
+log and answered again against the new store, filling the answer cache
+before students ask them.
+
+Passes are debounced by PREWARM_DELAY so a burst of uploads warms once,
+run in the background at no more than PREWARM_CONCURRENCY questions at a
+time and PREWARM_RATE questions per second, and a pass is abandoned as
+soon as the store changes again or the model API becomes unavailable.
+The warmer's own questions are not written to the query log.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from app.services.answer_cache import normalize_query
+from app.services.collections import DEFAULT_COLLECTION
+from app.utils.metrics import PREWARMED_ANSWERS
+from app.utils.query_log import log_files, read_entries
+
+logger = logging.getLogger(__name__)
+
+STRATEGIES = ('frequent', 'recent')
+
+
+def recent_entries(directory, limit):
+    """Up to `limit` of the newest query log entries, oldest first"""
+    if not os.path.isdir(directory):
+        return []
+    # Newest files first, so a long history isn't read to find the latest questions
+    paths = sorted(log_files(directory), key=os.path.getmtime, reverse=True)
+    entries = []
+    for path in paths:
+        try:
+            entries.extend(read_entries([path]))
+        except OSError as e:
+            logger.warning(f"Skipping unreadable query log {path}: {str(e)}")
+        if len(entries) >= limit:
+            break
+    entries.sort(key=lambda entry: entry.get('ts', 0))
+    return entries[-limit:]
+
+
+def popular_questions(entries, count, strategy='frequent', collection=None):
+    """
+    The `count` questions to warm, as {'query', 'top_k', 'filters'}: by
+    how often they were asked (ties to the most recent), or by recency.
+    Questions differing only in case and spacing count as one, and are
+    warmed as last asked.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"PREWARM_STRATEGY must be one of {', '.join(STRATEGIES)}")
+    asked = Counter()
+    latest = {}
+    for entry in entries:
+        if entry.get('c') != collection or not entry.get('q'):
+            continue
+        key = (normalize_query(entry['q']), entry.get('k'), json.dumps(entry.get('f') or {}, sort_keys=True))
+        asked[key] += 1
+        latest[key] = entry
+
+    if strategy == 'recent':
+        order = sorted(latest, key=lambda key: latest[key].get('ts', 0), reverse=True)
+    else:
+        order = sorted(latest, key=lambda key: (asked[key], latest[key].get('ts', 0)), reverse=True)
+    return [
+        {'query': latest[key]['q'], 'top_k': latest[key].get('k'), 'filters': latest[key].get('f')}
+        for key in order[:count]
+    ]
+
+
+class Prewarmer:
+    """Debounced background re-answering of popular questions for one collection"""
+
+    def __init__(self, engine):
+        from app.services.rag_engine import RAGEngine
+
+        self.config = engine.config
+        self.collection = None if engine.collection_name == DEFAULT_COLLECTION else engine.collection_name
+        self.engine = RAGEngine({**engine.config, 'QUERY_LOG_ENABLED': False})
+        self.lock = threading.Lock()
+        self._timer = None
+        self._pass = 0
+        self.state = {'status': 'idle'}
+
+    def schedule(self, delay=None):
+        """(Re)start the countdown to a pass; a pass in progress is abandoned"""
+        delay = self.config['PREWARM_DELAY'] if delay is None else delay
+        with self.lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._pass += 1
+            self._timer = threading.Timer(delay, self.run, args=(self._pass,))
+            self._timer.daemon = True
+            self._timer.name = 'answer-prewarm'
+            self._timer.start()
+            self.state = {**self.state, 'status': 'scheduled', 'scheduled_at': datetime.now().isoformat()}
+
+    def _current(self, number):
+        return number is None or number == self._pass
+
+    def run(self, number=None):
+        """Warm the popular questions now; returns the pass summary"""
+        config = self.config
+        entries = recent_entries(config['QUERY_LOG_DIR'], config['PREWARM_LOG_ENTRIES'])
+        questions = popular_questions(entries, config['PREWARM_TOP_N'], config['PREWARM_STRATEGY'], self.collection)
+        summary = {'status': 'running', 'started_at': datetime.now().isoformat(), 'questions': len(questions),
+                   'warmed': 0, 'cached': 0, 'failed': 0}
+        with self.lock:
+            if not self._current(number):
+                return self.state
+            self.state = summary
+
+        interval = 1.0 / config['PREWARM_RATE'] if config['PREWARM_RATE'] > 0 else 0.0
+        slots = threading.BoundedSemaphore(config['PREWARM_CONCURRENCY'])
+        stop = threading.Event()
+        start = time.perf_counter()
+
+        def warm(question):
+            from app.services.rag_engine import ModelUnavailableError
+
+            try:
+                result = self.engine.answer(question['query'], top_k=question['top_k'], filters=question['filters'])
+                if result.get('degraded') or result.get('partial'):
+                    # Not cacheable while the model API or a shard is down; more questions would only add load
+                    outcome = 'failed'
+                    stop.set()
+                else:
+                    outcome = 'cached' if result.get('cached') else 'warmed'
+            except ModelUnavailableError:
+                outcome = 'failed'
+                stop.set()
+            except Exception as e:
+                logger.warning(f"Pre-warming '{question['query'][:80]}' failed: {str(e)}")
+                outcome = 'failed'
+            finally:
+                slots.release()
+            PREWARMED_ANSWERS.inc(result=outcome)
+            with self.lock:
+                summary[outcome] += 1
+
+        with ThreadPoolExecutor(max_workers=config['PREWARM_CONCURRENCY'], thread_name_prefix='prewarm') as pool:
+            for position, question in enumerate(questions):
+                # Rate limit: question n starts no earlier than n * interval into the pass
+                delay = start + position * interval - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                slots.acquire()
+                if stop.is_set() or not self._current(number):
+                    slots.release()
+                    break
+                pool.submit(warm, question)
+
+        with self.lock:
+            if stop.is_set():
+                status = 'stopped'
+            elif not self._current(number):
+                status = 'superseded'
+            else:
+                status = 'done'
+            summary.update({'status': status, 'seconds': round(time.perf_counter() - start, 3),
+                            'finished_at': datetime.now().isoformat()})
+            if self._current(number):
+                self.state = summary
+        logger.info(
+            f"Pre-warm {status}: {summary['warmed']} answers generated, {summary['cached']} already cached, "
+            f"{summary['failed']} failed of {len(questions)} questions"
+        )
+        return summary
+
+    def status(self):
+        with self.lock:
+            return dict(self.state)
+
+
+_prewarmers = {}
+_prewarmers_lock = threading.Lock()
+
+# A forked child inherits the registry but not the timer threads
+os.register_at_fork(after_in_child=_prewarmers.clear)
+
+
+def get_prewarmer(engine):
+    """Process-wide warmer of an engine's collection"""
+    key = os.path.abspath(engine.config['VECTOR_DB_PATH'])
+    with _prewarmers_lock:
+        if key not in _prewarmers:
+            _prewarmers[key] = Prewarmer(engine)
+        return _prewarmers[key]
+
+
+def prewarm_enabled(config):
+    return config['PREWARM_ENABLED'] and config['ANSWER_CACHE_ENABLED'] and config['PREWARM_TOP_N'] > 0
+
+
+def schedule_prewarm(engine):
+    """Warm the collection's popular questions after its content changed, if enabled"""
+    if prewarm_enabled(engine.config):
+        get_prewarmer(engine).schedule()
@@ -0,0 +1,444 @@
+"""
+Pluggable embedding and generation backends
+"""
+import hashlib
+import logging
+import math
+import re
+import threading
+import time
+from app.config.prompts import create_rag_prompt
+from app.utils.resilience import (
+    RetryPolicy,
+    call_with_retries,
+    get_breaker,
+    get_latency_tracker,
+    hedged_call,
+)
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[+#.][a-z0-9]+)*")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+|\n{2,}")
+
+
+def tokenize(text):
+    """Lowercase word tokens used by the local backends"""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _complete_sentences(text):
+    """
+    Sentences of a chunk without the pieces cut at its edges: chunks are
+    split at spaces, so a first piece starting in lowercase and a last one
+    without closing punctuation are parts of sentences
+    """
+    sentences = [" ".join(piece.split()) for piece in _SENTENCE_RE.split(text)]
+    sentences = [sentence for sentence in sentences if sentence]
+    if len(sentences) > 1 and not sentences[-1].endswith(('.', '!', '?')):
+        sentences.pop()
+    if len(sentences) > 1 and not sentences[0][0].isupper() and not sentences[0][0].isdigit():
+        sentences.pop(0)
+    return sentences
+
+
+class EmbeddingProvider:
+    """Interface for turning texts into vectors"""
+
+    name = 'base'
+
+    def embed_documents(self, texts, task_type="RETRIEVAL_DOCUMENT"):
+        """Embed a list of texts, returning one vector per text"""
+        raise NotImplementedError
+
+    def embed_query(self, text):
+        """Embed a single search query"""
+        return self.embed_documents([text], task_type="RETRIEVAL_QUERY")[0]
+
+    def embed_queries(self, texts):
+        """Embed several search queries together"""
+        return self.embed_documents(texts, task_type="RETRIEVAL_QUERY")
+
+
+class GenerationProvider:
+    """Interface for answering a query from retrieved chunks"""
+
+    name = 'base'
+
+    def generate_answer(self, query, relevant_chunks):
+        """Return the answer text for query given its context chunks"""
+        raise NotImplementedError
+
+
+def build_context(relevant_chunks):
+    """Combine retrieved chunks into a prompt context block"""
+    return "\n\n".join([
+        f"[From {chunk.get('document', 'Unknown')} - Page {chunk.get('page', 'N/A')}]\n{chunk['text']}"
+        for chunk in relevant_chunks
+    ])
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def create_gemini_client(api_key, base_url=None, timeout=None, max_connections=None):
+    """
+    Shared Gemini client for this process, optionally pointed at a
+    different endpoint. Clients keep their HTTP connection pool, so reusing
+    them avoids a TLS handshake per request.
+    """
+    key = (api_key, base_url, timeout, max_connections)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                from google import genai
+                from google.genai import types
+
+                options = {}
+                if base_url:
+                    options['base_url'] = base_url
+                if timeout:
+                    options['timeout'] = int(timeout * 1000)
+                if max_connections:
+                    import httpx
+                    options['client_args'] = {'limits': httpx.Limits(
+                        max_connections=max_connections,
+                        max_keepalive_connections=max_connections
+                    )}
+                http_options = types.HttpOptions(**options) if options else None
+                client = _clients[key] = genai.Client(api_key=api_key, http_options=http_options)
+    return client
+
+
+def is_transient_error(exc):
+    """True for errors worth retrying: rate limits, 5xx and network failures"""
+    code = getattr(exc, 'code', None)
+    if isinstance(code, int):
+        return code == 429 or code >= 500
+    try:
+        import httpx
+        if isinstance(exc, httpx.TransportError):
+            return True
+    except ImportError:
+        pass
+    return isinstance(exc, (ConnectionError, TimeoutError))
+
+
+def is_upstream_unavailable(exc):
+    """
+    True if exc, or an exception it was raised from, means the model API is
+    unavailable (open circuit or transient failures that outlasted retries)
+    """
+    from app.utils.resilience import CircuitOpenError
+
+    while exc is not None:
+        if isinstance(exc, CircuitOpenError) or is_transient_error(exc):
+            return True
+        exc = exc.__cause__
+    return False
+
+
+def retry_after_seconds(exc):
+    """Server-suggested delay from a 429 response, if any"""
+    headers = getattr(getattr(exc, 'response', None), 'headers', None)
+    value = headers.get('retry-after') if headers else None
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+class GeminiProviderMixin:
+    """Shared client, retries and circuit breaking for Gemini providers"""
+
+    def _setup_resilience(self, config, breaker_name):
+        self.client = create_gemini_client(
+            config['GEMINI_API_KEY'],
+            config['GEMINI_BASE_URL'],
+            config['GEMINI_TIMEOUT'],
+            config['GEMINI_MAX_CONNECTIONS']
+        )
+        self.retry_policy = RetryPolicy(
+            config['GEMINI_MAX_RETRIES'] + 1,
+            config['GEMINI_RETRY_BASE_DELAY'],
+            config['GEMINI_RETRY_MAX_DELAY']
+        )
+        self.breaker = get_breaker(
+            breaker_name,
+            config['BREAKER_FAILURE_THRESHOLD'],
+            config['BREAKER_RECOVERY_TIMEOUT']
+        )
+
+    def _call(self, func, name):
+        """Call upstream through the circuit breaker with bounded retries"""
+        return self.breaker.call(
+            lambda: call_with_retries(func, self.retry_policy, is_transient_error, name, retry_after_seconds),
+            is_failure=is_transient_error
+        )
+
+
+class GeminiEmbeddingProvider(GeminiProviderMixin, EmbeddingProvider):
+    """Embeddings from the Gemini API"""
+
+    name = 'gemini'
+    batch_size = 100
+
+    def __init__(self, config):
+        self._setup_resilience(config, 'gemini_embed')
+        self.model = config['EMBEDDING_MODEL']
+        self.dimension = config['EMBEDDING_DIMENSION']
+        self.batch_delay = config['EMBEDDING_BATCH_DELAY']
+        self.hedge_enabled = config['HEDGE_QUERY_EMBEDDING']
+        self.hedge_min_delay = config['HEDGE_MIN_DELAY']
+        self.hedge_default_delay = config['HEDGE_DEFAULT_DELAY']
+        self.query_latency = get_latency_tracker('gemini_query_embed')
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config)
+
+    def _embed(self, contents, task_type):
+        return self._call(lambda: self._request(contents, task_type), 'embed')
+
+    def _request(self, contents, task_type):
+        from google.genai import types
+
+        result = self.client.models.embed_content(
+            model=self.model,
+            contents=contents,
+            config=types.EmbedContentConfig(
+                task_type=task_type,
+                output_dimensionality=self.dimension
+            )
+        )
+        return [e.values for e in result.embeddings]
+
+    def embed_documents(self, texts, task_type="RETRIEVAL_DOCUMENT"):
+        all_embeddings = []
+
+        for i in range(0, len(texts), self.batch_size):
+            batch_texts = texts[i:i + self.batch_size]
+            all_embeddings.extend(self._embed(batch_texts, task_type))
+
+            if i + self.batch_size < len(texts):
+                time.sleep(self.batch_delay)
+
+        return all_embeddings
+
+    def embed_query(self, text):
+        def attempt():
+            start = time.perf_counter()
+            vector = self._embed(text, "RETRIEVAL_QUERY")[0]
+            self.query_latency.record(time.perf_counter() - start)
+            return vector
+
+        if not self.hedge_enabled:
+            return attempt()
+
+        # Fire a duplicate request once the primary exceeds the recent p95
+        deadline = self.query_latency.percentile(95) or self.hedge_default_delay
+        return hedged_call(attempt, max(deadline, self.hedge_min_delay), 'query_embed')
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Local CPU embeddings using a signed feature-hashing projection.
+
+    Unigrams and bigrams are hashed into a fixed number of dimensions with
+    sublinear term frequency weighting and L2 normalisation. Vectors are
+    deterministic across processes and machines, but they are not
+    comparable with Gemini vectors, so an index must be built and queried
+    with the same provider.
+    """
+
+    name = 'local'
+
+    def __init__(self, dimension):
+        self.dimension = dimension
+        self._slots = {}
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(dimension=config['EMBEDDING_DIMENSION'])
+
+    def _slot(self, feature):
+        """Map a feature to (dimension index, sign), memoised per process"""
+        slot = self._slots.get(feature)
+        if slot is None:
+            digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+            value = int.from_bytes(digest, 'little')
+            slot = (value % self.dimension, 1.0 if value >> 63 else -1.0)
+            if len(self._slots) < 500000:
+                self._slots[feature] = slot
+        return slot
+
+    def embed_text(self, text):
+        """Embed one text into a normalised float32 vector"""
+        import numpy as np
+
+        tokens = tokenize(text)
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+        counts = {}
+        for feature in features:
+            counts[feature] = counts.get(feature, 0) + 1
+
+        vector = np.zeros(self.dimension, dtype='float32')
+        for feature, count in counts.items():
+            index, sign = self._slot(feature)
+            vector[index] += sign * (1.0 + math.log(count))
+
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    def embed_documents(self, texts, task_type="RETRIEVAL_DOCUMENT"):
+        import numpy as np
+
+        if not texts:
+            return np.zeros((0, self.dimension), dtype='float32')
+        return np.vstack([self.embed_text(text) for text in texts])
+
+    def embed_query(self, text):
+        return self.embed_text(text)
+
+
+class GeminiGenerationProvider(GeminiProviderMixin, GenerationProvider):
+    """Answers generated by a Gemini model"""
+
+    name = 'gemini'
+
+    def __init__(self, config):
+        self._setup_resilience(config, 'gemini_generate')
+        self.model = config['GENERATION_MODEL']
+        self.temperature = config['TEMPERATURE']
+        self.max_output_tokens = config['MAX_OUTPUT_TOKENS']
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config)
+
+    def generate_answer(self, query, relevant_chunks):
+        prompt = create_rag_prompt(build_context(relevant_chunks), query)
+        return self._call(lambda: self._request(prompt), 'generate')
+
+    def _request(self, prompt):
+        from google.genai import types
+
+        response = self.client.models.generate_content(
+            model=self.model,
+            contents=prompt,
+            config=types.GenerateContentConfig(
+                temperature=self.temperature,
+                max_output_tokens=self.max_output_tokens
+            )
+        )
+        return response.text
+
+
+class ExtractiveGenerationProvider(GenerationProvider):
+    """
+    Local answers built from the retrieved chunks themselves.
+
+    Sentences are scored by how many query terms they contain, weighted by
+    how rare each term is across the retrieved chunks, and the best ones
+    are returned in document order with their sources.
+    """
+
+    name = 'local'
+
+    def __init__(self, max_sentences=4, max_chars=1200):
+        self.max_sentences = max_sentences
+        self.max_chars = max_chars
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            max_sentences=config['EXTRACTIVE_MAX_SENTENCES'],
+            max_chars=config['MAX_OUTPUT_TOKENS'] * 4
+        )
+
+    def generate_answer(self, query, relevant_chunks):
+        query_terms = set(tokenize(query))
+        if not query_terms or not relevant_chunks:
+            return "The uploaded documents don't contain enough information to answer this question."
+
+        # Document frequency of each query term across the retrieved chunks
+        chunk_terms = [set(tokenize(chunk['text'])) for chunk in relevant_chunks]
+        weights = {
+            term: math.log(1 + len(chunk_terms) / (1 + sum(term in terms for terms in chunk_terms))) + 1
+            for term in query_terms
+        }
+
+        candidates = []
+        for rank, chunk in enumerate(relevant_chunks):
+            for position, sentence in enumerate(_complete_sentences(chunk['text'])):
+                if len(sentence) < 20:
+                    continue
+                matched = query_terms.intersection(tokenize(sentence))
+                if not matched:
+                    continue
+                score = sum(weights[term] for term in matched) / (1 + 0.1 * rank)
+                candidates.append((score, rank, position, sentence, chunk))
+
+        if not candidates:
+            return "The uploaded documents don't contain enough information to answer this question."
+
+        # Overlapping chunks repeat sentences; keep each one (or any sentence
+        # it is part of) once, from its best-scoring chunk
+        selected = []
+        seen = []
+        for candidate in sorted(candidates, key=lambda c: -c[0]):
+            key = " ".join(tokenize(candidate[3]))
+            if any(key in other or other in key for other in seen):
+                continue
+            seen.append(key)
+            selected.append(candidate)
+            if len(selected) == self.max_sentences:
+                break
+        selected.sort(key=lambda c: (c[1], c[2]))
+
+        sentences = []
+        sources = []
+        length = 0
+        for _, _, _, sentence, chunk in selected:
+            if length + len(sentence) > self.max_chars and sentences:
+                break
+            sentences.append(sentence)
+            length += len(sentence) + 1
+            source = f"{chunk.get('document', 'Unknown')}, page {chunk.get('page', 'N/A')}"
+            if source not in sources:
+                sources.append(source)
+
+        return " ".join(sentences) + f"\n\n(Extracted from: {'; '.join(sources)})"
+
+
+EMBEDDING_PROVIDERS = {
+    'gemini': GeminiEmbeddingProvider,
+    'local': HashingEmbeddingProvider,
+}
+
+GENERATION_PROVIDERS = {
+    'gemini': GeminiGenerationProvider,
+    'local': ExtractiveGenerationProvider,
+}
+
+
+def get_embedding_provider(config):
+    """Create the embedding provider selected by EMBEDDING_PROVIDER"""
+    name = config['EMBEDDING_PROVIDER']
+    if name not in EMBEDDING_PROVIDERS:
+        raise ValueError(f"Unknown embedding provider: {name}")
+    return EMBEDDING_PROVIDERS[name].from_config(config)
+
+
+def get_generation_provider(config):
+    """Create the generation provider selected by GENERATION_PROVIDER"""
+    name = config['GENERATION_PROVIDER']
+    if name not in GENERATION_PROVIDERS:
+        raise ValueError(f"Unknown generation provider: {name}")
+    return GENERATION_PROVIDERS[name].from_config(config)
@@ -0,0 +1,362 @@
+"""
+Framework-independent RAG engine shared by the Flask app, the FastAPI app
+and the command-line scripts
+"""
+import contextvars
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from app.config.settings import Config, config_dict
+from app.services.answer_cache import AnswerCache
+from app.services.collections import DEFAULT_COLLECTION, collection_config
+from app.services.embedding_service import EmbeddingService
+from app.services.generation_service import GenerationService
+from app.services.pdf_service import PDFService
+from app.services.providers import ExtractiveGenerationProvider, is_upstream_unavailable
+from app.services.retrieval_service import RetrievalService
+from app.services.sharding import open_vector_service
+from app.utils.metrics import ANSWER_CACHE
+from app.utils.query_log import QueryLog, chunk_ids, logged_query
+from app.utils.request_context import separate_stages
+
+logger = logging.getLogger(__name__)
+
+NO_CONTEXT_ANSWER = (
+    "I couldn't find relevant information in the uploaded documents. "
+    "Please upload study materials first."
+)
+
+
+class ModelUnavailableError(Exception):
+    """Raised when a question can't be answered because the model API is down"""
+
+
+class RAGEngine:
+    """
+    Ingestion and question answering configured from a plain settings mapping.
+
+    Only the settings are pickled, so an engine can be sent to worker
+    processes, which rebuild their services (and clients) on first use.
+    An engine serves one collection; collection() returns the engine of
+    another one.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self._collections = {}
+        self._collections_lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, config_class=Config):
+        return cls(config_dict(config_class))
+
+    def __getstate__(self):
+        return {'config': dict(self.config)}
+
+    def __setstate__(self, state):
+        self.__init__(state['config'])
+
+    @property
+    def collection_name(self):
+        return self.config.get('COLLECTION', DEFAULT_COLLECTION)
+
+    def collection(self, name):
+        """Engine for a named collection; raises ValueError for invalid names"""
+        if not name or name == self.collection_name:
+            return self
+        with self._collections_lock:
+            if name not in self._collections:
+                self._collections[name] = RAGEngine(collection_config(self.config, name))
+            return self._collections[name]
+
+    def vector_service(self):
+        """Vector store view for one operation (shared with this process's cache)"""
+        return open_vector_service(self.config)
+
+    # Ingestion
+
+    def process_pdf(self, pdf_path):
+        """
+        Extract (or read from the extracted text cache), chunk and embed a
+        PDF without touching the vector store; returns the chunks, their
+        embeddings and the PDF's content hash
+        """
+        pdf_service = PDFService(self.config)
+        digest, pdf_text = pdf_service.extract(pdf_path)
+        chunks, embeddings = self.embed_pages(pdf_text)
+        return chunks, embeddings, digest
+
+    def embed_pages(self, pdf_text):
+        """Chunk and embed extracted page texts"""
+        chunks = PDFService(self.config).chunk_text(pdf_text)
+        embeddings = EmbeddingService(self.config).generate_embeddings(chunks) if chunks else []
+        return chunks, embeddings
+
+    def ingest_pdf(self, pdf_path, filename=None):
+        """Process a PDF and add it to the vector store"""
+        filename = filename or os.path.basename(pdf_path)
+        chunks, embeddings, digest = self.process_pdf(pdf_path)
+        doc_id = self.vector_service().add_document(filename, chunks, embeddings, content_hash=digest)
+        return {'document_id': doc_id, 'filename': filename, 'chunks_count': len(chunks)}
+
+    def ingest_many(self, pdf_paths, workers=None):
+        """
+        Ingest several PDFs, extracting and embedding them in worker
+        processes. Results are written to the store by this process only.
+
+        Yields one result dict per PDF as it completes; failures carry an
+        'error' key instead of a document id.
+        """
+        if workers == 1 or len(pdf_paths) <= 1:
+            for path in pdf_paths:
+                try:
+                    yield self.ingest_pdf(path)
+                except Exception as e:
+                    yield {'filename': os.path.basename(path), 'error': str(e)}
+            return
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(self,)) as pool:
+            futures = {pool.submit(_process_in_worker, path): path for path in pdf_paths}
+            for future in as_completed(futures):
+                filename = os.path.basename(futures[future])
+                try:
+                    chunks, embeddings, digest = future.result()
+                    doc_id = self.vector_service().add_document(
+                        filename, chunks, embeddings, content_hash=digest
+                    )
+                    yield {'document_id': doc_id, 'filename': filename, 'chunks_count': len(chunks)}
+                except Exception as e:
+                    yield {'filename': filename, 'error': str(e)}
+
+    # Question answering
+
+    def retrieve(self, query, top_k=None):
+        top_k = top_k or self.config['TOP_K_CHUNKS']
+        return RetrievalService(self.config).retrieve(query, top_k=top_k)
+
+    def answer(self, query, top_k=None, filters=None):
+        """
+        Answer a question from the stored documents, optionally restricted
+        by search filters (see search_filters.py).
+
+        Answers are served from and written to the answer cache when it is
+        enabled. While the model API is unavailable a stale cached answer, or
+        an extractive one if only generation failed, is returned with
+        'degraded' set; ModelUnavailableError is raised if neither exists.
+        Answers from a sharded store missing some shards carry 'partial'
+        and the missing shard numbers, and aren't cached.
+        """
+        top_k = top_k or self.config['TOP_K_CHUNKS']
+        with logged_query(self._query_log(), query, top_k, self._logged_collection(), filters) as entry:
+            result = self._answer(query, top_k, filters, entry)
+            entry['hit'] = bool(result.get('cached'))
+            return result
+
+    def _answer(self, query, top_k, filters, entry):
+        retrieval_service = RetrievalService(self.config)
+        answer_cache, store_version = self._answer_cache(retrieval_service)
+
+        cached = self._cached_answer(answer_cache, query, top_k, store_version, filters)
+        if cached:
+            return cached
+
+        try:
+            relevant_chunks = retrieval_service.retrieve(query, top_k=top_k, filters=filters)
+        except Exception as e:
+            if not is_upstream_unavailable(e):
+                raise
+            return self._fallback(answer_cache, query, top_k, filters, e)
+
+        _log_retrieved(entry, relevant_chunks)
+        return self._answer_from_chunks(
+            query, relevant_chunks, top_k, filters, answer_cache, store_version,
+            getattr(retrieval_service.vector_service, 'missing_shards', None)
+        )
+
+    def answer_batch(self, queries, top_k=None, filters=None, concurrency=None):
+        """
+        Answer several questions, yielding one result per question as soon
+        as it is ready (not in input order); each carries its position in
+        'index'.
+
+        Uncached questions are embedded in one request and searched in one
+        batched call; answers are then generated by at most `concurrency`
+        threads. A question that fails yields an 'error' instead of failing
+        the batch.
+        """
+        top_k = top_k or self.config['TOP_K_CHUNKS']
+        concurrency = concurrency or self.config['BATCH_GENERATION_CONCURRENCY']
+        retrieval_service = RetrievalService(self.config)
+        answer_cache, store_version = self._answer_cache(retrieval_service)
+        log = {
+            'query_log': self._query_log(),
+            'top_k': top_k,
+            'collection': self._logged_collection(),
+            'filters': filters,
+            'b': len(queries)
+        }
+
+        pending = []
+        for index, query in enumerate(queries):
+            start = time.perf_counter()
+            cached = self._cached_answer(answer_cache, query, top_k, store_version, filters)
+            if cached:
+                with logged_query(query=query, shared_seconds=time.perf_counter() - start, **log) as entry:
+                    entry['hit'] = True
+                yield {'index': index, 'query': query, **cached}
+            else:
+                pending.append(index)
+        if not pending:
+            return
+
+        start = time.perf_counter()
+        try:
+            with separate_stages() as shared_stages:
+                chunk_lists = retrieval_service.retrieve_batch(
+                    [queries[index] for index in pending], top_k=top_k, filters=filters
+                )
+        except Exception as e:
+            if not is_upstream_unavailable(e):
+                raise
+            for index in pending:
+                yield self._batch_item(
+                    index, queries[index], None, log,
+                    self._fallback, answer_cache, queries[index], top_k, filters, e
+                )
+            return
+        log = {**log, 'shared_stages': shared_stages, 'shared_seconds': time.perf_counter() - start}
+
+        missing_shards = getattr(retrieval_service.vector_service, 'missing_shards', None)
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='batch-answer') as pool:
+            futures = [
+                pool.submit(
+                    contextvars.copy_context().run, self._batch_item, index, queries[index], chunks, log,
+                    self._answer_from_chunks, queries[index], chunks, top_k, filters,
+                    answer_cache, store_version, missing_shards
+                )
+                for index, chunks in zip(pending, chunk_lists)
+            ]
+            for future in as_completed(futures):
+                yield future.result()
+
+    def _batch_item(self, index, query, chunks, log, func, *args):
+        try:
+            with logged_query(query=query, **log) as entry:
+                if chunks is not None:
+                    _log_retrieved(entry, chunks)
+                result = func(*args)
+                entry['hit'] = bool(result.get('cached'))
+            return {'index': index, 'query': query, **result}
+        except ModelUnavailableError as e:
+            return {'index': index, 'query': query, 'error': 'The model API is temporarily unavailable',
+                    'unavailable': True, 'detail': str(e)}
+        except Exception as e:
+            logger.error(f"Error answering batch question {index}: {str(e)}")
+            return {'index': index, 'query': query, 'error': str(e)}
+
+    def _query_log(self):
+        return QueryLog.from_config(self.config)
+
+    def _logged_collection(self):
+        return None if self.collection_name == DEFAULT_COLLECTION else self.collection_name
+
+    def _answer_cache(self, retrieval_service):
+        if not self.config['ANSWER_CACHE_ENABLED']:
+            return None, None
+        return AnswerCache.from_config(self.config), retrieval_service.vector_service.version()
+
+    def _cached_answer(self, answer_cache, query, top_k, store_version, filters):
+        if answer_cache is None:
+            return None
+        cached = answer_cache.get(query, top_k, store_version, filters)
+        if cached:
+            ANSWER_CACHE.inc(result='hit')
+            return {**cached, 'cached': True}
+        ANSWER_CACHE.inc(result='miss')
+        return None
+
+    def _answer_from_chunks(self, query, relevant_chunks, top_k, filters, answer_cache,
+                            store_version, missing_shards=None):
+        if not relevant_chunks:
+            return {'answer': NO_CONTEXT_ANSWER, 'sources': []}
+
+        degraded = False
+        try:
+            answer = GenerationService(self.config).generate_answer(query, relevant_chunks)
+        except Exception as e:
+            if not is_upstream_unavailable(e):
+                raise
+            stale = answer_cache.get_stale(query, top_k, filters) if answer_cache else None
+            if stale:
+                ANSWER_CACHE.inc(result='stale_fallback')
+                return {**stale, 'cached': True, 'degraded': True}
+            logger.warning(f"Generation unavailable, answering extractively: {str(e)}")
+            answer = ExtractiveGenerationProvider.from_config(self.config).generate_answer(
+                query, relevant_chunks
+            )
+            degraded = True
+
+        result = {
+            'answer': answer,
+            'sources': [
+                {
+                    'text': chunk['text'][:200] + '...',
+                    'document': chunk.get('document', 'Unknown'),
+                    'score': float(chunk.get('score', 0))
+                }
+                for chunk in relevant_chunks
+            ],
+            'chunks_used': len(relevant_chunks)
+        }
+        if missing_shards:
+            result = {**result, 'partial': True, 'missing_shards': missing_shards}
+        if degraded:
+            return {**result, 'degraded': True}
+        if missing_shards:
+            return result
+
+        if answer_cache:
+            answer_cache.put(query, top_k, store_version, result, filters)
+        return result
+
+    def _fallback(self, answer_cache, query, top_k, filters, error):
+        stale = answer_cache.get_stale(query, top_k, filters) if answer_cache else None
+        if stale:
+            ANSWER_CACHE.inc(result='stale_fallback')
+            return {**stale, 'cached': True, 'degraded': True}
+        raise ModelUnavailableError(str(error)) from error
+
+
+def _log_retrieved(entry, chunks):
+    entry['ids'] = chunk_ids(chunks)
+    entry['s'] = [round(float(chunk.get('score', 0)), 4) for chunk in chunks]
+
+
+_worker_engine = None
+
+
+def _init_worker(engine):
+    global _worker_engine
+    _worker_engine = engine
+
+
+def _process_in_worker(pdf_path):
+    return _worker_engine.process_pdf(pdf_path)
+
+
+def get_engine(collection=None):
+    """The engine of the current Flask app, or of one of its collections"""
+    from flask import current_app
+    return current_app.extensions['rag_engine'].collection(collection)
+
+
+def request_engine(collection=None):
+    """
+    Engine for the collection named in the URL, or else in a 'collection'
+    query or form parameter. Raises ValueError for invalid names.
+    """
+    from flask import request
+    return get_engine(collection or request.values.get('collection'))
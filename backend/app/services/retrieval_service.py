@@ -1,30 +1,47 @@
 """
 Retrieval service for finding relevant chunks
 """
-from flask import current_app
+import logging
+from app.config.settings import resolve_config
 from app.services.embedding_service import EmbeddingService
-from app.services.vector_service import VectorService
+from app.services.sharding import open_vector_service
+
+logger = logging.getLogger(__name__)
 
 class RetrievalService:
     """Service for retrieving relevant document chunks"""
     
-    def __init__(self):
+    def __init__(self, config=None):
         """Initialize retrieval service"""
-        self.embedding_service = EmbeddingService()
-        self.vector_service = VectorService()
+        config = resolve_config(config)
+        self.embedding_service = EmbeddingService(config)
+        self.vector_service = open_vector_service(config)
     
-    def retrieve(self, query, top_k=5):
+    def retrieve(self, query, top_k=5, filters=None):
         """Retrieve most relevant chunks for query"""
         try:
             # Generate query embedding
             query_embedding = self.embedding_service.generate_query_embedding(query)
             
             # Search vector database
-            results = self.vector_service.search(query_embedding, top_k=top_k)
+            results = self.vector_service.search(query_embedding, top_k=top_k, filters=filters)
+            
+            logger.info(f"Retrieved {len(results)} chunks for query")
+            return results
+            
+        except Exception as e:
+            logger.error(f"Error retrieving chunks: {str(e)}")
+            raise Exception(f"Retrieval failed: {str(e)}") from e
+    
+    def retrieve_batch(self, queries, top_k=5, filters=None):
+        """Retrieve chunks for several queries with one embedding request and one search"""
+        try:
+            query_embeddings = self.embedding_service.generate_query_embeddings(queries)
+            results = self.vector_service.search_batch(query_embeddings, top_k=top_k, filters=filters)
             
-            current_app.logger.info(f"Retrieved {len(results)} chunks for query")
+            logger.info(f"Retrieved chunks for {len(queries)} queries")
             return results
             
         except Exception as e:
-            current_app.logger.error(f"Error retrieving chunks: {str(e)}")
-            raise Exception(f"Retrieval failed: {str(e)}")
+            logger.error(f"Error retrieving chunks: {str(e)}")
+            raise Exception(f"Retrieval failed: {str(e)}") from e
@@ -0,0 +1,119 @@
+"""
+Metadata filters for vector search
+
+Filters narrow a search to some documents, pages or upload dates. They
+are turned into a row mask over the live generation and evaluated inside
+the FAISS scan, so only matching rows are compared with the query.
+
+    {
+        "document": "TCS.pdf" | ["TCS.pdf", "Infosys"],   filename or stem, any case
+        "doc_id": "doc_3_1718000000" | [...],
+        "page_from": 2, "page_to": 10,                    inclusive, 1-based
+        "uploaded_after": "2024-06-01",                   inclusive
+        "uploaded_before": "2024-07-01T12:00:00"          exclusive
+    }
+"""
+import os
+from datetime import datetime
+
+FILTER_KEYS = ('document', 'doc_id', 'page_from', 'page_to', 'uploaded_after', 'uploaded_before')
+DOCUMENT_KEYS = ('document', 'doc_id', 'uploaded_after', 'uploaded_before')
+
+
+def _string_list(key, value):
+    values = [value] if isinstance(value, str) else value
+    if not isinstance(values, list) or not values or not all(isinstance(v, str) and v for v in values):
+        raise ValueError(f"Filter '{key}' must be a non-empty string or list of strings")
+    return sorted(set(values))
+
+
+def _page(key, value):
+    if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+        raise ValueError(f"Filter '{key}' must be a non-negative integer")
+    return value
+
+
+def _timestamp(key, value):
+    try:
+        moment = datetime.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Filter '{key}' must be an ISO 8601 date or datetime")
+    # uploaded_at is stored as naive local time
+    if moment.tzinfo is not None:
+        moment = moment.astimezone().replace(tzinfo=None)
+    return moment.isoformat()
+
+
+def parse_filters(data):
+    """
+    Validate filters from a request body and return them normalised, or
+    None if there are none. Raises ValueError for unknown keys or values.
+    """
+    if data is None:
+        return None
+    if not isinstance(data, dict):
+        raise ValueError("Filters must be an object")
+
+    unknown = sorted(set(data) - set(FILTER_KEYS))
+    if unknown:
+        raise ValueError(f"Unknown filters: {', '.join(unknown)}")
+
+    filters = {}
+    for key, value in data.items():
+        if value is None:
+            continue
+        if key in ('document', 'doc_id'):
+            filters[key] = _string_list(key, value)
+        elif key in ('page_from', 'page_to'):
+            filters[key] = _page(key, value)
+        else:
+            filters[key] = _timestamp(key, value)
+
+    if filters.get('page_from', 0) > filters.get('page_to', float('inf')):
+        raise ValueError("Filter 'page_from' is after 'page_to'")
+    return filters or None
+
+
+def _document_matches(doc_id, info, filters):
+    if 'doc_id' in filters and doc_id not in filters['doc_id']:
+        return False
+    if 'document' in filters:
+        filename = info.get('filename', '').lower()
+        names = {name.lower() for name in filters['document']}
+        if filename not in names and os.path.splitext(filename)[0] not in names:
+            return False
+    uploaded_at = info.get('uploaded_at', '')
+    if 'uploaded_after' in filters and uploaded_at < filters['uploaded_after']:
+        return False
+    if 'uploaded_before' in filters and uploaded_at >= filters['uploaded_before']:
+        return False
+    return True
+
+
+def row_mask(generation, filters):
+    """
+    Boolean mask over the generation's rows that pass the filters, or None
+    when nothing is filtered. Only live documents can match, so tombstoned
+    rows are always excluded.
+    """
+    import numpy as np
+
+    if not filters:
+        return None
+
+    mask = np.zeros(generation.count, dtype=bool)
+    for doc_id, info in generation.documents.items():
+        if any(key in filters for key in DOCUMENT_KEYS) and not _document_matches(doc_id, info, filters):
+            continue
+        start, end = info['rows']
+        mask[start:end] = True
+
+    if 'page_from' in filters or 'page_to' in filters:
+        pages = generation.pages
+        for start, end in generation.live_ranges:
+            selected = mask[start:end]
+            if 'page_from' in filters:
+                selected &= pages[start:end] >= filters['page_from']
+            if 'page_to' in filters:
+                selected &= pages[start:end] <= filters['page_to']
+    return mask
@@ -0,0 +1,221 @@
+"""
+Sharded vector store with scatter-gather search
+
+With SHARD_URLS set, a store is split into one directory per shard
+(VECTOR_DB_PATH/shard-NN) and documents are placed by a hash of their
+doc_id. Each shard is searched by its own shard server process
+(shard_server.py); the coordinator sends the query to every shard in
+parallel, merges the per-shard top-k and returns what arrived within
+SHARD_TIMEOUT, listing the shards that didn't answer.
+
+Writes and catalog reads go straight to the shard directories through
+their single-writer protocol, so the coordinator and the shard servers
+must share the filesystem. Changing the number of shards requires
+re-ingesting, as documents would hash to different shards.
+"""
+import heapq
+import logging
+import os
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor, wait
+from app.config.settings import resolve_config
+from app.services.collections import DEFAULT_COLLECTION
+from app.services.store_writer import allocate_doc_id
+from app.services.vector_service import VectorService
+from app.services.vector_store import read_current
+from app.utils.metrics import SHARD_REQUESTS, timed
+
+logger = logging.getLogger(__name__)
+
+_client = None
+_executor = None
+_lock = threading.Lock()
+
+
+def _reset():
+    global _client, _executor
+    _client = _executor = None
+
+
+# Connections and threads don't survive a fork
+os.register_at_fork(after_in_child=_reset)
+
+
+def shard_urls(config):
+    return [url.strip().rstrip('/') for url in config['SHARD_URLS'].split(',') if url.strip()]
+
+
+def shard_for(doc_id, shard_count):
+    """Shard a document belongs to"""
+    return zlib.crc32(doc_id.encode('utf-8')) % shard_count
+
+
+def shard_path(config, index):
+    return os.path.join(config['VECTOR_DB_PATH'], f"shard-{index:02d}")
+
+
+def shard_config(config, index):
+    """Settings for one shard's store, searched in-process"""
+    path = shard_path(config, index)
+    return {**config, 'VECTOR_DB_PATH': path, 'METADATA_PATH': path, 'SHARD_URLS': ''}
+
+
+def open_vector_service(config=None):
+    """Vector store view for the settings: sharded if SHARD_URLS is set"""
+    config = resolve_config(config)
+    if shard_urls(config):
+        return ShardedVectorService(config)
+    return VectorService(config)
+
+
+def _shared_client(config):
+    global _client, _executor
+    with _lock:
+        if _client is None:
+            import httpx
+            limit = config['SHARD_MAX_CONNECTIONS']
+            _client = httpx.Client(limits=httpx.Limits(
+                max_connections=limit, max_keepalive_connections=limit
+            ))
+            _executor = ThreadPoolExecutor(max_workers=limit, thread_name_prefix='shard-search')
+        return _client, _executor
+
+
+class ShardedVectorService:
+    """VectorService interface over a store split into shards"""
+
+    def __init__(self, config=None):
+        self.config = resolve_config(config)
+        self.urls = shard_urls(self.config)
+        self.timeout = self.config['SHARD_TIMEOUT']
+        self.collection = self.config.get('COLLECTION', DEFAULT_COLLECTION)
+        # Shards left out of the last search because they failed or timed out
+        self.missing_shards = []
+
+    def shard(self, index):
+        return VectorService(shard_config(self.config, index))
+
+    def shards(self):
+        return [self.shard(index) for index in range(len(self.urls))]
+
+    def vector_count(self):
+        return sum(shard.vector_count() for shard in self.shards())
+
+    @property
+    def dimension(self):
+        return next(
+            (shard.dimension for shard in self.shards() if shard.generation),
+            self.config['EMBEDDING_DIMENSION']
+        )
+
+    def version(self):
+        """Identifier of the stored contents: every shard's live generation"""
+        return '+'.join(
+            read_current(shard_path(self.config, index)) or 'empty'
+            for index in range(len(self.urls))
+        )
+
+    def add_document(self, filename, chunks, embeddings, content_hash=None):
+        """Add a document to the shard its doc_id hashes to"""
+        doc_id = allocate_doc_id(self.config['VECTOR_DB_PATH'])
+        index = shard_for(doc_id, len(self.urls))
+        return self.shard(index).add_document(
+            filename, chunks, embeddings, doc_id=doc_id, content_hash=content_hash
+        )
+
+    def replace_documents(self, documents):
+        """Replace documents on the shards holding them, one commit per shard"""
+        by_shard = {}
+        for document in documents:
+            by_shard.setdefault(shard_for(document['doc_id'], len(self.urls)), []).append(document)
+        replaced = {}
+        for index, shard_documents in by_shard.items():
+            replaced.update(self.shard(index).replace_documents(shard_documents))
+        return replaced
+
+    def delete_document(self, doc_id):
+        return self.shard(shard_for(doc_id, len(self.urls))).delete_document(doc_id)
+
+    def compact(self):
+        for shard in self.shards():
+            shard.compact()
+        return self.version()
+
+    def _search_shard(self, index, payload):
+        client, _ = _shared_client(self.config)
+        response = client.post(f"{self.urls[index]}/search", json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return [
+            [{**chunk, 'shard': index} for chunk in chunks]
+            for chunks in response.json()['results']
+        ]
+
+    def search(self, query_embedding, top_k=5, filters=None):
+        return self.search_batch([query_embedding], top_k=top_k, filters=filters)[0]
+
+    def search_batch(self, query_embeddings, top_k=5, filters=None):
+        """
+        Scatter the queries to every shard and merge their top-k per query.
+        Shards that fail or miss the deadline are skipped and listed in
+        missing_shards; the search only fails if none answers.
+        """
+        payload = {
+            'vectors': [[float(value) for value in embedding] for embedding in query_embeddings],
+            'top_k': top_k,
+            'filters': filters,
+            'collection': self.collection
+        }
+
+        with timed('search'):
+            _, executor = _shared_client(self.config)
+            futures = {
+                executor.submit(self._search_shard, index, payload): index
+                for index in range(len(self.urls))
+            }
+            done, _ = wait(futures, timeout=self.timeout)
+
+            results = [[] for _ in query_embeddings]
+            self.missing_shards = []
+            for future, index in futures.items():
+                if future not in done:
+                    future.cancel()
+                    SHARD_REQUESTS.inc(shard=index, result='timeout')
+                    self.missing_shards.append(index)
+                elif future.exception() is not None:
+                    SHARD_REQUESTS.inc(shard=index, result='error')
+                    logger.warning(f"Shard {index} search failed: {str(future.exception())}")
+                    self.missing_shards.append(index)
+                else:
+                    SHARD_REQUESTS.inc(shard=index, result='ok')
+                    for merged, chunks in zip(results, future.result()):
+                        merged.extend(chunks)
+
+        if len(self.missing_shards) == len(self.urls):
+            raise Exception(f"Search failed: none of the {len(self.urls)} shards answered")
+        if self.missing_shards:
+            logger.warning(f"Partial search results, missing shards {self.missing_shards}")
+        return [heapq.nsmallest(top_k, chunks, key=lambda chunk: chunk['score']) for chunks in results]
+
+    def stats(self):
+        shard_stats = [shard.stats() for shard in self.shards()]
+        return {
+            **{
+                key: sum(stats[key] for stats in shard_stats)
+                for key in ('vector_count', 'chunk_count', 'document_count',
+                            'index_file_bytes', 'metadata_file_bytes')
+            },
+            'dimension': self.dimension,
+            'index_type': 'sharded_mmap_flat_l2',
+            'shards': len(self.urls),
+            'generation': self.version()
+        }
+
+    def touch_pages(self):
+        """Nothing to page in here: each shard server keeps its own shard warm"""
+
+    def list_documents(self):
+        return [document for shard in self.shards() for document in shard.list_documents()]
+
+    def catalogs(self):
+        return [catalog for shard in self.shards() for catalog in shard.catalogs()]
@@ -0,0 +1,29 @@
+"""
+Per-thread SQLite connections shared by the answer and embedding caches
+
+sqlite3 connections can't be shared between threads, so each thread
+keeps one connection per database file, opened in WAL mode so readers
+never block the writer.
+"""
+import os
+import sqlite3
+import threading
+
+_local = threading.local()
+
+
+def cache_connection(path, schema):
+    """This thread's connection to the cache at `path`, running the `schema` statements on first use"""
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        conn = sqlite3.connect(path, timeout=5)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        for statement in schema:
+            conn.execute(statement)
+        connections[path] = conn
+    return conn
@@ -0,0 +1,379 @@
+"""
+Conversion between vector store formats without re-embedding
+
+    langchain    index.faiss + index.pkl in the FAISS.save_local layout,
+                 served by app/main.py with FASTAPI_STORE=langchain; when
+                 written here (rebuild_vectorstore.py --langchain), also
+                 index.pair.json with both files' hashes
+    generation   the Flask services' store (see vector_store.py)
+    legacy       faiss_index.bin + metadata.pkl, the Flask format before
+                 generations (read only)
+
+Vectors are copied as stored and chunk text and metadata are mapped
+field by field, so converting is bounded by disk speed rather than by the
+embedding API. Langchain metadata is kept with each chunk so a round trip
+restores it unchanged. Every conversion is checked against the source's
+vector count and dimension and a sample of rows before it is reported.
+
+A langchain store lives next to other stores (./vector_db), so its two
+files can't be swapped in together as one directory. The pair marker is
+replaced first and then each file, and loading checks the files against
+the marker, so a crash between the replacements is reported instead of
+pairing an index with another write's docstore.
+"""
+import hashlib
+import json
+import logging
+import os
+import pickle
+import uuid
+from datetime import datetime
+from app.services.store_writer import next_doc_seq
+from app.services.vector_store import (
+    Generation,
+    read_current,
+    store_lock,
+    write_generation,
+)
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ('langchain', 'generation', 'legacy')
+
+# Rows gathered per block while copying vectors
+BLOCK_ROWS = 65536
+
+# Rows compared between source and target after a conversion
+VERIFY_SAMPLE = 256
+
+# sha256 of index.faiss and index.pkl as written together by write_langchain_store
+PAIR_MARKER = 'index.pair.json'
+
+
+class StoreConversionError(Exception):
+    """Raised when a store can't be read, written or verified"""
+
+
+def detect_format(path):
+    """Format of the store in path, or None if it holds none"""
+    if os.path.exists(os.path.join(path, 'index.faiss')) and os.path.exists(os.path.join(path, 'index.pkl')):
+        return 'langchain'
+    if read_current(path):
+        return 'generation'
+    if os.path.exists(os.path.join(path, 'faiss_index.bin')):
+        return 'legacy'
+    return None
+
+
+class SourceStore:
+    """
+    Vectors and chunks of a store in a common shape: rows grouped by
+    document, each chunk a dict with doc_id, document, text and page.
+    """
+
+    def __init__(self, dimension, count, vector_blocks, chunks, documents):
+        self.dimension = dimension
+        self.count = count
+        self._vector_blocks = vector_blocks
+        self.chunks = chunks
+        self.documents = documents
+
+    def vector_blocks(self):
+        return self._vector_blocks()
+
+
+def _gather_blocks(index, rows):
+    """Blocks of index vectors for the given row order"""
+    import numpy as np
+
+    def blocks():
+        for start in range(0, len(rows), BLOCK_ROWS):
+            yield index.reconstruct_batch(np.asarray(rows[start:start + BLOCK_ROWS], dtype='int64'))
+    return blocks
+
+
+def _group_rows(chunks):
+    """Row order that makes every document's rows contiguous, keeping their order"""
+    first_seen = {}
+    for row, chunk in enumerate(chunks):
+        first_seen.setdefault(chunk['doc_id'], row)
+    return sorted(range(len(chunks)), key=lambda row: (first_seen[chunks[row]['doc_id']], row))
+
+
+def _documents_for(chunks, infos):
+    """documents.json entries (with row ranges) for grouped chunks"""
+    documents = {}
+    for row, chunk in enumerate(chunks):
+        doc_id = chunk['doc_id']
+        if doc_id not in documents:
+            documents[doc_id] = {**infos.get(doc_id, {}), 'rows': [row, row]}
+        documents[doc_id]['rows'][1] = row + 1
+    for info in documents.values():
+        info['chunk_count'] = info['rows'][1] - info['rows'][0]
+    return documents
+
+
+def _file_digest(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def check_langchain_pair(path):
+    """Raise StoreConversionError if index.faiss and index.pkl weren't written together"""
+    try:
+        with open(os.path.join(path, PAIR_MARKER)) as f:
+            expected = json.load(f)
+    except FileNotFoundError:
+        # Written by FAISS.save_local, which keeps no marker
+        return
+    except (OSError, ValueError) as e:
+        raise StoreConversionError(f"Unreadable {PAIR_MARKER} in {path}: {str(e)}") from e
+
+    for name in ('index.faiss', 'index.pkl'):
+        file_path = os.path.join(path, name)
+        if not os.path.exists(file_path) or _file_digest(file_path) != expected.get(name):
+            raise StoreConversionError(
+                f"{name} in {path} doesn't belong to the pair recorded in {PAIR_MARKER} (interrupted write?); "
+                f"convert the store again, or delete {PAIR_MARKER} if FAISS.save_local wrote these files"
+            )
+
+
+def read_langchain(path):
+    import faiss
+
+    check_langchain_pair(path)
+    try:
+        index = faiss.read_index(os.path.join(path, 'index.faiss'))
+        with open(os.path.join(path, 'index.pkl'), 'rb') as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+    except Exception as e:
+        raise StoreConversionError(f"Failed to read langchain store in {path}: {str(e)}") from e
+
+    if len(index_to_docstore_id) != index.ntotal:
+        raise StoreConversionError(
+            f"Langchain store has {index.ntotal} vectors but {len(index_to_docstore_id)} docstore ids"
+        )
+
+    uploaded_at = datetime.fromtimestamp(os.path.getmtime(os.path.join(path, 'index.pkl'))).isoformat()
+    doc_ids = {}
+    chunks = []
+    for row in range(index.ntotal):
+        docstore_id = index_to_docstore_id[row]
+        document = docstore.search(docstore_id)
+        if isinstance(document, str):
+            raise StoreConversionError(f"Row {row}: {document}")
+        metadata = dict(document.metadata)
+        filename = os.path.basename(str(metadata.get('source', 'Unknown')))
+        # Chunks exported from the Flask store carry their doc_id; others are
+        # grouped into one document per source file
+        key = (metadata.get('doc_id'), filename)
+        if key not in doc_ids:
+            doc_ids[key] = metadata.get('doc_id') or f"doc_{len(doc_ids) + 1}_{int(datetime.now().timestamp())}"
+        doc_id = doc_ids[key]
+        page = metadata.get('page')
+        chunks.append({
+            'doc_id': doc_id,
+            'document': filename,
+            'text': document.page_content,
+            # PyPDFLoader pages are 0-based, the Flask pipeline's 1-based
+            'page': page + 1 if isinstance(page, int) else 0,
+            'docstore_id': docstore_id,
+            'metadata': metadata
+        })
+
+    order = _group_rows(chunks)
+    chunks = [chunks[row] for row in order]
+    infos = {
+        doc_id: {'filename': filename, 'uploaded_at': uploaded_at}
+        for (_, filename), doc_id in doc_ids.items()
+    }
+    return SourceStore(index.d, index.ntotal, _gather_blocks(index, order), chunks, _documents_for(chunks, infos))
+
+
+def read_generation(path):
+    import numpy as np
+
+    generation = Generation(path, read_current(path))
+    rows = [row for start, end in generation.live_ranges for row in range(start, end)]
+    chunks = [generation.chunk(row) for row in rows]
+    for chunk in chunks:
+        chunk.pop('index', None)
+
+    def blocks():
+        for start, end in generation.live_ranges:
+            for block_start in range(start, end, BLOCK_ROWS):
+                yield np.asarray(generation.vectors[block_start:min(end, block_start + BLOCK_ROWS)])
+
+    documents = {
+        doc_id: {key: value for key, value in info.items() if key != 'rows'}
+        for doc_id, info in generation.documents.items()
+    }
+    return SourceStore(generation.dimension, len(rows), blocks, chunks, _documents_for(chunks, documents))
+
+
+def read_legacy(path, metadata_path=None):
+    import faiss
+
+    metadata_path = metadata_path or os.path.join(os.path.dirname(path.rstrip(os.sep)), 'metadata')
+    try:
+        index = faiss.read_index(os.path.join(path, 'faiss_index.bin'))
+        with open(os.path.join(metadata_path, 'metadata.pkl'), 'rb') as f:
+            metadata = pickle.load(f)
+    except Exception as e:
+        raise StoreConversionError(f"Failed to read legacy store in {path}: {str(e)}") from e
+
+    # Rows are taken from each chunk's recorded index, as in VectorService
+    chunks = [
+        chunk for chunk in metadata['chunks']
+        if chunk['doc_id'] in metadata['documents'] and 0 <= chunk.get('index', -1) < index.ntotal
+    ]
+    chunks.sort(key=lambda chunk: chunk['index'])
+    order = [chunk['index'] for chunk in chunks]
+    chunks = [{key: value for key, value in chunk.items() if key != 'index'} for chunk in chunks]
+    grouped = _group_rows(chunks)
+    chunks = [chunks[row] for row in grouped]
+    order = [order[row] for row in grouped]
+    return SourceStore(
+        index.d, len(chunks), _gather_blocks(index, order), chunks,
+        _documents_for(chunks, metadata['documents'])
+    )
+
+
+def read_store(path, source_format=None):
+    source_format = source_format or detect_format(path)
+    if source_format is None:
+        raise StoreConversionError(f"No vector store found in {path}")
+    if source_format not in FORMATS:
+        raise StoreConversionError(f"Unknown store format: {source_format}")
+    reader = {'langchain': read_langchain, 'generation': read_generation, 'legacy': read_legacy}
+    return reader[source_format](path)
+
+
+def write_generation_store(source, path, force=False):
+    """Publish the source as a new generation of the store in path"""
+    with store_lock(path):
+        name = read_current(path)
+        manifest = {}
+        if name:
+            current = Generation(path, name)
+            if current.documents and not force:
+                raise StoreConversionError(
+                    f"{path} already holds {len(current.documents)} documents; use force to replace them"
+                )
+            manifest = dict(current.manifest)
+        # Keep doc ids monotonic across the replacement
+        seq = max(manifest.get('next_doc_seq', 1), next_doc_seq(source.documents))
+        return write_generation(
+            path, source.dimension, source.count, source.vector_blocks(), iter(source.chunks),
+            source.documents, {'next_doc_seq': seq, 'tombstoned_rows': 0}
+        )
+
+
+def write_langchain_store(source, path, force=False):
+    """Write the source as FAISS.save_local files plus the pair marker (see the module docstring)"""
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_core.documents import Document
+
+    index_path = os.path.join(path, 'index.faiss')
+    docstore_path = os.path.join(path, 'index.pkl')
+    if os.path.exists(index_path) and not force:
+        raise StoreConversionError(f"{path} already holds a langchain store; use force to replace it")
+
+    index = faiss.IndexFlatL2(source.dimension)
+    for block in source.vector_blocks():
+        index.add(block)
+
+    documents = {}
+    index_to_docstore_id = {}
+    for row, chunk in enumerate(source.chunks):
+        docstore_id = chunk.get('docstore_id') or str(uuid.uuid4())
+        metadata = chunk.get('metadata') or {
+            'source': chunk.get('document', 'Unknown'),
+            'page': max(chunk.get('page', 0) - 1, 0),
+            'doc_id': chunk['doc_id']
+        }
+        documents[docstore_id] = Document(page_content=chunk['text'], metadata=metadata)
+        index_to_docstore_id[row] = docstore_id
+
+    os.makedirs(path, exist_ok=True)
+    marker_path = os.path.join(path, PAIR_MARKER)
+    suffix = f".tmp-{uuid.uuid4().hex}"
+    try:
+        faiss.write_index(index, index_path + suffix)
+        with open(index_path + suffix, 'rb+') as f:
+            os.fsync(f.fileno())
+        with open(docstore_path + suffix, 'wb') as f:
+            pickle.dump((InMemoryDocstore(documents), index_to_docstore_id), f)
+            f.flush()
+            os.fsync(f.fileno())
+        with open(marker_path + suffix, 'w') as f:
+            json.dump({
+                'index.faiss': _file_digest(index_path + suffix),
+                'index.pkl': _file_digest(docstore_path + suffix),
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        # The marker goes first: until both files are replaced it doesn't
+        # match the old ones, so loading refuses a half-written pair
+        os.replace(marker_path + suffix, marker_path)
+        os.replace(index_path + suffix, index_path)
+        os.replace(docstore_path + suffix, docstore_path)
+    finally:
+        for tmp in (index_path + suffix, docstore_path + suffix, marker_path + suffix):
+            if os.path.exists(tmp):
+                os.remove(tmp)
+    return 'index.faiss'
+
+
+def verify(source, target):
+    """Compare count, dimension, a sample of vectors and all chunk texts; returns a summary"""
+    import numpy as np
+
+    if (target.count, target.dimension) != (source.count, source.dimension):
+        raise StoreConversionError(
+            f"Target has {target.count} x {target.dimension} vectors, "
+            f"source {source.count} x {source.dimension}"
+        )
+    if [chunk['text'] for chunk in target.chunks] != [chunk['text'] for chunk in source.chunks]:
+        raise StoreConversionError("Chunk texts differ between source and target")
+
+    rng = np.random.default_rng(0)
+    sample = set(rng.choice(source.count, size=min(VERIFY_SAMPLE, source.count), replace=False).tolist())
+
+    def sampled(store):
+        rows, row = [], 0
+        for block in store.vector_blocks():
+            rows.extend(block[i] for i in range(len(block)) if row + i in sample)
+            row += len(block)
+        return np.array(rows)
+
+    if sample and not np.array_equal(sampled(source), sampled(target)):
+        raise StoreConversionError("Sampled vectors differ between source and target")
+    return {'vectors': source.count, 'dimension': source.dimension,
+            'documents': len(source.documents), 'vectors_compared': len(sample)}
+
+
+def convert(source_path, target_path, target_format, source_format=None, force=False):
+    """Convert a store and verify the result; returns a summary"""
+    if target_format not in ('langchain', 'generation'):
+        raise StoreConversionError(f"Can't write {target_format} stores")
+    if os.path.abspath(source_path) == os.path.abspath(target_path) and \
+            (source_format or detect_format(source_path)) == target_format:
+        raise StoreConversionError("Source and target are the same store")
+
+    source = read_store(source_path, source_format)
+    if not source.count:
+        raise StoreConversionError(f"The store in {source_path} holds no vectors")
+
+    if target_format == 'generation':
+        written = write_generation_store(source, target_path, force)
+    else:
+        written = write_langchain_store(source, target_path, force)
+
+    summary = verify(source, read_store(target_path, target_format))
+    logger.info(f"Converted {source.count} vectors from {source_path} to {target_path} ({written})")
+    return {**summary, 'written': written}
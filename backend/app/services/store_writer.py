@@ -0,0 +1,297 @@
+"""
+Single-writer commit protocol for the vector store
+
+All changes to a store directory go through one writer thread per process,
+which drains its queue and commits everything pending as one new
+generation (group commit). The commit holds a cross-process file lock and
+always builds on the latest CURRENT, so concurrent uploads from several
+threads or worker processes can't overwrite each other. Document ids come
+from a sequence kept in the manifest and are never reused.
+
+Deletes only drop the document from documents.json (its rows become
+tombstones, skipped by search); the data files are hard-linked. A replace
+gives existing documents new rows under the same doc_id, tombstoning the
+old ones. Once tombstones exceed COMPACT_TOMBSTONE_RATIO of the rows, or
+on request, the commit rewrites the store without them.
+"""
+import logging
+import os
+import queue
+import re
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+from app.services.vector_store import (
+    Generation,
+    GenerationBuilder,
+    read_current,
+    remove_old_generations,
+    store_lock,
+)
+from app.utils.metrics import STAGE_ITEMS, timed
+
+logger = logging.getLogger(__name__)
+
+_DOC_SEQ_RE = re.compile(r"^doc_(\d+)_")
+
+# Store-wide id sequence for stores split over several directories (shards)
+SEQUENCE_FILE = 'DOC_SEQUENCE'
+
+
+def next_doc_seq(documents):
+    """First sequence number above every doc_<n>_... id in documents"""
+    numbers = [int(m.group(1)) for m in map(_DOC_SEQ_RE.match, documents) if m]
+    return max(numbers, default=0) + 1
+
+
+def allocate_doc_id(root):
+    """Reserve a doc id from root's sequence file, before knowing where the document goes"""
+    path = os.path.join(root, SEQUENCE_FILE)
+    with store_lock(root):
+        try:
+            with open(path) as f:
+                seq = int(f.read().strip() or 1)
+        except FileNotFoundError:
+            seq = 1
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w') as f:
+            f.write(str(seq + 1))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    return f"doc_{seq}_{int(datetime.now().timestamp())}"
+
+
+class _Operation:
+    def __init__(self, kind, **params):
+        self.kind = kind
+        self.params = params
+        self.future = Future()
+
+
+class StoreWriter:
+    """Background thread committing queued changes to one store directory"""
+
+    def __init__(self, root, dimension, batch_max=64, compact_ratio=0.25):
+        self.root = root
+        self.dimension = dimension
+        self.batch_max = batch_max
+        self.compact_ratio = compact_ratio
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='vector-store-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, kind, **params):
+        operation = _Operation(kind, **params)
+        self._queue.put(operation)
+        return operation.future
+
+    def add_document(self, filename, chunks, embeddings, doc_id=None, content_hash=None):
+        """Queue a document and wait for the commit; returns its doc_id (allocated unless given)"""
+        return self.submit(
+            'add', filename=filename, chunks=chunks, embeddings=embeddings, doc_id=doc_id,
+            content_hash=content_hash
+        ).result()
+
+    def replace_documents(self, documents):
+        """
+        Replace the chunks of existing documents in one commit, keeping
+        their doc_ids and upload dates. documents are dicts of doc_id,
+        filename, chunks, embeddings and content_hash; returns
+        {doc_id: False if unknown}.
+        """
+        return self.submit('replace', documents=documents).result()
+
+    def delete_document(self, doc_id):
+        """Queue a delete and wait for the commit; returns False if doc_id is unknown"""
+        return self.submit('delete', doc_id=doc_id).result()
+
+    def compact(self):
+        """Rewrite the store without tombstoned rows; returns the new generation"""
+        return self.submit('compact').result()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_max:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                with timed('index_write'):
+                    results = self._commit(batch)
+            except Exception as e:
+                logger.error(f"Vector store commit of {len(batch)} changes failed: {str(e)}")
+                for operation in batch:
+                    operation.future.set_exception(e)
+                continue
+
+            for operation, result in zip(batch, results):
+                if isinstance(result, Exception):
+                    operation.future.set_exception(result)
+                else:
+                    operation.future.set_result(result)
+
+    def _commit(self, batch):
+        """Apply a batch of operations as one generation; returns one result per operation"""
+        import numpy as np
+
+        with store_lock(self.root):
+            name = read_current(self.root)
+            base = Generation(self.root, name) if name else None
+            documents = {doc_id: dict(info) for doc_id, info in (base.documents if base else {}).items()}
+            manifest = dict(base.manifest) if base else {}
+            seq = manifest.get('next_doc_seq') or next_doc_seq(documents)
+
+            results = []
+            additions = {}
+            changed = compact = False
+
+            def vectors_of(params):
+                vectors = np.asarray(params['embeddings'], dtype='float32')
+                if base and vectors.size and vectors.shape[-1] != base.dimension:
+                    raise ValueError(
+                        f"Embedding dimension {vectors.shape[-1]} doesn't match the store's {base.dimension}"
+                    )
+                return vectors
+
+            def stage(doc_id, vectors, params, info):
+                additions[doc_id] = (vectors, [
+                    {
+                        'doc_id': doc_id,
+                        'document': params['filename'],
+                        'text': chunk['text'],
+                        'page': chunk.get('page', 0)
+                    }
+                    for chunk in params['chunks']
+                ])
+                documents[doc_id] = {**info, 'filename': params['filename'], 'chunk_count': len(params['chunks'])}
+                if params.get('content_hash'):
+                    documents[doc_id]['content_hash'] = params['content_hash']
+
+            for operation in batch:
+                params = operation.params
+                if operation.kind == 'add':
+                    try:
+                        vectors = vectors_of(params)
+                    except ValueError as e:
+                        results.append(e)
+                        continue
+                    doc_id = params.get('doc_id')
+                    if doc_id is None:
+                        doc_id = f"doc_{seq}_{int(datetime.now().timestamp())}"
+                        seq += 1
+                    elif doc_id in documents or doc_id in additions:
+                        results.append(ValueError(f"Document {doc_id} already exists"))
+                        continue
+                    else:
+                        seq = max(seq, next_doc_seq([doc_id]))
+                    stage(doc_id, vectors, params, {'uploaded_at': datetime.now().isoformat()})
+                    results.append(doc_id)
+                    changed = True
+                elif operation.kind == 'replace':
+                    # New chunks for existing documents, keeping their ids and
+                    # upload dates; the old rows become tombstones
+                    try:
+                        staged = [(replacement, vectors_of(replacement)) for replacement in params['documents']]
+                    except ValueError as e:
+                        results.append(e)
+                        continue
+                    replaced = {}
+                    for replacement, vectors in staged:
+                        doc_id = replacement['doc_id']
+                        info = documents.get(doc_id)
+                        replaced[doc_id] = info is not None
+                        if info is None:
+                            continue
+                        info = {key: value for key, value in info.items() if key not in ('rows', 'content_hash')}
+                        stage(doc_id, vectors, replacement, {**info, 'rechunked_at': datetime.now().isoformat()})
+                    results.append(replaced)
+                    changed = changed or any(replaced.values())
+                elif operation.kind == 'delete':
+                    found = documents.pop(params['doc_id'], None) is not None
+                    additions.pop(params['doc_id'], None)
+                    results.append(found)
+                    changed = changed or found
+                elif operation.kind == 'compact':
+                    results.append(None)
+                    compact = True
+                else:
+                    raise ValueError(f"Unknown store operation: {operation.kind}")
+
+            if not changed and not compact:
+                return results
+
+            base_count = base.count if base else 0
+            base_documents = [(doc_id, info) for doc_id, info in documents.items() if doc_id not in additions]
+            live_base = sum(info['rows'][1] - info['rows'][0] for _, info in base_documents)
+            new_rows = sum(len(chunks) for _, chunks in additions.values())
+            if base_count and (base_count - live_base) / (base_count + new_rows) > self.compact_ratio:
+                compact = True
+
+            dimension = base.dimension if base else next(
+                (vectors.shape[-1] for vectors, _ in additions.values() if vectors.size), self.dimension
+            )
+
+            if compact:
+                builder = GenerationBuilder(self.root, dimension, live_base + new_rows)
+                for doc_id, info in sorted(base_documents, key=lambda item: item[1]['rows'][0]):
+                    start, end = info['rows']
+                    info['rows'] = [builder.row, builder.row + end - start]
+                    builder.copy_rows(base, start, end)
+                manifest['compacted_at'] = datetime.now().isoformat()
+            else:
+                builder = GenerationBuilder(self.root, dimension, base_count + new_rows)
+                if base and not additions:
+                    builder.link_rows(base)
+                elif base:
+                    builder.copy_rows(base, 0, base_count)
+
+            try:
+                for doc_id, (vectors, chunks) in additions.items():
+                    documents[doc_id]['rows'] = [builder.row, builder.row + len(chunks)]
+                    builder.add(vectors.reshape(-1, dimension) if len(chunks) else vectors, chunks)
+            except BaseException:
+                builder.abort()
+                raise
+
+            manifest.update({
+                'next_doc_seq': seq,
+                'tombstoned_rows': builder.count - sum(
+                    info['rows'][1] - info['rows'][0] for info in documents.values()
+                ),
+            })
+            for key in ('format', 'generation', 'count', 'dimension', 'document_count', 'created_at'):
+                manifest.pop(key, None)
+            name = builder.publish(documents, manifest)
+
+        STAGE_ITEMS.inc(new_rows, stage='index_write')
+        logger.info(
+            f"Committed {len(batch)} store changes as {name}"
+            f"{' (compacted)' if compact else ''}"
+        )
+        remove_old_generations(self.root)
+        return results
+
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+# A forked child inherits the registry but not the writer threads
+os.register_at_fork(after_in_child=_writers.clear)
+
+
+def get_writer(root, config):
+    """Process-wide writer for a store directory"""
+    key = os.path.abspath(root)
+    with _writers_lock:
+        if key not in _writers:
+            _writers[key] = StoreWriter(
+                root,
+                dimension=config['EMBEDDING_DIMENSION'],
+                batch_max=config['VECTOR_WRITE_BATCH_MAX'],
+                compact_ratio=config['COMPACT_TOMBSTONE_RATIO']
+            )
+        return _writers[key]
@@ -0,0 +1,119 @@
+"""
+Persistent cache of extracted PDF text, keyed by the PDF's content hash
+
+Extraction output is kept in PROCESSED_FOLDER as one gzipped JSON file per
+PDF, <sha256>.pages.json.gz:
+
+    {"format": 1, "extractor": "pymupdf-1.24.1", "filename": "...",
+     "pages": [[page_number, offset, length], ...], "text": "..."}
+
+Page texts are stored back to back in "text", and each page records its
+offset and length within it, so the whole document or any page can be
+sliced without splitting strings. Entries written by another extractor
+version are ignored and rewritten. Re-chunking (rechunk.py) reads
+entries one at a time instead of running PyMuPDF again.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+SUFFIX = '.pages.json.gz'
+
+
+def content_hash(pdf_path, block_size=1 << 20):
+    """sha256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(pdf_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def extractor_version():
+    """PyMuPDF release, read from package metadata so fitz isn't imported for it"""
+    from importlib.metadata import PackageNotFoundError, version
+
+    try:
+        return f"pymupdf-{version('PyMuPDF')}"
+    except PackageNotFoundError:
+        return 'pymupdf-unknown'
+
+
+class ExtractedTextCache:
+    """Extracted page texts of PDFs, one compressed file per content hash"""
+
+    def __init__(self, directory, extractor=None):
+        self.directory = directory
+        self._extractor = extractor
+
+    @classmethod
+    def from_config(cls, config):
+        """The cache for these settings, or None if disabled"""
+        if not config['EXTRACTED_TEXT_CACHE_ENABLED']:
+            return None
+        return cls(config['PROCESSED_FOLDER'])
+
+    @property
+    def extractor(self):
+        if self._extractor is None:
+            self._extractor = extractor_version()
+        return self._extractor
+
+    def path(self, digest):
+        return os.path.join(self.directory, f"{digest}{SUFFIX}")
+
+    def get(self, digest):
+        """{page_number: text} for a content hash, or None on a miss"""
+        try:
+            with gzip.open(self.path(digest), 'rt', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable extracted text {digest}: {str(e)}")
+            return None
+
+        if entry.get('format') != FORMAT_VERSION or entry.get('extractor') != self.extractor:
+            return None
+        text = entry['text']
+        return {page: text[offset:offset + length] for page, offset, length in entry['pages']}
+
+    def put(self, digest, pages, filename=None):
+        """Store {page_number: text}; written to a temporary file and renamed into place"""
+        layout, offset = [], 0
+        for page, text in pages.items():
+            layout.append([page, offset, len(text)])
+            offset += len(text)
+        entry = {
+            'format': FORMAT_VERSION,
+            'extractor': self.extractor,
+            'filename': filename,
+            'pages': layout,
+            'text': ''.join(pages.values()),
+        }
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(digest)
+        tmp = f"{path}.tmp-{uuid.uuid4().hex}"
+        try:
+            with gzip.open(tmp, 'wt', encoding='utf-8', compresslevel=6) as f:
+                json.dump(entry, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    def __contains__(self, digest):
+        return os.path.exists(self.path(digest))
+
+    def digests(self):
+        """Content hashes of every cached PDF"""
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-len(SUFFIX)] for name in os.listdir(self.directory) if name.endswith(SUFFIX))
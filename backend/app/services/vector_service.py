@@ -1,138 +1,284 @@
 """
-Vector database service using FAISS
+Vector database service
+
+Vectors and chunk metadata live in memory-mapped generations (see
+vector_store.py), so every worker process shares one copy through the page
+cache. faiss and numpy are imported on first use so processes that never
+touch the index (health-only workers, CLI tools) start quickly.
+
+Stores are mapped on first use and kept in an LRU cache; once the loaded
+stores exceed COLLECTION_MEMORY_BUDGET_MB the least recently used are
+unmapped (see collections.py).
 """
-import faiss
-import numpy as np
 import pickle
 import os
-from flask import current_app
-from datetime import datetime
+import threading
+import logging
+from collections import OrderedDict
+from app.config.settings import resolve_config
+from app.services.catalog import catalog_for
+from app.services.search_filters import row_mask
+from app.services.store_writer import get_writer, next_doc_seq
+from app.services.vector_store import (
+    Generation,
+    read_current,
+    store_lock,
+    write_generation,
+)
+from app.utils.metrics import LOADED_STORE_BYTES, STORE_EVICTIONS, timed
+
+logger = logging.getLogger(__name__)
+
+# Mapped generations shared by every VectorService in this process, keyed
+# by store directory and revalidated against its CURRENT pointer. Values are
+# (generation, memory bytes), least recently used first.
+_generation_cache = OrderedDict()
+_generation_cache_lock = threading.Lock()
+
+# Rows read per block when paging in the vectors
+TOUCH_BLOCK_ROWS = 65536
 
 class VectorService:
     """Service for managing vector database operations"""
     
-    def __init__(self):
+    def __init__(self, config=None):
         """Initialize vector service"""
-        self.index_path = os.path.join(
-            current_app.config['VECTOR_DB_PATH'],
-            'faiss_index.bin'
-        )
-        self.metadata_path = os.path.join(
-            current_app.config['METADATA_PATH'],
-            'metadata.pkl'
-        )
+        self.config = resolve_config(config)
+        self.root = self.config['VECTOR_DB_PATH']
         
-        # Load or create index
-        self.index = self._load_or_create_index()
-        self.metadata = self._load_metadata()
-    
-    def _load_or_create_index(self):
-        """Load existing FAISS index or create new one"""
-        if os.path.exists(self.index_path):
-            return faiss.read_index(self.index_path)
-        else:
-            dimension = current_app.config['EMBEDDING_DIMENSION']
-            return faiss.IndexFlatL2(dimension)
-    
-    def _load_metadata(self):
-        """Load chunk metadata"""
-        if os.path.exists(self.metadata_path):
-            with open(self.metadata_path, 'rb') as f:
-                return pickle.load(f)
-        return {'chunks': [], 'documents': {}}
-    
-    def _save_index(self):
-        """Save FAISS index to disk"""
-        faiss.write_index(self.index, self.index_path)
-    
-    def _save_metadata(self):
-        """Save metadata to disk"""
-        with open(self.metadata_path, 'wb') as f:
-            pickle.dump(self.metadata, f)
-    
-    def add_document(self, filename, chunks, embeddings):
-        """Add document chunks to vector database"""
-        try:
-            doc_id = f"doc_{len(self.metadata['documents']) + 1}_{int(datetime.now().timestamp())}"
+        # Files of the pickle/faiss format used before generations
+        self.legacy_index_path = os.path.join(self.root, 'faiss_index.bin')
+        self.legacy_metadata_path = os.path.join(self.config['METADATA_PATH'], 'metadata.pkl')
+        
+        self.generation = self._load_generation()
+    
+    def _load_generation(self):
+        """Return the live generation, mapping it if it changed since last use"""
+        name = read_current(self.root)
+        
+        with _generation_cache_lock:
+            if name is None:
+                if not os.path.exists(self.legacy_index_path):
+                    return None
+                self._migrate_legacy()
+                name = read_current(self.root)
             
-            # Convert embeddings to numpy array
-            embeddings_array = np.array(embeddings).astype('float32')
+            cached = _generation_cache.get(self.root)
+            if cached and cached[0].name == name:
+                _generation_cache.move_to_end(self.root)
+                return cached[0]
             
-            # Add to FAISS index
-            start_idx = self.index.ntotal
-            self.index.add(embeddings_array)
+            for attempt in range(3):
+                try:
+                    generation = Generation(self.root, name)
+                    break
+                except FileNotFoundError:
+                    # Superseded and removed between reading CURRENT and opening it
+                    if attempt == 2:
+                        raise
+                    name = read_current(self.root)
             
-            # Store metadata
-            for i, chunk in enumerate(chunks):
-                self.metadata['chunks'].append({
-                    'doc_id': doc_id,
-                    'document': filename,
-                    'index': start_idx + i,
-                    'text': chunk['text'],
-                    'page': chunk.get('page', 0)
-                })
+            _generation_cache[self.root] = (generation, generation.memory_bytes())
+            _generation_cache.move_to_end(self.root)
+            self._evict(self.config['COLLECTION_MEMORY_BUDGET_MB'] * 1024 * 1024)
+            return generation
+    
+    def _evict(self, budget):
+        """Drop least recently used stores until the loaded ones fit the budget"""
+        total = sum(size for _, size in _generation_cache.values())
+        while total > budget and len(_generation_cache) > 1:
+            root, (generation, size) = _generation_cache.popitem(last=False)
+            total -= size
+            STORE_EVICTIONS.inc()
+            logger.info(f"Evicted vector store {root} ({generation.name}, {size / 1e6:.1f} MB)")
+        LOADED_STORE_BYTES.set(total)
+    
+    def _migrate_legacy(self):
+        """Convert faiss_index.bin + metadata.pkl into the first generation"""
+        import faiss
+        
+        with store_lock(self.root):
+            if read_current(self.root) is not None:
+                return
             
-            self.metadata['documents'][doc_id] = {
-                'filename': filename,
-                'chunk_count': len(chunks),
-                'uploaded_at': datetime.now().isoformat()
-            }
+            index = faiss.read_index(self.legacy_index_path)
+            metadata = {'chunks': [], 'documents': {}}
+            if os.path.exists(self.legacy_metadata_path):
+                with open(self.legacy_metadata_path, 'rb') as f:
+                    metadata = pickle.load(f)
             
-            # Save to disk
-            self._save_index()
-            self._save_metadata()
+            # Each chunk recorded its row when it was added, which also repairs
+            # stores whose chunk list drifted from the index after deletes
+            chunks = [
+                chunk for chunk in metadata['chunks']
+                if chunk['doc_id'] in metadata['documents'] and 0 <= chunk.get('index', -1) < index.ntotal
+            ]
+            chunks.sort(key=lambda chunk: chunk['index'])
             
-            current_app.logger.info(f"Added document {doc_id} with {len(chunks)} chunks")
-            return doc_id
+            documents = {doc_id: dict(info) for doc_id, info in metadata['documents'].items()}
+            for row, chunk in enumerate(chunks):
+                documents[chunk['doc_id']].setdefault('rows', [row, row])[1] = row + 1
+            for info in documents.values():
+                info.setdefault('rows', [0, 0])
+            
+            vectors = index.reconstruct_n(0, index.ntotal) if chunks else None
+            write_generation(
+                self.root,
+                index.d,
+                len(chunks),
+                [vectors[[chunk['index'] for chunk in chunks]]] if chunks else [],
+                ({key: value for key, value in chunk.items() if key != 'index'} for chunk in chunks),
+                documents,
+                {'next_doc_seq': next_doc_seq(documents), 'tombstoned_rows': 0}
+            )
+        logger.info(f"Migrated legacy index with {len(chunks)} chunks to {read_current(self.root)}")
+    
+    def _writer(self):
+        return get_writer(self.root, self.config)
+    
+    def vector_count(self):
+        return self.generation.count if self.generation else 0
+    
+    @property
+    def dimension(self):
+        return self.generation.dimension if self.generation else self.config['EMBEDDING_DIMENSION']
+    
+    def version(self):
+        """Identifier of the stored index contents, changing on every write"""
+        return self.generation.name if self.generation else 'empty'
+    
+    def add_document(self, filename, chunks, embeddings, doc_id=None, content_hash=None):
+        """Add document chunks to vector database"""
+        try:
+            doc_id = self._writer().add_document(
+                filename, chunks, embeddings, doc_id=doc_id, content_hash=content_hash
+            )
+            self.generation = self._load_generation()
             
+            logger.info(f"Added document {doc_id} with {len(chunks)} chunks")
+            return doc_id
+        
         except Exception as e:
-            current_app.logger.error(f"Error adding document: {str(e)}")
+            logger.error(f"Error adding document: {str(e)}")
             raise Exception(f"Failed to add document: {str(e)}")
     
-    def search(self, query_embedding, top_k=5):
-        """Search for similar chunks"""
+    def search(self, query_embedding, top_k=5, filters=None):
+        """Search for similar chunks, optionally restricted by metadata filters"""
+        return self.search_batch([query_embedding], top_k=top_k, filters=filters)[0]
+    
+    def search_batch(self, query_embeddings, top_k=5, filters=None):
+        """Search several queries in one scan; returns one result list per query"""
         try:
-            if self.index.ntotal == 0:
-                return []
+            if self.vector_count() == 0 or not self.generation.live_ranges:
+                return [[] for _ in query_embeddings]
+            
+            import numpy as np
             
-            query_vector = np.array([query_embedding]).astype('float32')
-            distances, indices = self.index.search(query_vector, min(top_k, self.index.ntotal))
+            query_vector = np.asarray(query_embeddings, dtype='float32').reshape(-1, self.dimension)
+            coarse_dimension = self.config['COARSE_SEARCH_DIMENSION']
+            if 0 < coarse_dimension < self.generation.dimension:
+                with timed('search'):
+                    candidates = self.generation.coarse_candidates(
+                        query_vector,
+                        coarse_dimension,
+                        max(self.config['RERANK_CANDIDATES'], top_k),
+                        mask=row_mask(self.generation, filters)
+                    )
+                with timed('rerank'):
+                    distances, indices = self.generation.rerank(query_vector, candidates, top_k)
+            else:
+                with timed('search'):
+                    mask = row_mask(self.generation, filters)
+                    distances, indices = self.generation.search(query_vector, top_k, mask=mask)
             
             results = []
-            for i, idx in enumerate(indices[0]):
-                if idx < len(self.metadata['chunks']):
-                    chunk = self.metadata['chunks'][idx].copy()
-                    chunk['score'] = float(distances[0][i])
-                    results.append(chunk)
+            for query_distances, query_indices in zip(distances, indices):
+                chunks = []
+                for distance, idx in zip(query_distances, query_indices):
+                    if idx >= 0:
+                        chunk = self.generation.chunk(idx)
+                        chunk['score'] = float(distance)
+                        chunks.append(chunk)
+                results.append(chunks)
             
             return results
-            
+        
         except Exception as e:
-            current_app.logger.error(f"Error searching: {str(e)}")
+            logger.error(f"Error searching: {str(e)}")
             raise Exception(f"Search failed: {str(e)}")
     
+    def stats(self):
+        """Size and shape of the live store"""
+        sizes = self.generation.file_sizes() if self.generation else {}
+        return {
+            'vector_count': self.vector_count(),
+            'chunk_count': self.generation.live_count if self.generation else 0,
+            'document_count': len(self.generation.documents) if self.generation else 0,
+            'dimension': self.dimension,
+            'index_type': 'mmap_flat_l2',
+            'generation': self.version(),
+            'index_file_bytes': sizes.get('vectors.npy', 0),
+            'metadata_file_bytes': sum(size for name, size in sizes.items() if name != 'vectors.npy')
+        }
+    
+    def touch_pages(self, block_size=TOUCH_BLOCK_ROWS):
+        """Read every stored vector once so the mapped file is in the page cache"""
+        arrays = [self.generation.vectors] if self.generation else []
+        coarse_dimension = self.config['COARSE_SEARCH_DIMENSION']
+        if arrays and 0 < coarse_dimension < self.dimension:
+            # Derives the coarse vectors if this generation has none yet
+            arrays.append(self.generation.coarse_vectors(coarse_dimension))
+        for vectors in arrays:
+            for start in range(0, self.vector_count(), block_size):
+                vectors[start:start + block_size].sum()
+    
     def list_documents(self):
         """List all documents"""
+        if self.generation is None:
+            return []
         return [
             {
                 'doc_id': doc_id,
-                **info
+                **{key: value for key, value in info.items() if key != 'rows'}
             }
-            for doc_id, info in self.metadata['documents'].items()
+            for doc_id, info in self.generation.documents.items()
         ]
     
+    def catalogs(self):
+        """Pre-sorted document catalog of the live generation (see catalog.py)"""
+        if self.generation is None:
+            return []
+        return [catalog_for(self.generation)]
+    
+    def replace_documents(self, documents):
+        """
+        Re-index existing documents with new chunks in one commit, keeping
+        their doc_ids and upload dates; returns {doc_id: False if unknown}
+        """
+        try:
+            replaced = self._writer().replace_documents(documents)
+            self.generation = self._load_generation()
+            
+            logger.info(f"Replaced {sum(replaced.values())} documents")
+            return replaced
+        
+        except Exception as e:
+            logger.error(f"Error replacing documents: {str(e)}")
+            raise Exception(f"Failed to replace documents: {str(e)}")
+    
     def delete_document(self, doc_id):
-        """Delete a document (marks for deletion, rebuild index needed)"""
-        if doc_id not in self.metadata['documents']:
+        """Delete a document; its rows are tombstoned until the next compaction"""
+        if self.generation is None or doc_id not in self.generation.documents:
             return False
         
-        # Remove from metadata
-        del self.metadata['documents'][doc_id]
-        self.metadata['chunks'] = [
-            chunk for chunk in self.metadata['chunks']
-            if chunk['doc_id'] != doc_id
-        ]
-        
-        self._save_metadata()
-        current_app.logger.info(f"Deleted document {doc_id}")
-        return True
+        deleted = self._writer().delete_document(doc_id)
+        self.generation = self._load_generation()
+        if deleted:
+            logger.info(f"Deleted document {doc_id}")
+        return deleted
+    
+    def compact(self):
+        """Rewrite the store without tombstoned rows"""
+        self._writer().compact()
+        self.generation = self._load_generation()
+        return self.version()
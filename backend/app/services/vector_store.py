@@ -0,0 +1,517 @@
+"""
+Memory-mapped, generation-based storage for vectors and chunk metadata
+
+A store directory holds immutable generations plus a CURRENT file naming
+the live one:
+
+    CURRENT                 "gen-000042"
+    gen-000042/
+        manifest.json       generation, counts, dimension, creation time
+        vectors.npy         float32 (count, dimension)
+        chunks.jsonl        one JSON object per vector row
+        chunk_offsets.npy   int64 byte offsets of each line (count + 1)
+        pages.npy           int32 page number of each row, for filtered search
+        coarse-<d>.npy      float32 renormalised d-dimension prefixes, derived
+                            on first use by two-stage search
+        documents.json      doc_id -> document info
+
+Readers map vectors.npy, chunks.jsonl and chunk_offsets.npy read-only, so
+every worker process shares the same page cache instead of holding a
+private copy. A writer builds a new generation in a temporary directory,
+renames it into place and then atomically replaces CURRENT; readers pick
+it up the next time they check CURRENT. Old generations are deleted after
+a grace period (mappings of deleted files stay valid on POSIX).
+
+Format 1 generations have no pages.npy; their page numbers are read from
+chunks.jsonl the first time they are needed.
+"""
+import json
+import mmap
+import os
+import shutil
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+
+FORMAT_VERSION = 2
+CURRENT_FILE = 'CURRENT'
+GENERATION_PREFIX = 'gen-'
+
+# Rows processed per block when deriving coarse vectors
+COARSE_BLOCK_ROWS = 65536
+
+
+def _fsync_dir(path):
+    if hasattr(os, 'O_DIRECTORY'):
+        fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+
+def _normalize(vectors):
+    import numpy as np
+
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _masked_knn(vectors, query_vectors, top_k, mask):
+    """
+    Exact L2 search of vectors (any C-contiguous float32 array, mapped or
+    not) restricted to the rows set in mask. The mask is handed to FAISS as
+    a bitmap ID selector, so other rows are skipped during the scan.
+    """
+    import faiss
+    import numpy as np
+
+    nq = len(query_vectors)
+    k = min(top_k, int(np.count_nonzero(mask)))
+    distances = np.full((nq, k), np.inf, dtype='float32')
+    rows = np.full((nq, k), -1, dtype='int64')
+    if not k:
+        return distances, rows
+
+    query_vectors = np.ascontiguousarray(query_vectors, dtype='float32')
+    bitmap = np.packbits(mask, bitorder='little')
+    selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(bitmap))
+
+    heap = faiss.float_maxheap_array_t()
+    heap.nh = nq
+    heap.k = k
+    heap.val = faiss.swig_ptr(distances)
+    heap.ids = faiss.swig_ptr(rows)
+    faiss.knn_L2sqr(
+        faiss.swig_ptr(query_vectors), faiss.swig_ptr(vectors),
+        vectors.shape[1], nq, len(vectors), heap, None, selector
+    )
+    return distances, rows
+
+
+def read_current(root):
+    """Name of the live generation in root, or None if there is none yet"""
+    try:
+        with open(os.path.join(root, CURRENT_FILE)) as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+class Generation:
+    """Read-only, memory-mapped view of one generation"""
+
+    def __init__(self, root, name):
+        import numpy as np
+
+        self.root = root
+        self.name = name
+        self.path = os.path.join(root, name)
+
+        with open(os.path.join(self.path, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        with open(os.path.join(self.path, 'documents.json')) as f:
+            self.documents = json.load(f)
+
+        self.vectors = np.load(os.path.join(self.path, 'vectors.npy'), mmap_mode='r')
+        self.offsets = np.load(os.path.join(self.path, 'chunk_offsets.npy'), mmap_mode='r')
+
+        self._live_ranges = None
+        self._live_mask = None
+        self._pages = None
+        self._coarse = {}
+        self._chunks_map = None
+        if self.count:
+            with open(os.path.join(self.path, 'chunks.jsonl'), 'rb') as f:
+                self._chunks_map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @property
+    def count(self):
+        return self.manifest['count']
+
+    @property
+    def dimension(self):
+        return self.manifest['dimension']
+
+    def chunk(self, row):
+        """Metadata of one vector row"""
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return {**json.loads(self._chunks_map[start:end]), 'index': int(row)}
+
+    def chunk_bytes(self, start, end):
+        return self._chunks_map[start:end] if self._chunks_map is not None else b''
+
+    def iter_chunks(self):
+        for row in range(self.count):
+            yield self.chunk(row)
+
+    @property
+    def live_ranges(self):
+        """Sorted, merged (start, end) row ranges that belong to live documents"""
+        if self._live_ranges is None:
+            ranges = []
+            for start, end in sorted(tuple(info['rows']) for info in self.documents.values()):
+                if end <= start:
+                    continue
+                if ranges and ranges[-1][1] == start:
+                    ranges[-1] = (ranges[-1][0], end)
+                else:
+                    ranges.append((start, end))
+            self._live_ranges = ranges
+        return self._live_ranges
+
+    @property
+    def live_count(self):
+        return sum(end - start for start, end in self.live_ranges)
+
+    @property
+    def live_mask(self):
+        """Boolean mask of live rows, or None if every row is live"""
+        import numpy as np
+
+        if self.live_ranges == [(0, self.count)]:
+            return None
+        if self._live_mask is None:
+            mask = np.zeros(self.count, dtype=bool)
+            for start, end in self.live_ranges:
+                mask[start:end] = True
+            self._live_mask = mask
+        return self._live_mask
+
+    @property
+    def pages(self):
+        """int32 page number of every row"""
+        import numpy as np
+
+        if self._pages is None:
+            path = os.path.join(self.path, 'pages.npy')
+            if os.path.exists(path):
+                self._pages = np.load(path, mmap_mode='r')
+            else:
+                self._pages = np.fromiter(
+                    (chunk.get('page', 0) for chunk in self.iter_chunks()), dtype='int32', count=self.count
+                )
+        return self._pages
+
+    def search(self, query_vectors, top_k, mask=None):
+        """
+        Exact L2 search over the mapped vectors. Returns (distances, rows)
+        like an index search.
+
+        mask selects the rows to consider (the live rows by default); rows
+        outside it are skipped during the scan rather than filtered out of
+        the results.
+        """
+        import faiss
+
+        if mask is None:
+            mask = self.live_mask
+            if mask is None:
+                return faiss.knn(query_vectors, self.vectors, min(top_k, self.count))
+        return _masked_knn(self.vectors, query_vectors, top_k, mask)
+
+    def coarse_vectors(self, dimension):
+        """
+        The first `dimension` components of every vector, renormalised
+        (Matryoshka-style truncation). Derived once per generation and kept
+        beside it, so every worker maps the same file.
+        """
+        import numpy as np
+
+        if dimension not in self._coarse:
+            path = os.path.join(self.path, f"coarse-{dimension}.npy")
+            if not os.path.exists(path):
+                tmp = f"{path}.tmp-{uuid.uuid4().hex}"
+                coarse = np.lib.format.open_memmap(
+                    tmp, mode='w+', dtype='float32', shape=(self.count, dimension)
+                )
+                for start in range(0, self.count, COARSE_BLOCK_ROWS):
+                    block = np.array(self.vectors[start:start + COARSE_BLOCK_ROWS, :dimension])
+                    coarse[start:start + len(block)] = _normalize(block)
+                coarse.flush()
+                del coarse
+                os.replace(tmp, path)
+            self._coarse[dimension] = np.load(path, mmap_mode='r')
+        return self._coarse[dimension]
+
+    def coarse_candidates(self, query_vectors, dimension, candidates, mask=None):
+        """
+        First stage of a two-stage search: rows of the `candidates` nearest
+        coarse vectors to the truncated, renormalised queries (-1 padded)
+        """
+        import faiss
+        import numpy as np
+
+        coarse = self.coarse_vectors(dimension)
+        queries = _normalize(np.ascontiguousarray(query_vectors[:, :dimension], dtype='float32'))
+        if mask is None:
+            mask = self.live_mask
+            if mask is None:
+                return faiss.knn(queries, coarse, min(candidates, self.count))[1]
+        return _masked_knn(coarse, queries, candidates, mask)[1]
+
+    def rerank(self, query_vectors, candidate_rows, top_k):
+        """
+        Second stage: exact L2 distances between each query and its
+        candidates' full vectors, read from the mapping in row order.
+        Returns (distances, rows) of the top_k like search().
+        """
+        import numpy as np
+
+        nq = len(query_vectors)
+        k = min(top_k, candidate_rows.shape[1])
+        distances = np.full((nq, k), np.inf, dtype='float32')
+        rows = np.full((nq, k), -1, dtype='int64')
+        for i, (query, candidates) in enumerate(zip(query_vectors, candidate_rows)):
+            candidates = np.unique(candidates[candidates >= 0])
+            if not len(candidates):
+                continue
+            differences = self.vectors[candidates] - query
+            candidate_distances = np.einsum('ij,ij->i', differences, differences)
+            order = np.argsort(candidate_distances, kind='stable')[:k]
+            distances[i, :len(order)] = candidate_distances[order]
+            rows[i, :len(order)] = candidates[order]
+        return distances, rows
+
+    def memory_bytes(self):
+        """Approximate memory this generation uses once fully paged in"""
+        mask_bytes = self.count if self.live_mask is not None else 0
+        return sum(
+            size for name, size in self.file_sizes().items() if name != 'documents.json'
+        ) + mask_bytes
+
+    def file_sizes(self):
+        names = ['vectors.npy', 'chunks.jsonl', 'chunk_offsets.npy', 'pages.npy', 'documents.json']
+        names.extend(f"coarse-{dimension}.npy" for dimension in sorted(self._coarse))
+        return {
+            name: os.path.getsize(os.path.join(self.path, name))
+            for name in names
+            if os.path.exists(os.path.join(self.path, name))
+        }
+
+
+def _next_generation_name(root):
+    numbers = [
+        int(name[len(GENERATION_PREFIX):])
+        for name in os.listdir(root)
+        if name.startswith(GENERATION_PREFIX) and name[len(GENERATION_PREFIX):].isdigit()
+    ]
+    return f"{GENERATION_PREFIX}{max(numbers, default=0) + 1:06d}"
+
+
+def _link_or_copy(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+class GenerationBuilder:
+    """
+    Writes a new generation row by row into a temporary directory.
+
+    Rows come from new vectors and chunks, or are copied from an existing
+    generation as raw bytes without re-encoding. publish() renames the
+    directory into place and flips CURRENT.
+    """
+
+    def __init__(self, root, dimension, count):
+        import numpy as np
+
+        os.makedirs(root, exist_ok=True)
+        self.root = root
+        self.dimension = dimension
+        self.count = count
+        self.row = 0
+        self.linked = False
+        self.path = os.path.join(root, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(self.path)
+
+        self._vectors = np.lib.format.open_memmap(
+            os.path.join(self.path, 'vectors.npy'), mode='w+', dtype='float32', shape=(count, dimension)
+        ) if count else None
+        if not count:
+            np.save(os.path.join(self.path, 'vectors.npy'), np.zeros((0, dimension), dtype='float32'))
+        self._offsets = np.zeros(count + 1, dtype='int64')
+        self._pages = np.zeros(count, dtype='int32')
+        self._chunks = open(os.path.join(self.path, 'chunks.jsonl'), 'wb')
+
+    def _check_room(self, rows):
+        if self.row + rows > self.count:
+            raise ValueError(f"More than the {self.count} rows this generation was sized for")
+
+    def add(self, vectors, chunks):
+        """Append new rows: a float32 block and one metadata dict per row"""
+        import numpy as np
+
+        vectors = np.asarray(vectors, dtype='float32').reshape(-1, self.dimension)
+        if len(vectors) != len(chunks):
+            raise ValueError(f"{len(vectors)} vectors for {len(chunks)} chunks")
+        if not len(vectors):
+            return
+        self._check_room(len(vectors))
+
+        self._vectors[self.row:self.row + len(vectors)] = vectors
+        self._pages[self.row:self.row + len(vectors)] = [chunk.get('page', 0) for chunk in chunks]
+        for chunk in chunks:
+            line = json.dumps(chunk, separators=(',', ':')).encode('utf-8') + b'\n'
+            self._chunks.write(line)
+            self.row += 1
+            self._offsets[self.row] = self._offsets[self.row - 1] + len(line)
+
+    def copy_rows(self, generation, start, end, block_rows=65536):
+        """Append rows start..end of an existing generation"""
+        self._check_room(end - start)
+        for block_start in range(start, end, block_rows):
+            block_end = min(end, block_start + block_rows)
+            rows = block_end - block_start
+            self._vectors[self.row:self.row + rows] = generation.vectors[block_start:block_end]
+            self._pages[self.row:self.row + rows] = generation.pages[block_start:block_end]
+
+            byte_start = int(generation.offsets[block_start])
+            byte_end = int(generation.offsets[block_end])
+            self._chunks.write(generation.chunk_bytes(byte_start, byte_end))
+            self._offsets[self.row + 1:self.row + rows + 1] = (
+                generation.offsets[block_start + 1:block_end + 1] - byte_start + self._offsets[self.row]
+            )
+            self.row += rows
+
+    def link_rows(self, generation):
+        """Reuse every row of an existing generation by hard-linking its data files"""
+        if self.row or generation.count != self.count:
+            raise ValueError("Linked generations must have exactly the source's rows")
+        self._close_data()
+        for name in ('vectors.npy', 'chunks.jsonl', 'chunk_offsets.npy', 'pages.npy'):
+            target = os.path.join(self.path, name)
+            if os.path.exists(target):
+                os.remove(target)
+            if name == 'pages.npy' and not os.path.exists(os.path.join(generation.path, name)):
+                self._pages[:] = generation.pages
+                continue
+            _link_or_copy(os.path.join(generation.path, name), target)
+        self.row = self.count
+        self.linked = True
+
+    def _close_data(self):
+        if self._vectors is not None:
+            self._vectors.flush()
+            self._vectors = None
+        if not self._chunks.closed:
+            self._chunks.flush()
+            os.fsync(self._chunks.fileno())
+            self._chunks.close()
+
+    def publish(self, documents, manifest=None):
+        """Finish the files, move the generation into place and make it live"""
+        import numpy as np
+
+        try:
+            if self.row != self.count:
+                raise ValueError(f"Expected {self.count} rows, got {self.row}")
+            if not self.linked:
+                self._close_data()
+                np.save(os.path.join(self.path, 'chunk_offsets.npy'), self._offsets)
+            if not os.path.exists(os.path.join(self.path, 'pages.npy')):
+                np.save(os.path.join(self.path, 'pages.npy'), self._pages)
+
+            with open(os.path.join(self.path, 'documents.json'), 'w') as f:
+                json.dump(documents, f)
+
+            name = _next_generation_name(self.root)
+            with open(os.path.join(self.path, 'manifest.json'), 'w') as f:
+                json.dump({
+                    'format': FORMAT_VERSION,
+                    'generation': name,
+                    'count': self.count,
+                    'dimension': self.dimension,
+                    'document_count': len(documents),
+                    'created_at': datetime.now().isoformat(),
+                    **(manifest or {})
+                }, f, indent=2)
+
+            os.rename(self.path, os.path.join(self.root, name))
+            _fsync_dir(self.root)
+        except BaseException:
+            self.abort()
+            raise
+
+        # Flip the pointer atomically; readers see either the old or the new name
+        pointer_tmp = os.path.join(self.root, f".{CURRENT_FILE}.{uuid.uuid4().hex}")
+        with open(pointer_tmp, 'w') as f:
+            f.write(name)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(pointer_tmp, os.path.join(self.root, CURRENT_FILE))
+        _fsync_dir(self.root)
+        return name
+
+    def abort(self):
+        self._vectors = None
+        if not self._chunks.closed:
+            self._chunks.close()
+        shutil.rmtree(self.path, ignore_errors=True)
+
+
+def write_generation(root, dimension, count, vector_blocks, chunks, documents, manifest=None):
+    """
+    Write and publish a generation from scratch.
+
+    vector_blocks yields float32 arrays whose rows add up to count; chunks
+    yields one metadata dict per row, in the same order. Returns the new
+    generation's name.
+    """
+    builder = GenerationBuilder(root, dimension, count)
+    try:
+        chunks = iter(chunks)
+        for block in vector_blocks:
+            builder.add(block, [next(chunks) for _ in range(len(block))])
+    except BaseException:
+        builder.abort()
+        raise
+    return builder.publish(documents, manifest)
+
+
+@contextmanager
+def store_lock(root):
+    """Exclusive lock on a store directory, held across processes"""
+    os.makedirs(root, exist_ok=True)
+    with open(os.path.join(root, '.lock'), 'a+b') as f:
+        if os.name == 'nt':
+            import msvcrt
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def remove_old_generations(root, keep=2, grace_seconds=60):
+    """Delete superseded generations beyond the newest `keep` once they are old enough"""
+    current = read_current(root)
+    names = sorted(
+        name for name in os.listdir(root)
+        if name.startswith(GENERATION_PREFIX) and name != current
+    )
+    removed = []
+    now = time.time()
+    for name in names[:max(0, len(names) - (keep - 1))]:
+        path = os.path.join(root, name)
+        if now - os.path.getmtime(path) >= grace_seconds:
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(name)
+    return removed
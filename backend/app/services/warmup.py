@@ -0,0 +1,103 @@
+"""
+Startup warm-up and readiness state
+"""
+import threading
+import time
+from datetime import datetime
+
+
+class WarmupState:
+    """Progress and results of the process warm-up"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.status = 'pending'
+        self.error = None
+        self.timings_ms = {}
+        self.details = {}
+        self.started_at = None
+        self.finished_at = None
+
+    @property
+    def ready(self):
+        return self.status == 'ready'
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                'status': self.status,
+                'error': self.error,
+                'warmup_timings_ms': dict(self.timings_ms),
+                'started_at': self.started_at,
+                'finished_at': self.finished_at,
+                **self.details
+            }
+
+
+WARMUP = WarmupState()
+
+
+def _step(name, func):
+    start = time.perf_counter()
+    result = func()
+    with WARMUP.lock:
+        WARMUP.timings_ms[name] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def _import_modules(config):
+    """Import the libraries the services load lazily"""
+    import fitz  # noqa: F401
+    from app.utils.text_splitter import create_text_splitter
+    create_text_splitter(config)
+
+
+def warm_up(app):
+    """
+    Import the heavy libraries, load the vector store, page in the index,
+    build model clients and run a synthetic query so the first real request doesn't pay for any of it.
+    """
+    from app.services.embedding_service import EmbeddingService
+    from app.services.generation_service import GenerationService
+
+    engine = app.extensions['rag_engine']
+
+    with WARMUP.lock:
+        if WARMUP.status == 'warming':
+            return
+        WARMUP.status = 'warming'
+        WARMUP.error = None
+        WARMUP.timings_ms = {}
+        WARMUP.started_at = datetime.now().isoformat()
+
+    try:
+        _step('import_modules', lambda: _import_modules(engine.config))
+        vector_service = _step('load_vector_store', engine.vector_service)
+        _step('touch_index_pages', vector_service.touch_pages)
+        _step('build_clients', lambda: (EmbeddingService(engine.config), GenerationService(engine.config)))
+
+        query = engine.config['WARMUP_QUERY']
+        if query and vector_service.vector_count() > 0:
+            _step('synthetic_query', lambda: engine.retrieve(query, top_k=1))
+
+        details = vector_service.stats()
+
+        with WARMUP.lock:
+            WARMUP.details = details
+            WARMUP.status = 'ready'
+            WARMUP.finished_at = datetime.now().isoformat()
+        app.logger.info(f"Warm-up finished in {sum(WARMUP.timings_ms.values()):.0f} ms")
+
+    except Exception as e:
+        with WARMUP.lock:
+            WARMUP.status = 'failed'
+            WARMUP.error = str(e)
+            WARMUP.finished_at = datetime.now().isoformat()
+        app.logger.error(f"Warm-up failed: {str(e)}")
+
+
+def start_warmup(app):
+    """Run the warm-up in a background thread"""
+    thread = threading.Thread(target=warm_up, args=(app,), name='warmup', daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,184 @@
+"""
+Admission control: per-route concurrency limits with bounded priority queues
+
+Each pool admits up to max_concurrent requests; further requests wait in a
+priority queue of at most max_queue entries for up to queue_timeout
+seconds. Requests that find the queue full or time out are rejected so
+the caller can answer 429 with Retry-After instead of piling up behind a
+slow upstream.
+"""
+import heapq
+import itertools
+import threading
+import time
+from functools import wraps
+from app.utils.metrics import (
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_QUEUE_DEPTH,
+    ADMISSION_REJECTED,
+    ADMISSION_WAIT,
+)
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted to a pool"""
+
+    def __init__(self, pool, reason, retry_after):
+        super().__init__(f"{pool} pool is saturated ({reason})")
+        self.pool = pool
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionPool:
+    """Concurrency limiter with a bounded, priority-ordered wait queue"""
+
+    def __init__(self, name, max_concurrent, max_queue, queue_timeout, retry_after=1):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+        self._lock = threading.Lock()
+        self._active = 0
+        self._waiters = []
+        self._seq = itertools.count()
+
+    def _publish(self):
+        ADMISSION_IN_FLIGHT.set(self._active, pool=self.name)
+        ADMISSION_QUEUE_DEPTH.set(len(self._waiters), pool=self.name)
+
+    def _reject(self, reason):
+        ADMISSION_REJECTED.inc(pool=self.name, reason=reason)
+        raise AdmissionRejected(self.name, reason, self.retry_after)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'in_flight': self._active,
+                'queued': len(self._waiters),
+                'max_concurrent': self.max_concurrent,
+                'max_queue': self.max_queue,
+            }
+
+    def acquire(self, priority=0):
+        """Take a slot, waiting in the queue if needed; higher priority goes first"""
+        start = time.perf_counter()
+
+        with self._lock:
+            if self._active < self.max_concurrent and not self._waiters:
+                self._active += 1
+                self._publish()
+                return
+            if len(self._waiters) >= self.max_queue:
+                self._reject('queue_full')
+
+            # [sort key, tie-breaker, wake-up event, granted flag]
+            entry = [-priority, next(self._seq), threading.Event(), False]
+            heapq.heappush(self._waiters, entry)
+            self._publish()
+
+        entry[2].wait(self.queue_timeout)
+
+        with self._lock:
+            if not entry[3]:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._publish()
+                self._reject('timeout')
+
+        ADMISSION_WAIT.observe(time.perf_counter() - start, pool=self.name)
+
+    def release(self):
+        """Free a slot, handing it straight to the highest-priority waiter"""
+        with self._lock:
+            if self._waiters:
+                entry = heapq.heappop(self._waiters)
+                entry[3] = True
+                entry[2].set()
+            else:
+                self._active -= 1
+            self._publish()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name, config):
+    """Process-wide pool for a route group, sized from <NAME>_MAX_* settings"""
+    pool = _pools.get(name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(name)
+            if pool is None:
+                prefix = name.upper()
+                pool = _pools[name] = AdmissionPool(
+                    name,
+                    max_concurrent=config[f'{prefix}_MAX_CONCURRENCY'],
+                    max_queue=config[f'{prefix}_MAX_QUEUE'],
+                    queue_timeout=config[f'{prefix}_QUEUE_TIMEOUT'],
+                    retry_after=config['ADMISSION_RETRY_AFTER']
+                )
+    return pool
+
+
+def parse_priorities(spec):
+    """Parse 'high=10,normal=0,low=-10' into a name -> priority dict"""
+    priorities = {}
+    for item in spec.split(','):
+        if '=' in item:
+            label, value = item.split('=', 1)
+            priorities[label.strip().lower()] = int(value)
+    return priorities
+
+
+def resolve_priority(header_value, config):
+    """Priority for a request from its priority header (default 0)"""
+    if not header_value:
+        return 0
+    priorities = parse_priorities(config['ADMISSION_PRIORITIES'])
+    value = header_value.strip().lower()
+    if value in priorities:
+        return priorities[value]
+    try:
+        return int(value)
+    except ValueError:
+        return 0
+
+
+def admitted(pool_name):
+    """Flask view decorator applying the named admission pool"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import current_app, jsonify, request
+
+            config = current_app.config
+            pool = get_pool(pool_name, config)
+            priority = resolve_priority(request.headers.get(config['ADMISSION_PRIORITY_HEADER']), config)
+
+            try:
+                pool.acquire(priority)
+            except AdmissionRejected as e:
+                current_app.logger.warning(f"Rejected request: {str(e)}")
+                response = jsonify({'error': 'Server is busy, please retry shortly'})
+                response.status_code = 429
+                response.headers['Retry-After'] = str(e.retry_after)
+                return response
+
+            deferred = False
+            try:
+                result = view(*args, **kwargs)
+                response = result[0] if isinstance(result, tuple) else result
+                if getattr(response, 'is_streamed', False):
+                    # Keep the slot until the streamed body has been sent
+                    response.call_on_close(pool.release)
+                    deferred = True
+                return result
+            finally:
+                if not deferred:
+                    pool.release()
+        return wrapper
+    return decorator
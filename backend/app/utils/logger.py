@@ -1,25 +1,209 @@
 """
 Logging configuration
+
+Records are handed to a bounded in-memory queue and written by a
+background QueueListener, so request threads never block on console or
+disk I/O. Output is one JSON object per line (or plain text with
+LOG_FORMAT=text), tagged with the current request id. DEBUG records are
+sampled at LOG_DEBUG_SAMPLE_RATE before they are queued.
 """
+import atexit
+import json
 import logging
-from logging.handlers import RotatingFileHandler
 import os
+import queue
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from app.utils.request_context import get_request_id
+
+# Attributes every LogRecord has; anything else came in through `extra=`
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'request_id'}
+
+_listeners = []
+
+
+class JsonFormatter(logging.Formatter):
+    """Format records as single-line JSON"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        request_id = getattr(record, 'request_id', None)
+        if request_id:
+            entry['request_id'] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class ContextFilter(logging.Filter):
+    """Attach the request id and sample DEBUG records"""
+
+    def __init__(self, debug_sample_rate=1.0):
+        super().__init__()
+        self.debug_sample_rate = debug_sample_rate
+
+    def filter(self, record):
+        if record.levelno <= logging.DEBUG and self.debug_sample_rate < 1.0:
+            if random.random() >= self.debug_sample_rate:
+                return False
+        record.request_id = get_request_id()
+        return True
+
+
+class DroppingQueueHandler(QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full"""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+    def prepare(self, record):
+        # Keep the record's extra fields and traceback for the JSON formatter
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def _formatter(log_format):
+    if log_format == 'json':
+        return JsonFormatter()
+    return logging.Formatter(
+        '%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s'
+    )
+
+
+def configure_logging(logger, log_file='logs/rag_bot.log', level='INFO', log_format='json',
+                      console=True, queue_size=10000, debug_sample_rate=1.0):
+    """
+    Route a logger through a non-blocking queue to file and console handlers.
+
+    Used by both the Flask app and the FastAPI app.
+    """
+    handlers = []
+    if log_file:
+        os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+        handlers.append(RotatingFileHandler(log_file, maxBytes=10240000, backupCount=10))
+    if console:
+        handlers.append(logging.StreamHandler(sys.stdout))
+    for handler in handlers:
+        handler.setFormatter(_formatter(log_format))
+
+    log_queue = queue.Queue(maxsize=queue_size)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter(debug_sample_rate))
+
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+
+    for handler in list(logger.handlers):
+        if isinstance(handler, QueueHandler):
+            logger.removeHandler(handler)
+    logger.addHandler(queue_handler)
+    logger.setLevel(getattr(logging, str(level).upper(), logging.INFO))
+    return logger
+
+
+def log_request(logger, method, path, status, duration, stages, **fields):
+    """Emit the one-line summary for a finished request"""
+    logger.info(
+        f"{method} {path} {status} {duration * 1000:.1f}ms",
+        extra={
+            'event': 'request',
+            'method': method,
+            'path': path,
+            'status': status,
+            'duration_ms': round(duration * 1000, 2),
+            'stages_ms': {stage: round(seconds * 1000, 2) for stage, seconds in stages.items()},
+            **fields
+        }
+    )
+
+
+@atexit.register
+def _stop_listeners():
+    for listener in _listeners:
+        try:
+            listener.stop()
+        except Exception:
+            pass
+
 
 def setup_logger(app):
     """Configure application logging"""
+    from flask.logging import default_handler
+
     if not app.debug:
-        if not os.path.exists('logs'):
-            os.mkdir('logs')
-        
-        file_handler = RotatingFileHandler(
-            'logs/rag_bot.log',
-            maxBytes=10240000,
-            backupCount=10
+        # The listener's console handler replaces Flask's synchronous one
+        app.logger.removeHandler(default_handler)
+        configure_logging(
+            app.logger,
+            log_file=app.config['LOG_FILE'],
+            level=app.config['LOG_LEVEL'],
+            log_format=app.config['LOG_FORMAT'],
+            console=app.config['LOG_TO_CONSOLE'],
+            queue_size=app.config['LOG_QUEUE_SIZE'],
+            debug_sample_rate=app.config['LOG_DEBUG_SAMPLE_RATE']
         )
-        file_handler.setFormatter(logging.Formatter(
-            '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-        ))
-        file_handler.setLevel(logging.INFO)
-        app.logger.addHandler(file_handler)
-        app.logger.setLevel(logging.INFO)
         app.logger.info('RAG Bot startup')
+
+    _register_request_logging(app)
+
+
+def _register_request_logging(app):
+    """Bind a request id and log one summary line per request"""
+    from flask import g, request
+    from app.utils.request_context import (
+        new_request_id,
+        reset_request_id,
+        set_request_id,
+        start_stage_recording,
+        stop_stage_recording,
+    )
+
+    @app.before_request
+    def _begin_request():
+        g.request_id = new_request_id(request.headers.get('X-Request-Id'))
+        g.request_id_token = set_request_id(g.request_id)
+        g.stage_token = start_stage_recording()
+        g.log_start = time.perf_counter()
+
+    @app.after_request
+    def _end_request(response):
+        if 'log_start' in g:
+            stages = stop_stage_recording(g.pop('stage_token'))
+            log_request(
+                app.logger, request.method, request.path, response.status_code,
+                time.perf_counter() - g.pop('log_start'), stages
+            )
+            response.headers['X-Request-Id'] = g.request_id
+        return response
+
+    @app.teardown_request
+    def _teardown_request(exc):
+        stage_token = g.pop('stage_token', None)
+        if stage_token is not None:
+            stop_stage_recording(stage_token)
+        token = g.pop('request_id_token', None)
+        if token is not None:
+            reset_request_id(token)
@@ -0,0 +1,470 @@
+"""
+Lightweight latency histograms and counters with Prometheus text output
+
+Observations only touch an in-process dict under a lock. When
+METRICS_MULTIPROC_DIR is set (e.g. under gunicorn), each worker also
+flushes a snapshot to <dir>/<pid>-<token>.json every few seconds from a
+daemon thread, and a scrape of any worker merges the snapshots of all
+workers. The token is random per process, so a worker that reuses the PID
+of a dead one writes its own file.
+
+Each flush also retires the files of exited workers: their counters and
+histograms are added to <dir>/retired.json and the files deleted, so
+totals never go backwards while the directory stays one file per live
+worker. Gauges of exited workers are dropped.
+"""
+import fcntl
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+from app.utils.request_context import record_stage
+
+STAGES = (
+    'query_embed', 'search', 'rerank', 'generate',
+    'extract', 'chunk', 'batch_embed', 'index_write',
+)
+
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+    0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+FLUSH_INTERVAL = 5.0
+
+# Totals of exited workers, and the lock serialising their retirement
+RETIRED_FILE = 'retired.json'
+RETIRED_LOCK = 'retired.lock'
+
+
+class _Metric:
+    """Common bookkeeping for a metric family"""
+
+    kind = None
+
+    def __init__(self, registry, name, documentation, labelnames):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def snapshot(self):
+        with self.registry.lock:
+            return {
+                json.dumps(key): (list(value) if isinstance(value, list) else value)
+                for key, value in self.values.items()
+            }
+
+
+class Counter(_Metric):
+    """Monotonically increasing count"""
+
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        self.registry.touch()
+
+
+class Gauge(_Metric):
+    """Value that can go up and down; only live workers are reported"""
+
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.values[key] = value
+        self.registry.touch()
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+        self.registry.touch()
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    """Distribution of observations in fixed buckets"""
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames, buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _empty(self):
+        # Per-bucket counts (not cumulative), +Inf bucket, sum
+        return [0] * (len(self.buckets) + 1) + [0.0]
+
+    def declare(self, **labels):
+        """Create a zero-valued series so it is exported before first use"""
+        key = self._key(labels)
+        with self.registry.lock:
+            self.values.setdefault(key, self._empty())
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        position = bisect_left(self.buckets, value)
+        with self.registry.lock:
+            series = self.values.get(key)
+            if series is None:
+                series = self.values[key] = self._empty()
+            series[position] += 1
+            series[-1] += value
+        self.registry.touch()
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+class MetricsRegistry:
+    """Collection of metric families plus cross-process snapshot handling"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self._flusher = None
+        self.snapshot_name = _snapshot_name()
+        os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    @staticmethod
+    def multiprocess_dir():
+        return os.getenv('METRICS_MULTIPROC_DIR')
+
+    def touch(self):
+        """Start the snapshot flusher on first use in multiprocess mode"""
+        if self._flusher is None and self.multiprocess_dir():
+            with self.lock:
+                if self._flusher is None:
+                    self._flusher = threading.Thread(
+                        target=self._flush_loop, name='metrics-flusher', daemon=True
+                    )
+                    self._flusher.start()
+
+    def _reset_after_fork(self):
+        # Children start with their own counts and their own flusher
+        self.lock = threading.Lock()
+        self._flusher = None
+        self.snapshot_name = _snapshot_name()
+        for metric in self.metrics.values():
+            metric.values = {}
+        for stage in STAGES:
+            STAGE_LATENCY.declare(stage=stage)
+
+    def snapshot(self):
+        return {
+            name: {'kind': metric.kind, 'values': metric.snapshot()}
+            for name, metric in self.metrics.items()
+        }
+
+    def flush(self):
+        """Write this process's snapshot for other workers to merge"""
+        directory = self.multiprocess_dir()
+        if not directory:
+            return
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, self.snapshot_name)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+        self._retire(directory)
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def _worker_files(self, directory):
+        """Other snapshot files as ({path: pid} of live processes, {path: pid} of exited ones)"""
+        paths = {}
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            name = os.path.basename(path)
+            if name == self.snapshot_name:
+                continue
+            try:
+                paths[path] = (int(name.split('.')[0].split('-')[0]), os.path.getmtime(path))
+            except (OSError, ValueError):
+                continue
+        # Only the newest file of a live PID belongs to a live process, and
+        # every other file of our own PID to an exited one
+        newest = {}
+        for path, (pid, mtime) in paths.items():
+            if pid not in newest or mtime > paths[newest[pid]][1]:
+                newest[pid] = path
+        live, exited = {}, {}
+        for path, (pid, _) in paths.items():
+            if pid != os.getpid() and newest[pid] == path and _pid_alive(pid):
+                live[path] = pid
+            else:
+                exited[path] = pid
+        return live, exited
+
+    def _retire(self, directory):
+        """Fold the counters and histograms of exited processes into RETIRED_FILE and delete their files"""
+        with open(os.path.join(directory, RETIRED_LOCK), 'w') as lock:
+            # One worker at a time, so no snapshot is folded in twice
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            _, exited = self._worker_files(directory)
+            if not exited:
+                return
+            retired_path = os.path.join(directory, RETIRED_FILE)
+            retired = _read_retired(retired_path)
+            done = set(retired['files'])
+            for path in exited:
+                name = os.path.basename(path)
+                if name in done:
+                    continue
+                try:
+                    with open(path) as f:
+                        snapshot = json.load(f)
+                except (OSError, ValueError):
+                    snapshot = {}
+                for metric_name, family in snapshot.items():
+                    if family['kind'] == 'gauge':
+                        continue
+                    target = retired['metrics'].setdefault(metric_name, {'kind': family['kind'], 'values': {}})
+                    _add_values(target['values'], family['values'])
+                done.add(name)
+
+            # Files are listed until removed, so a crash before the removal can't fold them in again
+            retired['files'] = sorted(name for name in done if os.path.exists(os.path.join(directory, name)))
+            tmp_path = f"{retired_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(retired, f)
+            os.replace(tmp_path, retired_path)
+            for path in exited:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def _collect(self):
+        """Merge this process's values with snapshots from other workers"""
+        merged = {}
+        snapshots = [(True, self.snapshot())]
+
+        directory = self.multiprocess_dir()
+        if directory:
+            live, exited = self._worker_files(directory)
+            # Read after listing: a file retired meanwhile is then skipped here, not lost
+            retired = _read_retired(os.path.join(directory, RETIRED_FILE))
+            snapshots.append((False, retired['metrics']))
+            for path in {**live, **exited}:
+                if os.path.basename(path) in retired['files']:
+                    continue
+                try:
+                    with open(path) as f:
+                        snapshots.append((path in live, json.load(f)))
+                except (OSError, ValueError):
+                    continue
+
+        for live, snapshot in snapshots:
+            for name, family in snapshot.items():
+                metric = self.metrics.get(name)
+                if metric is None:
+                    continue
+                if metric.kind == 'gauge' and not live:
+                    continue
+                _add_values(merged.setdefault(name, {}), family['values'])
+        return merged
+
+    def render(self):
+        """Render all metrics in the Prometheus text exposition format"""
+        merged = self._collect()
+        lines = []
+
+        for name, metric in self.metrics.items():
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+
+            for key, value in sorted(merged.get(name, {}).items()):
+                labels = list(zip(metric.labelnames, json.loads(key)))
+
+                if metric.kind != 'histogram':
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float('inf'),), value[:-1]):
+                    cumulative += count
+                    le = '+Inf' if bound == float('inf') else _format_value(bound)
+                    lines.append(f"{name}_bucket{_format_labels(labels + [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(value[-1])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _add_values(target, values):
+    for key, value in values.items():
+        if isinstance(value, list):
+            current = target.setdefault(key, [0] * len(value))
+            target[key] = [a + b for a, b in zip(current, value)]
+        else:
+            target[key] = target.get(key, 0) + value
+
+
+def _read_retired(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'files': [], 'metrics': {}}
+
+
+def _snapshot_name():
+    return f"{os.getpid()}-{uuid.uuid4().hex[:12]}.json"
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = [
+        (k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for k, v in labels
+    ]
+    return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+
+def _format_value(value):
+    if isinstance(value, float) and value.is_integer():
+        return repr(value)
+    return str(value)
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_LATENCY = REGISTRY.histogram(
+    'rag_stage_latency_seconds', 'Latency of each RAG pipeline stage', ['stage']
+)
+STAGE_ERRORS = REGISTRY.counter(
+    'rag_stage_errors_total', 'Exceptions raised inside each RAG pipeline stage', ['stage']
+)
+STAGE_ITEMS = REGISTRY.counter(
+    'rag_stage_items_total', 'Items processed by each stage (pages, chunks, vectors)', ['stage']
+)
+REQUEST_LATENCY = REGISTRY.histogram(
+    'rag_http_request_duration_seconds', 'HTTP request latency by route', ['app', 'route']
+)
+REQUESTS = REGISTRY.counter(
+    'rag_http_requests_total', 'HTTP requests by route and status code', ['app', 'route', 'status']
+)
+ADMISSION_IN_FLIGHT = REGISTRY.gauge(
+    'rag_admission_in_flight', 'Requests currently admitted per pool', ['pool']
+)
+ADMISSION_QUEUE_DEPTH = REGISTRY.gauge(
+    'rag_admission_queue_depth', 'Requests waiting for admission per pool', ['pool']
+)
+ADMISSION_REJECTED = REGISTRY.counter(
+    'rag_admission_rejected_total', 'Requests rejected by admission control', ['pool', 'reason']
+)
+ADMISSION_WAIT = REGISTRY.histogram(
+    'rag_admission_wait_seconds', 'Time queued requests waited for a slot', ['pool']
+)
+CIRCUIT_STATE = REGISTRY.gauge(
+    'rag_circuit_state', 'Upstream circuit breaker state (0 closed, 1 half-open, 2 open)', ['name']
+)
+UPSTREAM_RETRIES = REGISTRY.counter(
+    'rag_upstream_retries_total', 'Retried upstream model calls', ['call']
+)
+UPSTREAM_HEDGES = REGISTRY.counter(
+    'rag_upstream_hedges_total', 'Hedged upstream calls by which request won', ['call', 'winner']
+)
+ANSWER_CACHE = REGISTRY.counter(
+    'rag_answer_cache_total', 'Answer cache lookups and fallbacks by result', ['result']
+)
+LOADED_STORE_BYTES = REGISTRY.gauge(
+    'rag_loaded_store_bytes', 'Mapped size of the vector stores loaded in this process', []
+)
+STORE_EVICTIONS = REGISTRY.counter(
+    'rag_store_evictions_total', 'Loaded vector stores evicted to stay within the memory budget', []
+)
+SHARD_REQUESTS = REGISTRY.counter(
+    'rag_shard_requests_total', 'Shard search requests by shard and outcome (ok, timeout, error)',
+    ['shard', 'result']
+)
+EXTRACTED_TEXT_CACHE = REGISTRY.counter(
+    'rag_extracted_text_cache_total', 'Extracted text cache lookups by result (hit, miss)', ['result']
+)
+EMBEDDING_CACHE = REGISTRY.counter(
+    'rag_embedding_cache_total', 'Embedding cache lookups by result (hit, miss), per text', ['result']
+)
+PREWARMED_ANSWERS = REGISTRY.counter(
+    'rag_prewarmed_answers_total', 'Answers pre-warmed after content updates by result (warmed, cached, failed)',
+    ['result']
+)
+QUERY_LOG_ENTRIES = REGISTRY.counter(
+    'rag_query_log_entries_total', 'Query log entries by outcome (written, dropped)', ['result']
+)
+
+for _stage in STAGES:
+    STAGE_LATENCY.declare(stage=_stage)
+
+
+@contextmanager
+def timed(stage):
+    """Time a pipeline stage, recording its latency and any exception"""
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.inc(stage=stage)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.observe(elapsed, stage=stage)
+        record_stage(stage, elapsed)
+
+
+def render_prometheus():
+    """Prometheus text exposition for the /metrics endpoints"""
+    return REGISTRY.render()
+
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
@@ -0,0 +1,156 @@
+"""
+On-demand statistical profiling of individual requests
+
+A request is profiled when it carries the profiling header set to
+PROFILE_TOKEN (ignored while no token is configured) or is picked by
+PROFILE_SAMPLE_RATE. A background thread samples the request thread's
+stack every PROFILE_INTERVAL seconds; the result is written to
+PROFILES_DIR as <trace_id>.folded (collapsed stacks for flamegraph.pl /
+speedscope) and <trace_id>.json (stage breakdown). Unsampled requests
+only pay a header lookup.
+"""
+import hmac
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+from app.utils.request_context import (
+    current_stage_timings,
+    stage_recording_active,
+    start_stage_recording,
+    stop_stage_recording,
+)
+
+TRACE_HEADER = 'X-Trace-Id'
+
+
+class SamplingProfiler:
+    """Samples one thread's call stack at a fixed interval"""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-profiler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+
+            key = ";".join(reversed(stack))
+            self.stacks[key] = self.stacks.get(key, 0) + 1
+            self.samples += 1
+
+    def collapsed(self):
+        """Stacks in the collapsed 'frame;frame;frame count' format"""
+        return "\n".join(f"{stack} {count}" for stack, count in sorted(self.stacks.items()))
+
+
+def should_profile(header_value, sample_rate, token=None):
+    """
+    Decide whether to profile a request. The header only counts when it
+    matches PROFILE_TOKEN, so without a token clients can't trigger profiles.
+    """
+    if header_value and token and hmac.compare_digest(header_value, token):
+        return True
+    return sample_rate > 0 and random.random() < sample_rate
+
+
+@contextmanager
+def profile_request(name, profiles_dir, interval=0.005, metadata=None):
+    """
+    Profile the enclosed block on the current thread.
+
+    Yields the trace id; the profile files are written when the block exits.
+    """
+    trace_id = uuid.uuid4().hex
+    started_at = datetime.now().isoformat()
+    # Reuse the request's stage recording if one is already running
+    outer = current_stage_timings() if stage_recording_active() else None
+    token = start_stage_recording() if outer is None else None
+    profiler = SamplingProfiler(threading.get_ident(), interval)
+
+    start = time.perf_counter()
+    profiler.start()
+    try:
+        yield trace_id
+    finally:
+        profiler.stop()
+        duration = time.perf_counter() - start
+        if token is not None:
+            stages = stop_stage_recording(token)
+        else:
+            stages = {
+                stage: seconds - outer.get(stage, 0.0)
+                for stage, seconds in current_stage_timings().items()
+                if seconds - outer.get(stage, 0.0) > 0
+            }
+
+        os.makedirs(profiles_dir, exist_ok=True)
+        with open(os.path.join(profiles_dir, f"{trace_id}.folded"), 'w') as f:
+            f.write(profiler.collapsed())
+        with open(os.path.join(profiles_dir, f"{trace_id}.json"), 'w') as f:
+            json.dump({
+                'trace_id': trace_id,
+                'name': name,
+                'started_at': started_at,
+                'duration_ms': duration * 1000,
+                'stages_ms': {stage: seconds * 1000 for stage, seconds in stages.items()},
+                'unattributed_ms': max(0.0, duration - sum(stages.values())) * 1000,
+                'samples': profiler.samples,
+                'interval_ms': interval * 1000,
+                **(metadata or {}),
+            }, f, indent=2)
+
+
+def profiled(name):
+    """Flask view decorator enabling on-demand profiling for the route"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import current_app, make_response, request
+
+            config = current_app.config
+            if not should_profile(
+                request.headers.get(config['PROFILE_HEADER']),
+                config['PROFILE_SAMPLE_RATE'],
+                config['PROFILE_TOKEN']
+            ):
+                return view(*args, **kwargs)
+
+            with profile_request(
+                name,
+                config['PROFILES_DIR'],
+                config['PROFILE_INTERVAL'],
+                {'method': request.method, 'path': request.path}
+            ) as trace_id:
+                response = make_response(view(*args, **kwargs))
+
+            response.headers[TRACE_HEADER] = trace_id
+            current_app.logger.info(f"Profiled {name} as trace {trace_id}")
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,161 @@
+"""
+Durable log of answered queries, for tuning caches and indexes and for
+replaying real traffic (benchmarks/replay_queries.py)
+
+Entries are compact JSON lines handed to a bounded queue and appended by
+a background listener, like the application log, to
+QUERY_LOG_DIR/queries-<pid>.jsonl; each process writes its own file so
+workers never interleave or race on rotation. A file is rotated at
+QUERY_LOG_MAX_MB, rotated files are gzipped and QUERY_LOG_BACKUPS of
+them are kept per process.
+
+Entry fields:
+    ts    unix time the query arrived
+    q     question
+    k     top_k
+    c     collection (omitted for the default one)
+    f     search filters (omitted when none)
+    ids   retrieved chunks as doc_id:row
+    s     their scores (L2 distances)
+    ms    milliseconds spent per stage (query_embed, search, generate, ...)
+    t     total milliseconds
+    hit   answered from the answer cache
+    err   error, for failed queries
+    b     size of the batch the question came in (batch requests only)
+"""
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import random
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from logging.handlers import QueueListener, RotatingFileHandler
+from app.utils.metrics import QUERY_LOG_ENTRIES
+from app.utils.request_context import separate_stages
+
+_logs = {}
+_lock = threading.Lock()
+
+
+def _gzip_rotate(source, dest):
+    with open(source, 'rb') as src, gzip.open(dest, 'wb') as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+class QueryLog:
+    """Append-only, size-rotated query log of one process"""
+
+    def __init__(self, directory, max_bytes, backups, sample_rate=1.0, queue_size=10000):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f"queries-{os.getpid()}.jsonl")
+        self.sample_rate = sample_rate
+
+        handler = RotatingFileHandler(self.path, maxBytes=max_bytes, backupCount=backups, encoding='utf-8')
+        handler.namer = lambda name: f"{name}.gz"
+        handler.rotator = _gzip_rotate
+        handler.setFormatter(logging.Formatter('%(message)s'))
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._listener = QueueListener(self._queue, handler)
+        self._listener.start()
+        atexit.register(self._listener.stop)
+
+    @classmethod
+    def from_config(cls, config):
+        """The process's query log for these settings, or None if disabled"""
+        if not config['QUERY_LOG_ENABLED']:
+            return None
+        key = (os.path.abspath(config['QUERY_LOG_DIR']), os.getpid())
+        with _lock:
+            if key not in _logs:
+                _logs[key] = cls(
+                    config['QUERY_LOG_DIR'],
+                    int(config['QUERY_LOG_MAX_MB'] * 1024 * 1024),
+                    config['QUERY_LOG_BACKUPS'],
+                    config['QUERY_LOG_SAMPLE_RATE']
+                )
+            return _logs[key]
+
+    def write(self, entry):
+        """Queue an entry; dropped rather than blocking when the queue is full"""
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            return
+        line = json.dumps(entry, separators=(',', ':'), ensure_ascii=False, default=str)
+        try:
+            self._queue.put_nowait(logging.makeLogRecord({'msg': line}))
+            QUERY_LOG_ENTRIES.inc(result='written')
+        except queue.Full:
+            QUERY_LOG_ENTRIES.inc(result='dropped')
+
+
+def chunk_ids(chunks):
+    return [f"{chunk.get('doc_id')}:{chunk.get('index')}" for chunk in chunks]
+
+
+@contextmanager
+def logged_query(query_log, query, top_k, collection=None, filters=None,
+                 shared_stages=None, shared_seconds=0.0, **fields):
+    """
+    Time the enclosed answer and log it. Yields the entry so the caller
+    can add ids, s and hit. shared_stages/shared_seconds account for work
+    done once for several queries (a batch's embedding and search).
+    """
+    if query_log is None:
+        yield {}
+        return
+
+    entry = {'ts': round(time.time(), 3), 'q': query, 'k': top_k}
+    if collection:
+        entry['c'] = collection
+    if filters:
+        entry['f'] = filters
+    entry.update(fields)
+
+    start = time.perf_counter()
+    try:
+        with separate_stages() as stages:
+            yield entry
+    except Exception as e:
+        entry['err'] = str(e)[:200]
+        raise
+    finally:
+        elapsed = time.perf_counter() - start + shared_seconds
+        combined = dict(shared_stages or {})
+        for stage, seconds in stages.items():
+            combined[stage] = combined.get(stage, 0.0) + seconds
+        entry['ms'] = {stage: round(seconds * 1000, 2) for stage, seconds in combined.items()}
+        entry['t'] = round(elapsed * 1000, 2)
+        query_log.write(entry)
+
+
+def log_files(directory):
+    """Query log files in a directory, rotated (gzipped) ones included"""
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.startswith('queries-') and (name.endswith('.jsonl') or name.endswith('.gz'))
+    )
+
+
+def read_entries(paths):
+    """All entries of the given log files, oldest first"""
+    entries = []
+    for path in paths:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A line cut short by a crash
+                    continue
+    entries.sort(key=lambda entry: entry.get('ts', 0))
+    return entries
@@ -0,0 +1,74 @@
+"""
+Per-request context shared by metrics, profiling and logging
+"""
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+_stage_timings = ContextVar('stage_timings', default=None)
+_request_id = ContextVar('request_id', default=None)
+
+
+def new_request_id(incoming=None):
+    """Use the caller's request id if it looks sane, otherwise make one"""
+    if incoming and len(incoming) <= 64 and incoming.replace('-', '').isalnum():
+        return incoming
+    return uuid.uuid4().hex[:16]
+
+
+def set_request_id(request_id):
+    """Bind a request id to the current context; returns a reset token"""
+    return _request_id.set(request_id)
+
+
+def reset_request_id(token):
+    _request_id.reset(token)
+
+
+def get_request_id():
+    return _request_id.get()
+
+
+def start_stage_recording():
+    """Collect stage timings for the current request; returns a reset token"""
+    return _stage_timings.set({})
+
+
+def stop_stage_recording(token):
+    """Stop collecting and return {stage: total seconds} for the request"""
+    timings = _stage_timings.get()
+    _stage_timings.reset(token)
+    return timings or {}
+
+
+def stage_recording_active():
+    return _stage_timings.get() is not None
+
+
+def record_stage(stage, seconds):
+    """Add a stage duration to the current request, if one is being recorded"""
+    timings = _stage_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def current_stage_timings():
+    """Stage timings recorded so far for the current request"""
+    return dict(_stage_timings.get() or {})
+
+
+@contextmanager
+def separate_stages():
+    """
+    Record the enclosed stages on their own, yielding the dict they are
+    collected into (filled on exit). They still count towards the
+    surrounding request's timings.
+    """
+    token = start_stage_recording()
+    stages = {}
+    try:
+        yield stages
+    finally:
+        stages.update(stop_stage_recording(token))
+        for stage, seconds in stages.items():
+            record_stage(stage, seconds)
@@ -0,0 +1,196 @@
+"""
+Retries, hedged requests and circuit breaking for upstream model calls
+"""
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeout
+from app.utils.metrics import CIRCUIT_STATE, UPSTREAM_HEDGES, UPSTREAM_RETRIES
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream that is currently failing"""
+
+    def __init__(self, name, retry_in):
+        super().__init__(f"{name} is unavailable (circuit open, retry in {retry_in:.0f}s)")
+        self.name = name
+        self.retry_in = retry_in
+
+
+class RetryPolicy:
+    """Bounded retries with full-jitter exponential backoff"""
+
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=8.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, attempt, retry_after=None):
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after:
+            delay = max(delay, min(float(retry_after), self.max_delay))
+        return delay
+
+
+def call_with_retries(func, policy, is_retryable, name='upstream', retry_after=None):
+    """
+    Call func, retrying transient failures according to policy.
+
+    retry_after(exc) may return a server-suggested delay in seconds.
+    """
+    for attempt in range(policy.max_attempts):
+        try:
+            return func()
+        except Exception as e:
+            if attempt == policy.max_attempts - 1 or not is_retryable(e):
+                raise
+            UPSTREAM_RETRIES.inc(call=name)
+            time.sleep(policy.backoff(attempt, retry_after(e) if retry_after else None))
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after failure_threshold consecutive failures; open ->
+    half-open after recovery_timeout, when a single trial call is let
+    through; its success closes the circuit, its failure re-opens it.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, name, failure_threshold=5, recovery_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+    @property
+    def state(self):
+        return self._state
+
+    def _set_state(self, state):
+        self._state = state
+        CIRCUIT_STATE.set(state, name=self.name)
+
+    def before_call(self):
+        """Raise CircuitOpenError unless a call may go through now"""
+        with self._lock:
+            if self._state == self.CLOSED:
+                return
+            elapsed = time.monotonic() - self._opened_at
+            if self._state == self.OPEN and elapsed >= self.recovery_timeout:
+                self._set_state(self.HALF_OPEN)
+            if self._state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            raise CircuitOpenError(self.name, max(0.0, self.recovery_timeout - elapsed))
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._trial_in_flight = False
+            if self._state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._set_state(self.OPEN)
+
+    def call(self, func, is_failure=lambda e: True):
+        self.before_call()
+        try:
+            result = func()
+        except Exception as e:
+            if is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        self.record_success()
+        return result
+
+
+class LatencyTracker:
+    """Rolling window of recent latencies for percentile-based deadlines"""
+
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, p, minimum_samples=20):
+        with self._lock:
+            if len(self._samples) < minimum_samples:
+                return None
+            ordered = sorted(self._samples)
+        return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+_hedge_executor = None
+_hedge_lock = threading.Lock()
+
+
+def _executor():
+    global _hedge_executor
+    if _hedge_executor is None:
+        with _hedge_lock:
+            if _hedge_executor is None:
+                _hedge_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='hedge')
+    return _hedge_executor
+
+
+def hedged_call(func, delay, name='upstream'):
+    """
+    Run func; if it hasn't finished after delay seconds, start a duplicate
+    and return whichever succeeds first.
+    """
+    primary = _executor().submit(func)
+    try:
+        return primary.result(timeout=delay)
+    except FutureTimeout:
+        pass
+
+    hedge = _executor().submit(func)
+    pending = {primary, hedge}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                UPSTREAM_HEDGES.inc(call=name, winner='hedge' if future is hedge else 'primary')
+                return future.result()
+            error = future.exception()
+    raise error
+
+
+_breakers = {}
+_trackers = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(name, failure_threshold, recovery_timeout):
+    """Process-wide circuit breaker for an upstream call"""
+    with _registry_lock:
+        if name not in _breakers:
+            _breakers[name] = CircuitBreaker(name, failure_threshold, recovery_timeout)
+        return _breakers[name]
+
+
+def get_latency_tracker(name):
+    """Process-wide latency window for an upstream call"""
+    with _registry_lock:
+        if name not in _trackers:
+            _trackers[name] = LatencyTracker()
+        return _trackers[name]
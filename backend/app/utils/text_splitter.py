@@ -1,19 +1,27 @@
 """
 Text chunking utilities
 """
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from flask import current_app
+from functools import lru_cache
+from app.config.settings import resolve_config
 
-def create_text_splitter():
+def create_text_splitter(config=None):
     """Create configured text splitter"""
+    config = resolve_config(config)
+    return _splitter(config['CHUNK_SIZE'], config['CHUNK_OVERLAP'])
+
+@lru_cache(maxsize=8)
+def _splitter(chunk_size, chunk_overlap):
+    # langchain is slow to import; load it only when text is first chunked
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    
     return RecursiveCharacterTextSplitter(
-        chunk_size=current_app.config['CHUNK_SIZE'],
-        chunk_overlap=current_app.config['CHUNK_OVERLAP'],
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
         length_function=len,
         separators=["\n\n", "\n", " ", ""]
     )
 
-def chunk_text(text):
+def chunk_text(text, config=None):
     """Split text into chunks"""
-    splitter = create_text_splitter()
+    splitter = create_text_splitter(config)
     return splitter.split_text(text)
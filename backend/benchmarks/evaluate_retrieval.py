@@ -0,0 +1,341 @@
+"""
+Retrieval quality and latency over a grid of chunking and index settings
+
+Evaluates a golden set of questions, each with the documents (and
+optionally pages) that answer it, against one store per CHUNK_SIZE /
+CHUNK_OVERLAP combination, searched exactly and with each two-stage
+COARSE_SEARCH_DIMENSION / RERANK_CANDIDATES setting at every top_k.
+Reports recall@k, MRR@k, hit rate, index size, build time and search
+latency as a table and optionally as JSON.
+
+Page texts come from the extracted text cache and embeddings from the
+embedding cache, so a sweep only embeds chunk texts it hasn't seen in an
+earlier configuration or run.
+
+Golden set (JSONL, or a JSON list), one question per entry:
+    {"question": "What was the Zoho cutoff?", "document": "Zoho_feedback_4.pdf", "page": 2}
+    {"question": "...", "relevant": [{"document": "a.pdf"}, {"document": "b.pdf", "page": 1}]}
+
+Usage (from backend/):
+    python -m benchmarks.evaluate_retrieval --golden golden.jsonl --pdfs data/uploads \\
+        --chunk-sizes 500,1000 --chunk-overlaps 100,200 --top-k 3,5,10 --index exact,128:100
+    EMBEDDING_PROVIDER=local python -m benchmarks.evaluate_retrieval --synthetic 20 --output eval.json
+"""
+import argparse
+import json
+import os
+import random
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.run_benchmarks import summarize_latencies
+from benchmarks.synthetic_corpus import generate_corpus
+
+
+def load_golden(path):
+    """Golden entries as {'question', 'relevant': [(document, page or None), ...]}"""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    stripped = text.lstrip()
+    if stripped.startswith('['):
+        raw = json.loads(stripped)
+    else:
+        raw = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    entries = []
+    for number, item in enumerate(raw, 1):
+        targets = item.get('relevant') or [item]
+        relevant = [(target['document'], target.get('page')) for target in targets if target.get('document')]
+        if not item.get('question') or not relevant:
+            raise ValueError(f"Golden entry {number} needs a question and a document")
+        entries.append({'question': item['question'], 'relevant': relevant})
+    return entries
+
+
+def synthetic_golden(pages_by_document, count, seed=7):
+    """
+    Questions made of a run of words from a random sentence of a random
+    page, with that page as the relevant one
+    """
+    rng = random.Random(seed)
+    candidates = [
+        (document, page, sentence)
+        for document, pages in sorted(pages_by_document.items())
+        for page, text in sorted(pages.items())
+        for sentence in re.split(r'(?<=[.!?])\s+', text)
+        if len(sentence.split()) >= 10
+    ]
+    entries = []
+    for document, page, sentence in rng.sample(candidates, min(count, len(candidates))):
+        words = sentence.split()
+        length = rng.randint(6, min(10, len(words)))
+        start = rng.randint(0, len(words) - length)
+        entries.append({'question': ' '.join(words[start:start + length]), 'relevant': [(document, page)]})
+    return entries
+
+
+def parse_index(spec):
+    """'exact' or '<coarse dimension>:<rerank candidates>'"""
+    if spec == 'exact':
+        return {'label': 'exact', 'COARSE_SEARCH_DIMENSION': 0}
+    try:
+        dimension, candidates = (int(part) for part in spec.split(':'))
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(f"Index must be 'exact' or DIMENSION:CANDIDATES, got {spec!r}") from e
+    return {
+        'label': f"coarse{dimension}/r{candidates}",
+        'COARSE_SEARCH_DIMENSION': dimension,
+        'RERANK_CANDIDATES': candidates,
+    }
+
+
+def int_list(value):
+    return [int(part) for part in value.split(',') if part.strip()]
+
+
+def score(ranked, relevant):
+    """recall, reciprocal rank and hit of one ranked chunk list against the relevant (document, page) pairs"""
+    found = set()
+    first = None
+    for rank, chunk in enumerate(ranked, 1):
+        matched = [
+            target for target in relevant
+            if chunk.get('document') == target[0] and target[1] in (None, chunk.get('page'))
+        ]
+        if matched and first is None:
+            first = rank
+        found.update(matched)
+    return len(found) / len(relevant), 1.0 / first if first else 0.0, first is not None
+
+
+def _embedding_cache_counts():
+    from app.utils.metrics import EMBEDDING_CACHE
+
+    values = EMBEDDING_CACHE.snapshot()
+    return values.get(json.dumps(['hit']), 0), values.get(json.dumps(['miss']), 0)
+
+
+def build_store(config, pages_by_document):
+    """Chunk, embed and index every document; returns the chunk count and timings"""
+    from app.services.rag_engine import RAGEngine
+    from app.services.store_writer import get_writer
+
+    engine = RAGEngine(config)
+    hits, misses = _embedding_cache_counts()
+    start = time.perf_counter()
+    documents = [
+        (filename, digest, *engine.embed_pages(pages))
+        for filename, (digest, pages) in sorted(pages_by_document.items())
+    ]
+    embedded = time.perf_counter()
+
+    # Queue every document before waiting, so the writer commits them in batches
+    writer = get_writer(config['VECTOR_DB_PATH'], config)
+    futures = [
+        writer.submit('add', filename=filename, chunks=chunks, embeddings=embeddings, doc_id=None,
+                      content_hash=digest)
+        for filename, digest, chunks, embeddings in documents if chunks
+    ]
+    for future in futures:
+        future.result()
+    written = time.perf_counter()
+
+    after_hits, after_misses = _embedding_cache_counts()
+    return {
+        'chunks': sum(len(chunks) for _, _, chunks, _ in documents),
+        'embed_seconds': embedded - start,
+        'index_write_seconds': written - embedded,
+        'embedding_cache_hits': after_hits - hits,
+        'embedding_cache_misses': after_misses - misses,
+    }
+
+
+def evaluate_index(config, golden, query_vectors, top_ks, index):
+    """Quality and latency of one index setting at each top_k"""
+    from app.services.diagnostics import store_report
+    from app.services.vector_service import VectorService
+
+    service = VectorService({**config, **{key: value for key, value in index.items() if key != 'label'}})
+    report = store_report(service)
+    index_bytes = sum(
+        size for name, size in report['file_bytes'].items() if not name.startswith('coarse-')
+    )
+    coarse_dimension = report['index_params']['coarse_search_dimension']
+    coarse_seconds = 0.0
+    if coarse_dimension:
+        # Derive the coarse vectors up front so they count towards build time, not the first search
+        start = time.perf_counter()
+        service.generation.coarse_vectors(coarse_dimension)
+        coarse_seconds = time.perf_counter() - start
+        index_bytes += os.path.getsize(os.path.join(service.generation.path, f"coarse-{coarse_dimension}.npy"))
+
+    results = []
+    for top_k in top_ks:
+        service.search(query_vectors[0], top_k=top_k)  # warm-up
+        recalls, reciprocal_ranks, hits, latencies = [], [], 0, []
+        for entry, vector in zip(golden, query_vectors):
+            t0 = time.perf_counter()
+            ranked = service.search(vector, top_k=top_k)
+            latencies.append(time.perf_counter() - t0)
+            recall, reciprocal_rank, hit = score(ranked, entry['relevant'])
+            recalls.append(recall)
+            reciprocal_ranks.append(reciprocal_rank)
+            hits += hit
+
+        results.append({
+            'index': index['label'],
+            'exact': not coarse_dimension,
+            'coarse_search_dimension': coarse_dimension,
+            'rerank_candidates': index.get('RERANK_CANDIDATES') if coarse_dimension else None,
+            'top_k': top_k,
+            'recall': sum(recalls) / len(recalls),
+            'mrr': sum(reciprocal_ranks) / len(reciprocal_ranks),
+            'hit_rate': hits / len(golden),
+            'index_bytes': index_bytes,
+            'coarse_build_seconds': coarse_seconds,
+            'search_latency': summarize_latencies(latencies),
+        })
+    return results
+
+
+def evaluate(config, pages_by_document, golden, chunk_sizes, chunk_overlaps, top_ks, indexes, workdir):
+    """Run the whole grid; returns one result row per configuration"""
+    from app.services.embedding_service import EmbeddingService
+
+    query_vectors = EmbeddingService(config).generate_embeddings(
+        [{'text': entry['question']} for entry in golden], task_type="RETRIEVAL_QUERY"
+    )
+
+    rows = []
+    for chunk_size in chunk_sizes:
+        for chunk_overlap in chunk_overlaps:
+            if chunk_overlap >= chunk_size:
+                print(f"  skipping chunk size {chunk_size} with overlap {chunk_overlap}")
+                continue
+            store_config = {
+                **config,
+                'CHUNK_SIZE': chunk_size,
+                'CHUNK_OVERLAP': chunk_overlap,
+                'VECTOR_DB_PATH': os.path.join(workdir, 'stores', f"chunk{chunk_size}-overlap{chunk_overlap}"),
+            }
+            shutil.rmtree(store_config['VECTOR_DB_PATH'], ignore_errors=True)
+            build = build_store(store_config, pages_by_document)
+            print(f"  chunk size {chunk_size}, overlap {chunk_overlap}: {build['chunks']} chunks, "
+                  f"embedded in {build['embed_seconds']:.2f}s "
+                  f"({build['embedding_cache_hits']} cached, {build['embedding_cache_misses']} new)")
+            for index in indexes:
+                for result in evaluate_index(store_config, golden, query_vectors, top_ks, index):
+                    rows.append({'chunk_size': chunk_size, 'chunk_overlap': chunk_overlap, **build, **result})
+    return rows
+
+
+def print_table(rows):
+    header = (f"{'chunk':>6} {'overlap':>7} {'index':<16} {'k':>3} {'recall':>7} {'mrr':>6} {'hit':>6} "
+              f"{'chunks':>7} {'size MB':>8} {'build s':>8} {'p50 ms':>8} {'p95 ms':>8}")
+    print(header)
+    print('-' * len(header))
+    for row in rows:
+        build_seconds = row['embed_seconds'] + row['index_write_seconds'] + row['coarse_build_seconds']
+        print(f"{row['chunk_size']:>6} {row['chunk_overlap']:>7} {row['index']:<16} {row['top_k']:>3} "
+              f"{row['recall']:>7.3f} {row['mrr']:>6.3f} {row['hit_rate']:>6.3f} {row['chunks']:>7} "
+              f"{row['index_bytes'] / 1024 / 1024:>8.2f} {build_seconds:>8.2f} "
+              f"{row['search_latency']['p50_ms']:>8.2f} {row['search_latency']['p95_ms']:>8.2f}")
+
+
+def main():
+    from app.config.settings import Config, config_dict
+    from app.services.pdf_service import PDFService
+
+    parser = argparse.ArgumentParser(description="Retrieval quality and latency over chunking and index settings")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--golden', help="Golden set of questions and relevant documents/pages (JSONL or JSON)")
+    source.add_argument('--synthetic', type=int, metavar='DOCS',
+                        help="Generate this many synthetic PDFs and a golden set from their pages")
+    parser.add_argument('--pdfs', default=Config.UPLOAD_FOLDER, help="Directory of the golden set's PDFs")
+    parser.add_argument('--questions', type=int, default=100, help="Questions of a synthetic golden set")
+    parser.add_argument('--chunk-sizes', type=int_list, default=[Config.CHUNK_SIZE])
+    parser.add_argument('--chunk-overlaps', type=int_list, default=[Config.CHUNK_OVERLAP])
+    parser.add_argument('--top-k', type=int_list, default=[Config.TOP_K_CHUNKS])
+    parser.add_argument('--index', default='exact',
+                        help="Comma-separated index settings: exact or DIMENSION:CANDIDATES (two-stage)")
+    parser.add_argument('--embedding-cache', default=Config.EMBEDDING_CACHE_PATH,
+                        help="Embedding cache to read and fill (default: EMBEDDING_CACHE_PATH)")
+    parser.add_argument('--workdir', help="Where to build the stores (default: a temporary directory)")
+    parser.add_argument('--keep', action='store_true', help="Keep the stores built in --workdir")
+    parser.add_argument('--output', help="Write the results as JSON")
+    args = parser.parse_args()
+    indexes = [parse_index(spec.strip()) for spec in args.index.split(',') if spec.strip()]
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='rag_eval_')
+    config = {
+        **config_dict(Config),
+        'EMBEDDING_CACHE_ENABLED': True,
+        'EMBEDDING_CACHE_PATH': args.embedding_cache,
+        'EMBEDDING_BATCH_DELAY': 0.0,
+        'QUERY_LOG_ENABLED': False,
+    }
+
+    try:
+        if args.synthetic:
+            pdf_dir = os.path.join(workdir, 'pdfs')
+            pdf_paths = generate_corpus(pdf_dir, count=args.synthetic)
+            config['PROCESSED_FOLDER'] = os.path.join(workdir, 'processed')
+        else:
+            pdf_dir = args.pdfs
+            pdf_paths = sorted(
+                os.path.join(pdf_dir, name) for name in os.listdir(pdf_dir) if name.lower().endswith('.pdf')
+            )
+
+        pdf_service = PDFService(config)
+        pages_by_document = {}
+        for path in pdf_paths:
+            pages_by_document[os.path.basename(path)] = pdf_service.extract(path)
+
+        if args.synthetic:
+            golden = synthetic_golden(
+                {filename: pages for filename, (_, pages) in pages_by_document.items()}, args.questions
+            )
+        else:
+            golden = load_golden(args.golden)
+            missing = {document for entry in golden for document, _ in entry['relevant']} - set(pages_by_document)
+            if missing:
+                print(f"Golden set refers to PDFs not in {pdf_dir}: {', '.join(sorted(missing))}")
+                sys.exit(1)
+        if not golden:
+            print("Golden set is empty")
+            sys.exit(1)
+
+        print(f"Evaluating {len(golden)} questions over {len(pages_by_document)} documents "
+              f"with {config['EMBEDDING_PROVIDER']} embeddings")
+        rows = evaluate(config, pages_by_document, golden, args.chunk_sizes, args.chunk_overlaps,
+                        args.top_k, indexes, workdir)
+    finally:
+        if not args.keep:
+            shutil.rmtree(os.path.join(workdir, 'stores'), ignore_errors=True)
+            if not args.workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+    print()
+    print_table(rows)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'embedding_provider': config['EMBEDDING_PROVIDER'],
+                'embedding_model': config['EMBEDDING_MODEL'],
+                'documents': len(pages_by_document),
+                'questions': len(golden),
+                'results': rows,
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+Cold-start import budget for the two entry points
+
+Boots each entry point in a fresh interpreter with -X importtime, reports
+the total import time, the slowest top-level packages and any heavy
+module that was imported eagerly, and fails if a budget is exceeded.
+
+Usage (from backend/):
+    python -m benchmarks.import_budget
+    python -m benchmarks.import_budget --flask-budget-ms 500 --fastapi-budget-ms 1000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Modules that must only be imported by warm-up or the first real request
+HEAVY_MODULES = ('faiss', 'fitz', 'pymupdf', 'google.genai', 'langchain_core',
+                 'langchain_community', 'langchain_google_genai', 'langchain_text_splitters')
+
+ENTRY_POINTS = {
+    'flask': "from app import create_app; create_app()",
+    'fastapi': "import app.main",
+}
+
+_REPORT = (
+    "import json, sys; "
+    "print('MODULES=' + json.dumps(sorted(sys.modules)), file=sys.stderr)"
+)
+
+
+def measure(code):
+    """Boot code in a fresh interpreter; return wall time, import times and loaded modules"""
+    env = dict(os.environ, WARMUP_ON_STARTUP='False', LOG_FILE='', LOG_TO_CONSOLE='False')
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"{code}; {_REPORT}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+
+    packages = {}
+    modules = []
+    for line in result.stderr.splitlines():
+        if line.startswith('MODULES='):
+            modules = json.loads(line[len('MODULES='):])
+        elif line.startswith('import time:') and '|' in line:
+            own, _, name = line[len('import time:'):].split('|')
+            if not own.strip().isdigit():
+                continue
+            # Attribute each module's own import time to its top-level package
+            package = name.strip().split('.')[0]
+            packages[package] = packages.get(package, 0) + int(own) / 1000
+
+    return {
+        'wall_ms': wall * 1000,
+        'import_ms': sum(packages.values()),
+        'packages_ms': dict(sorted(packages.items(), key=lambda item: -item[1])),
+        'heavy_modules': [m for m in HEAVY_MODULES if m in modules],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start import budget report")
+    parser.add_argument('--flask-budget-ms', type=float, default=500)
+    parser.add_argument('--fastapi-budget-ms', type=float, default=1000)
+    parser.add_argument('--top', type=int, default=8, help="Slowest packages to list")
+    parser.add_argument('--output', help="Write the report as JSON")
+    args = parser.parse_args()
+
+    budgets = {'flask': args.flask_budget_ms, 'fastapi': args.fastapi_budget_ms}
+    report = {}
+    failed = False
+
+    for name, code in ENTRY_POINTS.items():
+        result = report[name] = measure(code)
+        within = result['import_ms'] <= budgets[name] and not result['heavy_modules']
+        failed = failed or not within
+
+        print(f"{name}: imports {result['import_ms']:.0f} ms, process {result['wall_ms']:.0f} ms "
+              f"(budget {budgets[name]:.0f} ms) {'OK' if within else 'OVER BUDGET'}")
+        for package, ms in list(result['packages_ms'].items())[:args.top]:
+            print(f"  {package:<28}{ms:>8.1f} ms")
+        if result['heavy_modules']:
+            print(f"  eagerly imported: {', '.join(result['heavy_modules'])}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+Replay recorded production queries (app/utils/query_log.py) against a
+running server or the RAG engine in-process
+
+Requests are sent at the recorded inter-arrival times, scaled by --speed
+(2 = twice as fast, 0 = as fast as --concurrency allows). Latency is
+reported both from when each request was sent and from when it was due,
+so a server that falls behind shows up in the second figure instead of
+silently slowing the replay down. Cache hit rates are compared with the
+recorded ones.
+
+Usage (from backend/):
+    python -m benchmarks.replay_queries logs/queries --speed 5
+    python -m benchmarks.replay_queries logs/queries --url http://127.0.0.1:5000 --output replay.json
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.run_benchmarks import summarize_latencies
+
+
+def load_entries(paths, limit=None):
+    from app.utils.query_log import log_files, read_entries
+
+    files = []
+    for path in paths:
+        files.extend(log_files(path) if os.path.isdir(path) else [path])
+    entries = read_entries(files)
+    return entries[:limit] if limit else entries
+
+
+def http_sender(base_url, api, timeout):
+    """Send an entry to a running Flask or FastAPI server; returns whether it was a cache hit"""
+    import httpx
+
+    client = httpx.Client(base_url=base_url.rstrip('/'), timeout=timeout)
+
+    def send(entry):
+        if api == 'fastapi':
+            response = client.post('/api/query', json={'question': entry['q']})
+        else:
+            path = f"/api/query/{entry['c']}/ask" if entry.get('c') else '/api/query/ask'
+            response = client.post(path, json={'query': entry['q'], 'top_k': entry.get('k'),
+                                               'filters': entry.get('f')})
+        response.raise_for_status()
+        return bool(response.json().get('cached'))
+    return send
+
+
+def engine_sender():
+    """Answer entries with an in-process engine (query logging off, so the replay isn't recorded)"""
+    from app.config.settings import Config, config_dict
+    from app.services.rag_engine import RAGEngine
+
+    engine = RAGEngine({**config_dict(Config), 'QUERY_LOG_ENABLED': False})
+
+    def send(entry):
+        result = engine.collection(entry.get('c')).answer(entry['q'], top_k=entry.get('k'), filters=entry.get('f'))
+        return bool(result.get('cached'))
+    return send
+
+
+def replay(entries, send, speed=1.0, concurrency=32):
+    """Replay entries on schedule; returns the report"""
+    service, scheduled = [], []
+    hits = errors = 0
+    lock = threading.Lock()
+
+    def run(entry, due):
+        nonlocal hits, errors
+        sent = time.perf_counter()
+        try:
+            hit = send(entry)
+            failed = False
+        except Exception:
+            hit, failed = False, True
+        done = time.perf_counter()
+        with lock:
+            service.append(done - sent)
+            scheduled.append(done - due)
+            hits += hit
+            errors += failed
+
+    first = entries[0]['ts']
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for entry in entries:
+            due = start + ((entry['ts'] - first) / speed if speed > 0 else 0.0)
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(run, entry, due if speed > 0 else time.perf_counter())
+    elapsed = time.perf_counter() - start
+
+    recorded_span = entries[-1]['ts'] - first
+    recorded = [entry['t'] / 1000 for entry in entries if 't' in entry]
+    return {
+        'requests': len(entries),
+        'errors': errors,
+        'speed': speed,
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'qps': len(entries) / elapsed if elapsed else 0.0,
+        'recorded_qps': len(entries) / recorded_span if recorded_span else None,
+        'latency': summarize_latencies(service),
+        'latency_from_schedule': summarize_latencies(scheduled),
+        'cache_hit_rate': hits / len(entries),
+        'recorded': {
+            'latency': summarize_latencies(recorded),
+            'cache_hit_rate': sum(1 for entry in entries if entry.get('hit')) / len(entries),
+            'errors': sum(1 for entry in entries if 'err' in entry),
+        },
+    }
+
+
+def main():
+    from app.config.settings import Config
+
+    parser = argparse.ArgumentParser(description="Replay recorded queries")
+    parser.add_argument('logs', nargs='*', default=[Config.QUERY_LOG_DIR],
+                        help="Query log files or directories (default: QUERY_LOG_DIR)")
+    parser.add_argument('--url', help="Server to replay against (default: the engine in-process)")
+    parser.add_argument('--api', choices=('flask', 'fastapi'), default='flask',
+                        help="Endpoint style of --url")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="Multiple of the recorded rate (0 = as fast as possible)")
+    parser.add_argument('--concurrency', type=int, default=32, help="Most requests in flight")
+    parser.add_argument('--limit', type=int, help="Replay only the first N queries")
+    parser.add_argument('--timeout', type=float, default=60.0, help="HTTP timeout in seconds")
+    parser.add_argument('--output', help="Write the report as JSON")
+    args = parser.parse_args()
+
+    entries = load_entries(args.logs, args.limit)
+    if not entries:
+        print("No recorded queries found")
+        sys.exit(1)
+
+    send = http_sender(args.url, args.api, args.timeout) if args.url else engine_sender()
+    rate = f"{args.speed}x" if args.speed else 'max speed'
+    print(f"Replaying {len(entries)} queries at {rate} against {args.url or 'in-process engine'}")
+    report = replay(entries, send, args.speed, args.concurrency)
+
+    def line(label, latency):
+        if not latency.get('count'):
+            return f"  {label:<22} -"
+        return (f"  {label:<22} p50 {latency['p50_ms']:8.1f} ms  p95 {latency['p95_ms']:8.1f} ms  "
+                f"p99 {latency['p99_ms']:8.1f} ms")
+
+    print(f"\n{report['requests']} requests, {report['errors']} errors, {report['qps']:.1f} req/s"
+          + (f" (recorded {report['recorded_qps']:.1f} req/s)" if report['recorded_qps'] else ""))
+    print(line('latency', report['latency']))
+    print(line('latency from schedule', report['latency_from_schedule']))
+    print(line('recorded latency', report['recorded']['latency']))
+    print(f"  cache hit rate         {report['cache_hit_rate']:.1%} "
+          f"(recorded {report['recorded']['cache_hit_rate']:.1%})")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
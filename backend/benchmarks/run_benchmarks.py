@@ -0,0 +1,329 @@
+"""
+End-to-end performance benchmarks for the RAG backend
+
+Runs fully offline: model calls use the local providers by default, or the
+fake Gemini server when --gemini-base-url is given. Results are written as
+JSON so runs can be compared between commits.
+
+Usage (from backend/):
+    python -m benchmarks.run_benchmarks --docs 20 --pages 5 --output bench.json
+    python -m benchmarks.run_benchmarks --compare old.json --output new.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.synthetic_corpus import generate_corpus, synthetic_questions
+
+
+def summarize_latencies(samples):
+    """Mean and p50/p95/p99 of a list of latencies in seconds, reported in ms"""
+    if not samples:
+        return {'count': 0}
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))] * 1000
+
+    return {
+        'count': len(ordered),
+        'mean_ms': sum(ordered) / len(ordered) * 1000,
+        'p50_ms': pct(50),
+        'p95_ms': pct(95),
+        'p99_ms': pct(99),
+        'max_ms': ordered[-1] * 1000,
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None where unsupported)"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def create_benchmark_app(workdir, gemini_base_url=None):
+    """Flask app with storage under workdir and stubbed model calls"""
+    from app import create_app
+    from app.config.settings import Config
+
+    overrides = {
+        'UPLOAD_FOLDER': os.path.join(workdir, 'data', 'uploads'),
+        'PROCESSED_FOLDER': os.path.join(workdir, 'data', 'processed'),
+        'VECTOR_DB_PATH': os.path.join(workdir, 'vector_db', 'indexes'),
+        'METADATA_PATH': os.path.join(workdir, 'vector_db', 'metadata'),
+        'COLLECTIONS_PATH': os.path.join(workdir, 'vector_db', 'collections'),
+        'QUERY_LOG_DIR': os.path.join(workdir, 'logs', 'queries'),
+        'EMBEDDING_CACHE_PATH': os.path.join(workdir, 'data', 'cache', 'embeddings.sqlite3'),
+        'EMBEDDING_BATCH_DELAY': 0.0,
+    }
+    if gemini_base_url:
+        overrides.update({
+            'EMBEDDING_PROVIDER': 'gemini',
+            'GENERATION_PROVIDER': 'gemini',
+            'GEMINI_BASE_URL': gemini_base_url,
+            'GEMINI_API_KEY': Config.GEMINI_API_KEY or 'benchmark',
+        })
+    else:
+        overrides.update({'EMBEDDING_PROVIDER': 'local', 'GENERATION_PROVIDER': 'local'})
+
+    return create_app(type('BenchmarkConfig', (Config,), overrides))
+
+
+def bench_ingest(app, pdf_paths):
+    """Upload every PDF through /api/pdf/upload and measure throughput"""
+    import fitz  # PyMuPDF
+
+    client = app.test_client()
+    pages = chunks = 0
+    latencies = []
+
+    start = time.perf_counter()
+    for path in pdf_paths:
+        with fitz.open(path) as document:
+            pages += document.page_count
+
+        t0 = time.perf_counter()
+        with open(path, 'rb') as f:
+            response = client.post(
+                '/api/pdf/upload',
+                data={'file': (f, os.path.basename(path))},
+                content_type='multipart/form-data'
+            )
+        latencies.append(time.perf_counter() - t0)
+
+        if response.status_code != 201:
+            raise RuntimeError(f"Upload failed for {path}: {response.get_data(as_text=True)}")
+        chunks += response.get_json()['chunks_count']
+    elapsed = time.perf_counter() - start
+
+    return {
+        'documents': len(pdf_paths),
+        'pages': pages,
+        'chunks': chunks,
+        'seconds': elapsed,
+        'pages_per_s': pages / elapsed,
+        'chunks_per_s': chunks / elapsed,
+        'upload_latency': summarize_latencies(latencies),
+    }
+
+
+def bench_search(app, sizes, queries=200, top_k=5, seed=0):
+    """VectorService.search latency over random indexes of the given sizes"""
+    import numpy as np
+    from app.services.vector_service import VectorService
+    from app.services.vector_store import write_generation
+
+    rng = np.random.default_rng(seed)
+    dimension = app.config['EMBEDDING_DIMENSION']
+    results = {}
+
+    for size in sizes:
+        config = {**app.config, 'VECTOR_DB_PATH': tempfile.mkdtemp(prefix=f'search_{size}_')}
+        write_generation(
+            config['VECTOR_DB_PATH'],
+            dimension,
+            size,
+            (
+                rng.standard_normal((min(100000, size - start), dimension), dtype='float32')
+                for start in range(0, size, 100000)
+            ),
+            (
+                {'doc_id': 'doc_bench', 'document': 'bench.pdf', 'index': i, 'text': '', 'page': 1}
+                for i in range(size)
+            ),
+            {'doc_bench': {'filename': 'bench.pdf', 'chunk_count': size, 'rows': [0, size]}}
+        )
+
+        service = VectorService(config)
+
+        query_vectors = rng.standard_normal((queries, dimension), dtype='float32')
+        service.search(query_vectors[0], top_k=top_k)  # warm-up
+
+        latencies = []
+        for vector in query_vectors:
+            t0 = time.perf_counter()
+            service.search(vector, top_k=top_k)
+            latencies.append(time.perf_counter() - t0)
+
+        results[str(size)] = summarize_latencies(latencies)
+        print(f"  search @ {size:>9,} vectors: p50 {results[str(size)]['p50_ms']:.2f} ms")
+
+        del service
+        shutil.rmtree(config['VECTOR_DB_PATH'], ignore_errors=True)
+
+    return results
+
+
+def bench_queries(app, questions, concurrency=4, top_k=5):
+    """QPS and latency percentiles of /api/query/ask under concurrent load"""
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    position = iter(questions)
+
+    def worker():
+        nonlocal errors
+        client = app.test_client()
+        while True:
+            with lock:
+                question = next(position, None)
+            if question is None:
+                return
+            t0 = time.perf_counter()
+            response = client.post('/api/query/ask', json={'query': question, 'top_k': top_k})
+            elapsed = time.perf_counter() - t0
+            with lock:
+                latencies.append(elapsed)
+                if response.status_code != 200:
+                    errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'qps': len(latencies) / elapsed if elapsed else 0.0,
+        'latency': summarize_latencies(latencies),
+    }
+
+
+def compare(previous, current):
+    """Print relative changes of the headline metrics against a previous run"""
+    rows = [
+        ('ingest pages/s', ('ingest', 'pages_per_s'), True),
+        ('ingest chunks/s', ('ingest', 'chunks_per_s'), True),
+        ('query QPS', ('query', 'qps'), True),
+        ('query p50 ms', ('query', 'latency', 'p50_ms'), False),
+        ('query p95 ms', ('query', 'latency', 'p95_ms'), False),
+        ('query p99 ms', ('query', 'latency', 'p99_ms'), False),
+        ('peak RSS MB', ('peak_rss_mb',), False),
+    ]
+    for size in current.get('search', {}):
+        rows.append((f'search@{size} p50 ms', ('search', size, 'p50_ms'), False))
+        rows.append((f'search@{size} p99 ms', ('search', size, 'p99_ms'), False))
+
+    def lookup(result, path):
+        for key in path:
+            if not isinstance(result, dict) or key not in result:
+                return None
+            result = result[key]
+        return result
+
+    print(f"\nComparison against {previous.get('commit')} ({previous.get('timestamp')})")
+    print(f"{'metric':<26}{'before':>12}{'after':>12}{'change':>10}")
+    for label, path, higher_is_better in rows:
+        before, after = lookup(previous, path), lookup(current, path)
+        if before is None or after is None:
+            continue
+        change = (after - before) / before * 100 if before else 0.0
+        worse = change < 0 if higher_is_better else change > 0
+        flag = '  !' if worse and abs(change) > 10 else ''
+        print(f"{label:<26}{before:>12.2f}{after:>12.2f}{change:>9.1f}%{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG backend benchmark suite")
+    parser.add_argument('--docs', type=int, default=10, help="Synthetic PDFs to ingest")
+    parser.add_argument('--pages', type=int, default=5, help="Pages per synthetic PDF")
+    parser.add_argument('--chars-per-page', type=int, default=2500)
+    parser.add_argument('--search-sizes', default='10000,100000,1000000',
+                        help="Comma separated index sizes for the search benchmark")
+    parser.add_argument('--search-queries', type=int, default=200)
+    parser.add_argument('--queries', type=int, default=200, help="Requests sent to /api/query/ask")
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--gemini-base-url', help="Use the fake Gemini server instead of local providers")
+    parser.add_argument('--workdir', help="Keep corpus and store here instead of a temp dir")
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--compare', help="Previous results JSON to compare against")
+    args = parser.parse_args()
+
+    output = os.path.abspath(args.output)
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+
+    workdir = os.path.abspath(args.workdir or tempfile.mkdtemp(prefix='rag_bench_'))
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)  # create_app makes data/ and logs/ relative to the cwd
+
+    print("=" * 60)
+    print(f"RAG BENCHMARK SUITE (workdir: {workdir})")
+    print("=" * 60)
+
+    print(f"\n1. Generating {args.docs} synthetic PDFs x {args.pages} pages...")
+    pdf_paths = generate_corpus(os.path.join(workdir, 'corpus'), args.docs, args.pages, args.chars_per_page)
+
+    app = create_benchmark_app(workdir, args.gemini_base_url)
+
+    print("\n2. Ingest throughput...")
+    ingest = bench_ingest(app, pdf_paths)
+    print(f"  {ingest['pages_per_s']:.1f} pages/s, {ingest['chunks_per_s']:.1f} chunks/s")
+
+    print("\n3. Query throughput...")
+    query = bench_queries(app, synthetic_questions(args.queries), args.concurrency, args.top_k)
+    print(f"  {query['qps']:.1f} QPS, p50 {query['latency'].get('p50_ms', 0):.1f} ms, "
+          f"p99 {query['latency'].get('p99_ms', 0):.1f} ms")
+
+    print("\n4. Vector search latency...")
+    sizes = [int(s) for s in args.search_sizes.split(',') if s.strip()]
+    search = bench_search(app, sizes, args.search_queries, args.top_k)
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'providers': 'fake-gemini' if args.gemini_base_url else 'local',
+        'params': vars(args),
+        'ingest': ingest,
+        'query': query,
+        'search': search,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print(f"\nPeak RSS: {results['peak_rss_mb']:.1f} MB" if results['peak_rss_mb'] else "")
+    print(f"Results written to {output}")
+
+    if previous:
+        compare(previous, results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Synthetic placement-feedback PDF generator for benchmarks
+
+Usage:
+    python -m benchmarks.synthetic_corpus --out dataset_synthetic --count 20 --pages 5
+"""
+import argparse
+import os
+import random
+
+COMPANIES = [
+    "TCS", "Infosys", "Wipro", "Zoho", "Accenture", "Cognizant", "HCL", "Bosch",
+    "Capgemini", "Deloitte", "Amazon", "Microsoft", "Freshworks", "L&T Infotech",
+    "Tech Mahindra", "Oracle", "Cisco", "IBM", "Mphasis", "Hexaware",
+]
+
+ROUNDS = [
+    "online aptitude test", "technical interview", "HR interview", "group discussion",
+    "coding round", "managerial round", "pseudo-code test", "communication assessment",
+]
+
+TOPICS = [
+    "quantitative aptitude", "logical reasoning", "verbal ability", "data structures",
+    "linked lists", "binary trees", "dynamic programming", "SQL joins", "normalization",
+    "operating system scheduling", "deadlocks", "computer networks", "OOP concepts",
+    "inheritance and polymorphism", "Java collections", "Python decorators",
+    "REST APIs", "cloud computing basics", "DBMS transactions", "sorting algorithms",
+]
+
+OUTCOMES = [
+    "was selected", "moved to the next round", "was waitlisted", "was not selected",
+    "received an offer letter", "was asked to reapply next year",
+]
+
+TEMPLATES = [
+    "In the {round} at {company}, the panel focused on {topic} and {topic2}.",
+    "The {round} lasted about {minutes} minutes and the candidate {outcome}.",
+    "Questions in the {round} covered {topic}; interviewers expected clear explanations with examples.",
+    "{company} asked the candidate to solve a problem on {topic} in the {round}.",
+    "Tip from the senior: revise {topic} and {topic2} before the {company} {round}.",
+    "There were {count} questions on {topic} with a time limit of {minutes} minutes.",
+    "The candidate felt the {round} was {difficulty} and {outcome}.",
+    "For {company}, the eligibility cutoff was {cgpa} CGPA with no standing arrears.",
+]
+
+
+def feedback_paragraph(rng, company, sentences=6):
+    """Generate one paragraph of placement feedback"""
+    parts = []
+    for _ in range(sentences):
+        template = rng.choice(TEMPLATES)
+        parts.append(template.format(
+            company=company,
+            round=rng.choice(ROUNDS),
+            topic=rng.choice(TOPICS),
+            topic2=rng.choice(TOPICS),
+            outcome=rng.choice(OUTCOMES),
+            minutes=rng.choice([20, 30, 45, 60, 90]),
+            count=rng.randint(5, 40),
+            difficulty=rng.choice(["easy", "moderate", "tough", "very tough"]),
+            cgpa=rng.choice(["6.0", "6.5", "7.0", "7.5", "8.0"]),
+        ))
+    return " ".join(parts)
+
+
+def page_text(rng, company, page_num, chars_per_page):
+    """Generate roughly chars_per_page characters for one page"""
+    paragraphs = [f"{company} Placement Feedback - Page {page_num}"]
+    length = len(paragraphs[0])
+    while length < chars_per_page:
+        paragraph = feedback_paragraph(rng, company)
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+def write_pdf(path, pages):
+    """Write a list of page texts to a PDF file"""
+    import fitz  # PyMuPDF
+
+    document = fitz.open()
+    for text in pages:
+        page = document.new_page()
+        page.insert_textbox(fitz.Rect(40, 40, 555, 800), text, fontsize=9)
+    document.save(path)
+    document.close()
+
+
+def generate_corpus(out_dir, count=10, pages=5, chars_per_page=2500, seed=42):
+    """Generate count synthetic feedback PDFs and return their paths"""
+    rng = random.Random(seed)
+    os.makedirs(out_dir, exist_ok=True)
+
+    paths = []
+    for i in range(count):
+        company = COMPANIES[i % len(COMPANIES)]
+        path = os.path.join(out_dir, f"{company.replace(' ', '_').replace('&', 'and')}_feedback_{i + 1}.pdf")
+        write_pdf(path, [page_text(rng, company, p + 1, chars_per_page) for p in range(pages)])
+        paths.append(path)
+    return paths
+
+
+def synthetic_questions(count, seed=7):
+    """Generate student questions matching the synthetic corpus"""
+    rng = random.Random(seed)
+    patterns = [
+        "What was asked in the {round} at {company}?",
+        "How should I prepare {topic} for {company}?",
+        "What is the eligibility cutoff for {company}?",
+        "Which topics come up in the {round}?",
+        "How tough is the {company} {round}?",
+        "Were there questions on {topic}?",
+    ]
+    return [
+        rng.choice(patterns).format(
+            company=rng.choice(COMPANIES),
+            round=rng.choice(ROUNDS),
+            topic=rng.choice(TOPICS),
+        )
+        for _ in range(count)
+    ]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate synthetic placement-feedback PDFs")
+    parser.add_argument('--out', default='dataset_synthetic')
+    parser.add_argument('--count', type=int, default=10)
+    parser.add_argument('--pages', type=int, default=5)
+    parser.add_argument('--chars-per-page', type=int, default=2500)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    files = generate_corpus(args.out, args.count, args.pages, args.chars_per_page, args.seed)
+    print(f"Generated {len(files)} PDFs in {args.out}")
@@ -0,0 +1,132 @@
+"""
+Recall/latency report for two-stage (truncated-dimension + re-rank) search
+
+For each coarse dimension and candidate count, searches the same queries
+with the two-stage path and with the exact full-dimension scan, and
+reports recall@k against the exact results plus latency percentiles.
+Uses a synthetic store whose variance decays along the dimensions, like
+Matryoshka embeddings, or an existing store with --store.
+
+Usage (from backend/):
+    python -m benchmarks.two_stage_report --vectors 200000
+    python -m benchmarks.two_stage_report --store vector_db/indexes --dimensions 128,256
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.run_benchmarks import summarize_latencies
+
+
+def synthetic_store(path, count, dimension, clusters=1000, seed=0):
+    """Clustered vectors whose per-dimension scale decays like a Matryoshka embedding"""
+    import numpy as np
+    from app.services.vector_store import write_generation
+
+    rng = np.random.default_rng(seed)
+    scale = (1.0 + np.arange(dimension, dtype='float32')) ** -0.5
+    centers = rng.standard_normal((clusters, dimension), dtype='float32') * scale
+
+    def blocks():
+        for start in range(0, count, 100000):
+            size = min(100000, count - start)
+            noise = rng.standard_normal((size, dimension), dtype='float32') * scale
+            yield centers[rng.integers(0, clusters, size)] + noise
+
+    write_generation(
+        path, dimension, count, blocks(),
+        ({'doc_id': 'doc_bench', 'document': 'bench.pdf', 'text': '', 'page': 1} for _ in range(count)),
+        {'doc_bench': {'filename': 'bench.pdf', 'chunk_count': count, 'rows': [0, count]}}
+    )
+
+
+def timed_search(search, queries):
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        _, rows = search(query[None, :])
+        latencies.append(time.perf_counter() - start)
+        results.append(set(rows[0][rows[0] >= 0].tolist()))
+    return results, summarize_latencies(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Two-stage search recall/latency report")
+    parser.add_argument('--store', help="Existing generation store (default: synthetic)")
+    parser.add_argument('--vectors', type=int, default=200000, help="Synthetic store size")
+    parser.add_argument('--dimension', type=int, default=768, help="Synthetic vector dimension")
+    parser.add_argument('--dimensions', default='64,128,256', help="Coarse dimensions to try")
+    parser.add_argument('--candidates', default='50,100,200,400', help="Re-rank candidate counts to try")
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=5)
+    parser.add_argument('--output', help="Write the report as JSON")
+    args = parser.parse_args()
+
+    import numpy as np
+    from app.services.vector_store import Generation, read_current
+
+    workdir = None
+    root = args.store
+    if root is None:
+        workdir = root = tempfile.mkdtemp(prefix='two_stage_')
+        print(f"Building synthetic store: {args.vectors:,} x {args.dimension}")
+        synthetic_store(root, args.vectors, args.dimension)
+
+    try:
+        generation = Generation(root, read_current(root))
+        rng = np.random.default_rng(1)
+        # Queries near stored vectors, as real questions land near their answers
+        picks = rng.integers(0, generation.count, args.queries)
+        spread = np.asarray(generation.vectors[np.sort(picks)]).std(axis=0)
+        queries = np.asarray(generation.vectors[np.sort(picks)]) + \
+            rng.standard_normal((args.queries, generation.dimension), dtype='float32') * spread * 0.5
+
+        exact, baseline = timed_search(lambda q: generation.search(q, args.top_k), queries)
+        report = {
+            'vectors': generation.count,
+            'dimension': generation.dimension,
+            'top_k': args.top_k,
+            'exact': baseline,
+            'two_stage': []
+        }
+        print(f"\nexact {generation.dimension}-d scan: p50 {baseline['p50_ms']:.2f} ms, "
+              f"p95 {baseline['p95_ms']:.2f} ms")
+        print(f"{'dims':>6}{'cands':>7}{'recall':>9}{'p50 ms':>9}{'p95 ms':>9}{'speedup':>9}")
+
+        for dimension in (int(d) for d in args.dimensions.split(',')):
+            if dimension >= generation.dimension:
+                continue
+            generation.coarse_vectors(dimension)
+            for candidates in (int(c) for c in args.candidates.split(',')):
+                def two_stage(query):
+                    rows = generation.coarse_candidates(query, dimension, max(candidates, args.top_k))
+                    return generation.rerank(query, rows, args.top_k)
+
+                found, latency = timed_search(two_stage, queries)
+                recall = float(np.mean([
+                    len(got & want) / max(len(want), 1) for got, want in zip(found, exact)
+                ]))
+                row = {'coarse_dimension': dimension, 'candidates': candidates,
+                       'recall': recall, 'latency': latency}
+                report['two_stage'].append(row)
+                print(f"{dimension:>6}{candidates:>7}{recall:>9.3f}{latency['p50_ms']:>9.2f}"
+                      f"{latency['p95_ms']:>9.2f}{baseline['p50_ms'] / latency['p50_ms']:>8.1f}x")
+    finally:
+        if workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Convert a vector store between the langchain and Flask formats, reusing the stored embeddings
+
+    python convert_store.py ./vector_db vector_db/indexes --to generation
+    python convert_store.py vector_db/indexes ./vector_db --to langchain --force
+
+The source format is detected from the files in the source directory;
+see app/services/store_migration.py for the formats.
+"""
+import argparse
+import sys
+import time
+
+from app.services.store_migration import FORMATS, StoreConversionError, convert
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('source', help='Directory of the store to read')
+    parser.add_argument('target', help='Directory to write the converted store to')
+    parser.add_argument('--to', required=True, choices=('langchain', 'generation'),
+                        help='Format to write')
+    parser.add_argument('--from', dest='source_format', choices=FORMATS,
+                        help='Format of the source (detected by default)')
+    parser.add_argument('--force', action='store_true',
+                        help='Replace a store that already exists in the target')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        summary = convert(args.source, args.target, args.to, args.source_format, args.force)
+    except StoreConversionError as e:
+        print(f"✗ {str(e)}")
+        sys.exit(1)
+
+    print(f"✓ {summary['vectors']} vectors x {summary['dimension']} dims, "
+          f"{summary['documents']} documents -> {args.target} ({summary['written']})")
+    print(f"  verified count, dimension, chunk texts and {summary['vectors_compared']} sampled vectors")
+    print(f"  {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+"""
+Local stand-in for the Gemini API used for load and latency testing
+
+Serves the REST endpoints that google-genai calls for embed_content and
+generate_content, with configurable latency, error/429 injection and
+deterministic vectors. Point the backend at it with:
+
+    GEMINI_BASE_URL=http://localhost:8089 GEMINI_API_KEY=fake python run.py
+"""
+import argparse
+import random
+import re
+import threading
+import time
+from flask import Flask, jsonify, request
+from app.services.providers import ExtractiveGenerationProvider, HashingEmbeddingProvider
+
+_CONTEXT_RE = re.compile(
+    r"Context from study materials:\n(?P<context>.*)\n\nStudent's Question: (?P<question>.*)\n\nAnswer:",
+    re.DOTALL
+)
+_SOURCE_RE = re.compile(r"^\[From (?P<document>.*) - Page (?P<page>.*)\]$")
+
+
+class LatencyModel:
+    """
+    Latency distribution parsed from a spec string:
+
+        fixed:0.05             always 50 ms
+        uniform:0.02,0.2       uniform between 20 and 200 ms
+        lognormal:0.08,0.5     lognormal with 80 ms median and sigma 0.5
+    """
+
+    def __init__(self, spec, rng):
+        kind, _, params = spec.partition(':')
+        self.kind = kind
+        self.params = [float(p) for p in params.split(',') if p]
+        self.rng = rng
+
+        expected = {'fixed': 1, 'uniform': 2, 'lognormal': 2}
+        if kind not in expected or len(self.params) != expected[kind]:
+            raise ValueError(f"Invalid latency spec: {spec}")
+
+    def sample(self):
+        if self.kind == 'fixed':
+            return self.params[0]
+        if self.kind == 'uniform':
+            return self.rng.uniform(*self.params)
+        median, sigma = self.params
+        return self.rng.lognormvariate(0, sigma) * median
+
+
+class FakeGemini:
+    """Request handling and fault injection shared by all endpoints"""
+
+    def __init__(self, embed_latency='fixed:0.02', generate_latency='lognormal:0.4,0.5',
+                 error_rate=0.0, rate_limit_rate=0.0, retry_after=1, seed=0):
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.embed_latency = LatencyModel(embed_latency, self.rng)
+        self.generate_latency = LatencyModel(generate_latency, self.rng)
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.embedders = {}
+        self.generator = ExtractiveGenerationProvider()
+        self.stats = {'embed_requests': 0, 'embed_texts': 0, 'generate_requests': 0,
+                      'errors_injected': 0, 'rate_limited': 0}
+
+    def _embedder(self, dimension):
+        if dimension not in self.embedders:
+            self.embedders[dimension] = HashingEmbeddingProvider(dimension)
+        return self.embedders[dimension]
+
+    def _draw(self, latency_model):
+        """Pick the injected fault (if any) and latency for one request"""
+        with self.lock:
+            roll = self.rng.random()
+            delay = latency_model.sample()
+        if roll < self.rate_limit_rate:
+            return 'rate_limited', delay
+        if roll < self.rate_limit_rate + self.error_rate:
+            return 'error', delay
+        return None, delay
+
+    def _fault_response(self, fault):
+        with self.lock:
+            self.stats['rate_limited' if fault == 'rate_limited' else 'errors_injected'] += 1
+        if fault == 'rate_limited':
+            response = jsonify({'error': {
+                'code': 429,
+                'message': 'Resource has been exhausted (e.g. check quota).',
+                'status': 'RESOURCE_EXHAUSTED'
+            }})
+            response.status_code = 429
+            response.headers['Retry-After'] = str(self.retry_after)
+            return response
+        response = jsonify({'error': {
+            'code': 503,
+            'message': 'The model is overloaded. Please try again later.',
+            'status': 'UNAVAILABLE'
+        }})
+        response.status_code = 503
+        return response
+
+    def embed(self, requests_):
+        fault, delay = self._draw(self.embed_latency)
+        time.sleep(delay)
+        if fault:
+            return self._fault_response(fault)
+
+        embeddings = []
+        for item in requests_:
+            text = " ".join(part.get('text', '') for part in item.get('content', {}).get('parts', []))
+            dimension = int(item.get('outputDimensionality') or 3072)
+            embeddings.append({'values': self._embedder(dimension).embed_text(text).tolist()})
+
+        with self.lock:
+            self.stats['embed_requests'] += 1
+            self.stats['embed_texts'] += len(embeddings)
+        return jsonify({'embeddings': embeddings})
+
+    def generate(self, body):
+        fault, delay = self._draw(self.generate_latency)
+        time.sleep(delay)
+        if fault:
+            return self._fault_response(fault)
+
+        prompt = "\n".join(
+            part.get('text', '')
+            for content in body.get('contents', [])
+            for part in content.get('parts', [])
+        )
+        text = self._answer(prompt)
+
+        with self.lock:
+            self.stats['generate_requests'] += 1
+        return jsonify({
+            'candidates': [{
+                'content': {'parts': [{'text': text}], 'role': 'model'},
+                'finishReason': 'STOP',
+                'index': 0
+            }],
+            'usageMetadata': {
+                'promptTokenCount': len(prompt) // 4,
+                'candidatesTokenCount': len(text) // 4,
+                'totalTokenCount': (len(prompt) + len(text)) // 4
+            },
+            'modelVersion': 'fake-gemini'
+        })
+
+    def _answer(self, prompt):
+        """Answer a RAG prompt extractively, or echo for anything else"""
+        match = _CONTEXT_RE.search(prompt)
+        if not match:
+            return "This is a stub answer from the local Gemini stand-in."
+
+        chunks = []
+        for block in match.group('context').split("\n\n"):
+            header, _, text = block.partition("\n")
+            source = _SOURCE_RE.match(header)
+            if source:
+                chunks.append({'text': text, **source.groupdict()})
+            elif chunks:
+                chunks[-1]['text'] += "\n\n" + block
+        return self.generator.generate_answer(match.group('question'), chunks)
+
+
+def create_fake_app(fake):
+    """Build the Flask app serving the fake endpoints"""
+    app = Flask(__name__)
+
+    @app.route('/<version>/models/<path:model_action>', methods=['POST'])
+    def model_action(version, model_action):
+        model, _, action = model_action.partition(':')
+        body = request.get_json(silent=True) or {}
+
+        if action == 'batchEmbedContents':
+            return fake.embed(body.get('requests', []))
+        if action == 'embedContent':
+            return fake.embed([body])
+        if action == 'generateContent':
+            return fake.generate(body)
+        return jsonify({'error': {'code': 404, 'message': f'Unsupported action: {action}',
+                                  'status': 'NOT_FOUND'}}), 404
+
+    @app.route('/stats', methods=['GET'])
+    def stats():
+        with fake.lock:
+            return jsonify(dict(fake.stats))
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Gemini stand-in server")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--embed-latency', default='fixed:0.02',
+                        help="fixed:S | uniform:MIN,MAX | lognormal:MEDIAN,SIGMA (seconds)")
+    parser.add_argument('--generate-latency', default='lognormal:0.4,0.5')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help="Fraction of requests answered with 503")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0,
+                        help="Fraction of requests answered with 429")
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    fake = FakeGemini(
+        embed_latency=args.embed_latency,
+        generate_latency=args.generate_latency,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        seed=args.seed
+    )
+
+    print("=" * 60)
+    print(f"FAKE GEMINI SERVER on http://{args.host}:{args.port}")
+    print(f"  embed latency:    {args.embed_latency}")
+    print(f"  generate latency: {args.generate_latency}")
+    print(f"  error rate: {args.error_rate}  429 rate: {args.rate_limit_rate}")
+    print("=" * 60)
+
+    create_fake_app(fake).run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Ingest a directory of PDFs straight into the vector store, in parallel
+
+Uses the same RAG engine as the Flask app, without going through HTTP:
+
+    python ingest_pdfs.py data/feedback --workers 4
+"""
+import argparse
+import os
+import time
+from pathlib import Path
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.services.prewarm import get_prewarmer, prewarm_enabled
+from app.services.rag_engine import RAGEngine
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('directory', help='Directory containing PDF files')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Processes used for extraction and embedding')
+    args = parser.parse_args()
+
+    pdf_files = sorted(str(path) for path in Path(args.directory).glob("*.pdf"))
+    print("=" * 70)
+    print(f"PDF INGEST - Found {len(pdf_files)} PDF files, {args.workers} workers")
+    print("=" * 70)
+
+    engine = RAGEngine.from_settings()
+    for directory in (engine.config['VECTOR_DB_PATH'], engine.config['METADATA_PATH']):
+        os.makedirs(directory, exist_ok=True)
+
+    start = time.perf_counter()
+    successful = 0
+    failed = 0
+    total_chunks = 0
+
+    for result in engine.ingest_many(pdf_files, workers=args.workers):
+        if 'error' in result:
+            print(f"✗ {result['filename']}: {result['error']}")
+            failed += 1
+        else:
+            print(f"✓ {result['filename']} -> {result['document_id']} ({result['chunks_count']} chunks)")
+            successful += 1
+            total_chunks += result['chunks_count']
+
+    print("\n" + "=" * 70)
+    print(f"Successful: {successful}  Failed: {failed}  Chunks: {total_chunks}")
+    print(f"Elapsed: {time.perf_counter() - start:.1f}s")
+    print("=" * 70)
+
+    if successful and prewarm_enabled(engine.config):
+        # Cache answers to the popular questions for the new store version
+        summary = get_prewarmer(engine).run()
+        print(f"Pre-warmed answers: {summary['warmed']} generated, {summary['cached']} already cached, "
+              f"{summary['failed']} failed ({summary['questions']} questions)")
+
+
+if __name__ == '__main__':
+    main()
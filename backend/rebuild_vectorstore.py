@@ -1,94 +1,112 @@
-from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
-from langchain_community.vectorstores import FAISS
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+"""
+Rebuild a collection's vector store from a directory of PDFs
+
+A thin wrapper over RAGEngine.ingest_many, so the store is built by the
+same extraction, chunking and embedding pipeline, and the same models
+from Config, as the Flask and FastAPI apps:
+
+    python rebuild_vectorstore.py
+    python rebuild_vectorstore.py data/feedback --collection interviews
+    python rebuild_vectorstore.py data/feedback --langchain ./vector_db
+
+The PDFs are ingested first and the documents the store held before are
+deleted afterwards, so the store keeps answering during the rebuild.
+--langchain also writes the rebuilt store in the langchain layout
+(index.faiss + index.pkl, for FASTAPI_STORE=langchain) with the store
+converter instead of embedding everything a second time.
+"""
+import argparse
 import os
+import sys
+import time
+from pathlib import Path
 from dotenv import load_dotenv
 
 load_dotenv()
 
-print("="*50)
-print("VECTOR STORE REBUILD SCRIPT")
-print("="*50)
-
-# Initialize embeddings
-print("\n1. Loading Gemini embeddings model...")
-api_key = os.getenv("GEMINI_API_KEY")
-
-if not api_key:
-    print("ERROR: GEMINI_API_KEY not found in .env file!")
-    exit(1)
-
-embeddings = GoogleGenerativeAIEmbeddings(
-    model="models/text-embedding-004",
-    google_api_key=api_key,
-    task_type="retrieval_document"
-)
-print("   ✓ Embeddings loaded!")
-
-# Load PDFs
-print("\n2. Loading PDF documents...")
-pdf_folder = "./data"  # Change this if your PDFs are elsewhere
-
-if not os.path.exists(pdf_folder):
-    print(f"   ERROR: PDF folder '{pdf_folder}' not found!")
-    print(f"   Please create the folder and add your PDF files there.")
-    exit(1)
-
-# List PDF files
-pdf_files = [f for f in os.listdir(pdf_folder) if f.endswith('.pdf')]
-if len(pdf_files) == 0:
-    print(f"   ERROR: No PDF files found in '{pdf_folder}'!")
-    print(f"   Please add your placement feedback PDF files to this folder.")
-    exit(1)
-
-print(f"   Found {len(pdf_files)} PDF file(s):")
-for pdf in pdf_files:
-    print(f"     - {pdf}")
-
-loader = DirectoryLoader(
-    pdf_folder,
-    glob="**/*.pdf",
-    loader_cls=PyPDFLoader,
-    show_progress=True
-)
-
-documents = loader.load()
-print(f"   ✓ Loaded {len(documents)} pages from PDFs")
-
-# Split documents
-print("\n3. Splitting documents into chunks...")
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=1000,
-    chunk_overlap=200,
-    length_function=len
-)
-
-chunks = text_splitter.split_documents(documents)
-print(f"   ✓ Created {len(chunks)} text chunks")
-
-# Create FAISS vector store
-print("\n4. Creating FAISS vector store...")
-print("   (This may take a few minutes depending on the number of documents)")
-vectorstore = FAISS.from_documents(chunks, embeddings)
-
-# Save vector store
-output_path = "./vector_db"
-print(f"\n5. Saving vector store to '{output_path}'...")
-
-# Remove old vector store if exists
-if os.path.exists(output_path):
-    import shutil
-    print(f"   Removing old vector store...")
-    shutil.rmtree(output_path)
-
-vectorstore.save_local(output_path)
-
-print("\n" + "="*50)
-print("✓ VECTOR STORE CREATED SUCCESSFULLY!")
-print("="*50)
-print(f"\nVector store saved to: {output_path}")
-print("\nNext steps:")
-print("1. Restart your FastAPI server: uvicorn app.main:app --reload")
-print("2. Test your chatbot at http://localhost:3000")
-print("="*50)
+from app.config.settings import Config, config_dict
+from app.services.prewarm import get_prewarmer, prewarm_enabled
+from app.services.rag_engine import RAGEngine
+from app.services.sharding import shard_urls
+from app.services.store_migration import StoreConversionError, convert
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('directory', nargs='?',
+                        help="Directory containing PDF files (default: the collection's upload folder)")
+    parser.add_argument('--collection', help='Collection to rebuild (default: the default collection)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='Processes used for extraction and embedding')
+    parser.add_argument('--langchain', metavar='PATH',
+                        help='Also write the rebuilt store to PATH in the langchain layout')
+    args = parser.parse_args()
+
+    config = config_dict(Config)
+    if args.langchain and shard_urls(config):
+        print("✗ --langchain needs an unsharded store; run convert_store.py on each shard instead")
+        sys.exit(1)
+
+    engine = RAGEngine(config).collection(args.collection)
+    directory = args.directory or engine.config['UPLOAD_FOLDER']
+    pdf_files = sorted(str(path) for path in Path(directory).glob("*.pdf"))
+    if not pdf_files:
+        print(f"✗ No PDF files found in '{directory}'")
+        sys.exit(1)
+
+    print("=" * 70)
+    print(f"VECTOR STORE REBUILD - '{engine.collection_name}' from {len(pdf_files)} PDF files in {directory}")
+    print("=" * 70)
+
+    for path in (engine.config['VECTOR_DB_PATH'], engine.config['METADATA_PATH']):
+        os.makedirs(path, exist_ok=True)
+    previous = [document['doc_id'] for document in engine.vector_service().list_documents()]
+
+    start = time.perf_counter()
+    successful = failed = total_chunks = 0
+    for result in engine.ingest_many(pdf_files, workers=args.workers):
+        if 'error' in result:
+            print(f"✗ {result['filename']}: {result['error']}")
+            failed += 1
+        else:
+            print(f"✓ {result['filename']} -> {result['document_id']} ({result['chunks_count']} chunks)")
+            successful += 1
+            total_chunks += result['chunks_count']
+
+    if not successful:
+        print("✗ No PDF could be ingested; the store was left as it was")
+        sys.exit(1)
+
+    # Only now drop the previous contents, and their rows with them
+    vector_service = engine.vector_service()
+    for doc_id in previous:
+        vector_service.delete_document(doc_id)
+    if previous:
+        vector_service.compact()
+
+    print("\n" + "=" * 70)
+    print(f"Successful: {successful}  Failed: {failed}  Chunks: {total_chunks}  "
+          f"Replaced documents: {len(previous)}")
+    print(f"Store: {engine.config['VECTOR_DB_PATH']} ({vector_service.version()})")
+
+    if args.langchain:
+        try:
+            summary = convert(engine.config['VECTOR_DB_PATH'], args.langchain, 'langchain',
+                              source_format='generation', force=True)
+        except StoreConversionError as e:
+            print(f"✗ {str(e)}")
+            sys.exit(1)
+        print(f"Langchain store: {args.langchain} ({summary['vectors']} vectors)")
+
+    print(f"Elapsed: {time.perf_counter() - start:.1f}s")
+    print("=" * 70)
+
+    if prewarm_enabled(engine.config):
+        # Cache answers to the popular questions for the rebuilt store
+        summary = get_prewarmer(engine).run()
+        print(f"Pre-warmed answers: {summary['warmed']} generated, {summary['cached']} already cached, "
+              f"{summary['failed']} failed ({summary['questions']} questions)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,121 @@
+"""
+Re-chunk and re-index stored documents from the extracted text cache
+
+After changing CHUNK_SIZE / CHUNK_OVERLAP, rebuilds every document of a
+store with the new chunking, reading page texts from PROCESSED_FOLDER
+instead of running PDF extraction again:
+
+    CHUNK_SIZE=800 CHUNK_OVERLAP=100 python rechunk.py
+    python rechunk.py --collection interviews --chunk-size 1500 --target interviews-1500
+
+In place, every document is re-indexed in a single commit under its
+existing doc_id and upload date, and the store keeps answering from the
+previous generation until that commit is published. Documents whose text
+isn't cached are extracted again from the collection's upload folder
+(UPLOAD_FOLDER, or UPLOAD_FOLDER/<collection>) if the PDF is still there,
+and skipped otherwise.
+"""
+import argparse
+import os
+import time
+import numpy as np
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.config.settings import Config, config_dict
+from app.services.pdf_service import PDFService
+from app.services.prewarm import get_prewarmer, prewarm_enabled
+from app.services.rag_engine import RAGEngine
+from app.services.text_cache import ExtractedTextCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--collection', help='Collection to re-chunk (default: the default store)')
+    parser.add_argument('--target', help='Collection to write the re-chunked documents to (default: in place)')
+    parser.add_argument('--chunk-size', type=int, help='Overrides CHUNK_SIZE')
+    parser.add_argument('--chunk-overlap', type=int, help='Overrides CHUNK_OVERLAP')
+    args = parser.parse_args()
+
+    config = config_dict(Config)
+    if args.chunk_size:
+        config['CHUNK_SIZE'] = args.chunk_size
+    if args.chunk_overlap is not None:
+        config['CHUNK_OVERLAP'] = args.chunk_overlap
+
+    base = RAGEngine(config)
+    source = base.collection(args.collection)
+    target = base.collection(args.target) if args.target else source
+    in_place = target is source
+    cache = ExtractedTextCache(config['PROCESSED_FOLDER'])
+    documents = source.vector_service().list_documents()
+
+    print("=" * 70)
+    print(f"RE-CHUNK {len(documents)} documents of '{source.collection_name}' -> '{target.collection_name}' "
+          f"(chunk size {config['CHUNK_SIZE']}, overlap {config['CHUNK_OVERLAP']})")
+    print("=" * 70)
+
+    start = time.perf_counter()
+    cached = extracted = skipped = failed = total_chunks = 0
+    replacements = []
+    for document in documents:
+        filename = document['filename']
+        digest = document.get('content_hash')
+        pdf_text = cache.get(digest) if digest else None
+        try:
+            if pdf_text is None:
+                pdf_path = os.path.join(source.config['UPLOAD_FOLDER'], filename)
+                if not os.path.exists(pdf_path):
+                    print(f"- {filename}: no cached text and no uploaded PDF, skipped")
+                    skipped += 1
+                    continue
+                digest, pdf_text = PDFService(config).extract(pdf_path)
+                extracted += 1
+            else:
+                cached += 1
+
+            chunks, embeddings = target.embed_pages(pdf_text)
+            if in_place:
+                replacements.append({
+                    'doc_id': document['doc_id'],
+                    'filename': filename,
+                    'chunks': chunks,
+                    'embeddings': np.asarray(embeddings, dtype='float32'),
+                    'content_hash': digest,
+                })
+                doc_id = document['doc_id']
+            else:
+                doc_id = target.vector_service().add_document(filename, chunks, embeddings, content_hash=digest)
+        except Exception as e:
+            print(f"✗ {filename}: {str(e)}")
+            failed += 1
+            continue
+
+        print(f"✓ {filename} -> {doc_id} ({len(chunks)} chunks)")
+        total_chunks += len(chunks)
+
+    if replacements:
+        # One commit for the whole store, then drop the replaced rows now
+        # rather than at the next automatic compaction
+        replaced = source.vector_service().replace_documents(replacements)
+        for doc_id in (doc_id for doc_id, found in replaced.items() if not found):
+            print(f"✗ {doc_id}: deleted while re-chunking, not re-added")
+            failed += 1
+        source.vector_service().compact()
+
+    print("\n" + "=" * 70)
+    print(f"From cache: {cached}  Re-extracted: {extracted}  Skipped: {skipped}  Failed: {failed}  "
+          f"Chunks: {total_chunks}")
+    print(f"Elapsed: {time.perf_counter() - start:.1f}s")
+    print("=" * 70)
+
+    if (cached or extracted) and prewarm_enabled(target.config):
+        # Cache answers to the popular questions for the new store version
+        summary = get_prewarmer(target).run()
+        print(f"Pre-warmed answers: {summary['warmed']} generated, {summary['cached']} already cached, "
+              f"{summary['failed']} failed ({summary['questions']} questions)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Search server for one shard of a sharded vector store
+
+Serves exact searches over VECTOR_DB_PATH/shard-NN (and the same shard of
+every collection) for the coordinator in app/services/sharding.py. Start
+one per shard and list them, in shard order, in SHARD_URLS:
+
+    python shard_server.py --shard 0 --port 8101
+    python shard_server.py --shard 1 --port 8102
+    SHARD_URLS=http://127.0.0.1:8101,http://127.0.0.1:8102 python run.py
+"""
+import argparse
+import logging
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from flask import Flask, jsonify, request
+from app.config.settings import Config, config_dict
+from app.services.collections import collection_config
+from app.services.sharding import shard_config
+from app.services.vector_service import VectorService
+
+
+def create_shard_app(config, index):
+    """Build the Flask app serving one shard"""
+    app = Flask(__name__)
+
+    def vector_service(collection):
+        return VectorService(shard_config(collection_config(config, collection), index))
+
+    @app.route('/search', methods=['POST'])
+    def search():
+        body = request.get_json(silent=True) or {}
+        if not body.get('vectors'):
+            return jsonify({'error': 'vectors is required'}), 400
+        try:
+            service = vector_service(body.get('collection'))
+            results = service.search_batch(
+                body['vectors'], top_k=body.get('top_k', 5), filters=body.get('filters')
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'shard': index, 'generation': service.version(), 'results': results})
+
+    @app.route('/health', methods=['GET'])
+    def health():
+        service = vector_service(request.args.get('collection'))
+        return jsonify({'shard': index, **service.stats()})
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vector store shard server")
+    parser.add_argument('--shard', type=int, required=True, help="Shard number (0-based)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8101)
+    parser.add_argument('--no-warmup', action='store_true', help="Don't page the shard in at startup")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=Config.LOG_LEVEL)
+    config = config_dict(Config)
+    app = create_shard_app(config, args.shard)
+
+    print("=" * 60)
+    print(f"SHARD {args.shard} SERVER on http://{args.host}:{args.port}")
+    if not args.no_warmup:
+        start = time.perf_counter()
+        service = VectorService(shard_config(config, args.shard))
+        service.touch_pages()
+        print(f"  {service.vector_count()} vectors paged in ({time.perf_counter() - start:.1f}s)")
+    print("=" * 60)
+
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Report the health of a vector store and optionally verify it row by row
+
+    python store_diagnostics.py
+    python store_diagnostics.py --collection interviews --verify
+    python store_diagnostics.py --path /backups/vector_db/indexes --verify --json
+
+Exits with status 1 if verification finds inconsistencies.
+"""
+import argparse
+import json
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.config.settings import Config, config_dict
+from app.services.collections import collection_config
+from app.services.diagnostics import StoreSnapshot, diagnostics
+
+
+def _mb(size):
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+def print_report(report, indent=''):
+    if 'shards' in report:
+        print(f"{indent}sharded store, {len(report['shards'])} shards, generation {report['generation']}")
+        for index, shard in enumerate(report['shards']):
+            print(f"{indent}shard {index}:")
+            print_report(shard, indent + '  ')
+        return
+
+    print(f"{indent}{report['path']} ({report['generation']})")
+    if report.get('legacy'):
+        print(f"{indent}  legacy store (faiss_index.bin + metadata.pkl), not converted; the app or "
+              f"convert_store.py converts it to generations")
+        return
+    print(f"{indent}  index          {report['index_type']}, dimension {report['dimension']}, "
+          f"{'exact' if report['index_params']['exact'] else 'two-stage'}")
+    print(f"{indent}  vectors        {report['vector_count']} (metadata rows {report['metadata_count']})")
+    if not report['vector_count']:
+        return
+    print(f"{indent}  documents      {report['document_count']}, live rows {report['live_count']}")
+    print(f"{indent}  tombstoned     {report['tombstoned_rows']} ({report['tombstone_ratio']:.1%}, "
+          f"compaction at {report['index_params']['compact_tombstone_ratio']:.0%})")
+    print(f"{indent}  bytes/vector   {report['bytes_per_vector']:.0f} (all files {report['disk_bytes_per_vector']:.0f})")
+    print(f"{indent}  on disk        {_mb(report['disk_bytes'])}, mapped {_mb(report['mapped_bytes'])}, "
+          f"heap {_mb(report['heap_bytes'])}")
+    print(f"{indent}  superseded     {report['superseded_generations']} generations, {_mb(report['superseded_bytes'])}")
+    print(f"{indent}  created        {report['created_at']}")
+    print(f"{indent}  compacted      {report['compacted_at'] or 'never'}")
+    if 'verify' in report:
+        verify = report['verify']
+        status = '✓ consistent' if verify['ok'] else f"✗ {verify['error_count']} errors"
+        print(f"{indent}  verify         {status} ({verify['rows_checked']} rows, {verify.get('seconds', 0):.2f}s)")
+        for message in verify['errors']:
+            print(f"{indent}    - {message}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Vector store diagnostics")
+    parser.add_argument('--collection', help="Collection to inspect (default: the default store)")
+    parser.add_argument('--path', help="Store directory to inspect instead of a configured one")
+    parser.add_argument('--verify', action='store_true', help="Check every row against its metadata")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args()
+
+    config = collection_config(config_dict(Config), args.collection)
+    if args.path:
+        config = {**config, 'VECTOR_DB_PATH': args.path, 'METADATA_PATH': args.path, 'SHARD_URLS': ''}
+    # Read-only: a legacy store or backup is reported, never converted
+    report = diagnostics(StoreSnapshot.from_config(config), verify=args.verify)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+    if args.verify and not report['verify']['ok']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()